@@ -0,0 +1,33 @@
+"""Measure Controller operations on local storage backends without network"""
+import timeit
+
+from subscription_manager.backends import create_dbhelper
+from subscription_manager.common import utils
+from subscription_manager.controller import Controller
+
+ROWS = 10_000
+LOOKUPS = 2_000
+
+
+def main():
+    subscriptions = [utils.subscription_generator() for _ in range(ROWS)]
+    for number, subscription in enumerate(subscriptions):
+        subscription["name"] = f"{subscription['name']} {number}"
+    names = [subscription["name"] for subscription in subscriptions[:LOOKUPS]]
+    print(f"rows: {ROWS}")
+    for backend in ("memory", "sqlite"):
+        controller = Controller(create_dbhelper(backend))
+        add = timeit.timeit(lambda: controller.add_subscriptions(subscriptions), number=1)
+        lookup = timeit.timeit(
+            lambda: [controller.get_subscription_by_name(name) for name in names], number=1
+        )
+        owner_list = timeit.timeit(lambda: controller.get_subscriptions_list("Mary"), number=10) / 10
+        print(
+            f"{backend:7} add_subscriptions: {add / ROWS * 1e6:7.1f} us/record, "
+            f"get_subscription_by_name: {lookup / LOOKUPS * 1e6:7.1f} us, "
+            f"get_subscriptions_list(owner): {owner_list * 1e3:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
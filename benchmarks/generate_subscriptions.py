@@ -0,0 +1,65 @@
+"""Generate seeded synthetic subscriptions for load tests.
+
+Run from the repository root:
+    python -m benchmarks.generate_subscriptions 1000000 --output subscriptions.jsonl
+    python -m benchmarks.generate_subscriptions 100000 --backend sqlite --sqlite-path load.db
+    python -m benchmarks.generate_subscriptions 1000000 --backend mongo --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import time
+
+from subscription_manager.backends import create_dbhelper
+from subscription_manager.common.constants import BACKENDS
+from subscription_manager.data_generator import (
+    GeneratorConfig,
+    generate_subscriptions,
+    insert_subscriptions,
+    write_jsonl,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", type=int, help="count of subscriptions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--owners", type=int, default=GeneratorConfig.owners)
+    parser.add_argument("--owner-skew", type=float, default=GeneratorConfig.owner_skew)
+    parser.add_argument("--mean-age-days", type=float, default=GeneratorConfig.mean_age_days)
+    parser.add_argument("--max-age-days", type=int, default=GeneratorConfig.max_age_days)
+    parser.add_argument("--price-median", type=float, default=GeneratorConfig.price_median)
+    parser.add_argument("--output", help="path of JSON Lines file")
+    parser.add_argument("--backend", choices=BACKENDS, help="storage backend for bulk insert")
+    parser.add_argument("--sqlite-path", default=":memory:", help="database file of sqlite backend")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017", help="connection string of mongo backend")
+    parser.add_argument("--db-name", default="load_test", help="database name of mongo backend")
+    args = parser.parse_args(argv)
+    if not args.output and not args.backend:
+        parser.error("either --output or --backend is required")
+
+    config = GeneratorConfig(
+        owners=args.owners,
+        owner_skew=args.owner_skew,
+        mean_age_days=args.mean_age_days,
+        max_age_days=args.max_age_days,
+        price_median=args.price_median,
+    )
+    subscriptions = generate_subscriptions(args.count, config, seed=args.seed)
+    started = time.perf_counter()
+    if args.output:
+        written = write_jsonl(subscriptions, args.output)
+        print(f"{written} subscriptions written to {args.output}")
+    else:
+        options = {}
+        if args.backend == "sqlite":
+            options = {"path": args.sqlite_path}
+        elif args.backend == "mongo":
+            from pymongo import MongoClient
+
+            options = dict(db_url=None, db_credentials=None, db_name=args.db_name, client=MongoClient(args.mongo_url))
+        written = insert_subscriptions(create_dbhelper(args.backend, **options), subscriptions)
+        print(f"{written} subscriptions inserted with {args.backend} backend")
+    print(f"{time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
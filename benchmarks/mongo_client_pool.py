@@ -0,0 +1,56 @@
+"""Compare cold and warm start latency of get_subscription against local mongod.
+Cold start creates new MongoClient like every DBHelper did before, warm start reuses shared client.
+    MONGODB_URL environment variable sets mongod address, mongodb://localhost:27017 by default
+"""
+import os
+import sys
+from time import perf_counter
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from subscription_manager.common import utils
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.mongo_pool import close_clients, get_client
+
+MONGODB_URL = os.environ.get("MONGODB_URL", "mongodb://localhost:27017")
+DB_NAME = "subscription_manager_benchmark"
+CALLS = 50
+
+
+def get_subscription_ms(client: MongoClient, name: str) -> float:
+    """Return latency of DBHelper creation and one get_subscription call in milliseconds"""
+    started = perf_counter()
+    DBHelper.from_client(client, DB_NAME).get_subscription(name)
+    return (perf_counter() - started) * 1000
+
+
+def main():
+    probe = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        probe.admin.command("ping")
+    except PyMongoError:
+        sys.exit(f"mongod is not available at {MONGODB_URL}")
+    dbhelper = DBHelper.from_client(probe, DB_NAME)
+    dbhelper.ensure_indexes()
+    subscription = utils.create_subscription(**utils.subscription_generator())
+    dbhelper.add_subscription(subscription)
+    probe.close()
+
+    cold = []
+    for _ in range(CALLS):
+        client = MongoClient(MONGODB_URL)
+        cold.append(get_subscription_ms(client, subscription.name))
+        client.close()
+    get_client(MONGODB_URL)
+    warm = [get_subscription_ms(get_client(MONGODB_URL), subscription.name) for _ in range(CALLS)]
+
+    get_client(MONGODB_URL).drop_database(DB_NAME)
+    close_clients()
+    print(f"calls: {CALLS}")
+    print(f"cold start (new client): median {sorted(cold)[CALLS // 2]:.2f} ms")
+    print(f"warm start (shared):     median {sorted(warm)[CALLS // 2]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare per-object and batch computation of next payment dates"""
+import random
+import timeit
+from datetime import date, timedelta
+
+from subscription_manager.common.batch_dates import (
+    as_datetime64,
+    next_payment_dates,
+    subscriptions_next_payment_dates,
+)
+from subscription_manager.common.constants import FREQUENCIES
+from subscription_manager.subscription import Subscription
+
+ROWS = 100_000
+
+
+def make_subscriptions(count: int):
+    """Return subscriptions started during the last ten years"""
+    today = date.today()
+    rnd = random.Random(42)
+    return [
+        Subscription(
+            owner="Mary",
+            name="Sky Store",
+            frequency=rnd.choice(FREQUENCIES),
+            start_date=today - timedelta(days=rnd.randint(0, 3650)),
+            price=12.97,
+            currency="CNY",
+            comment="",
+        )
+        for _ in range(count)
+    ]
+
+
+def main():
+    subscriptions = make_subscriptions(ROWS)
+    loop = min(timeit.repeat(
+        lambda: [subscription.next_payment_date for subscription in subscriptions],
+        number=1, repeat=3,
+    ))
+    batch = min(timeit.repeat(
+        lambda: subscriptions_next_payment_dates(subscriptions), number=1, repeat=3
+    ))
+    start_dates = as_datetime64([subscription.start_date for subscription in subscriptions])
+    frequencies = [subscription.frequency for subscription in subscriptions]
+    columns = min(timeit.repeat(
+        lambda: next_payment_dates(start_dates, frequencies), number=1, repeat=3
+    ))
+    print(f"rows: {ROWS}")
+    print(f"per-object loop: {loop * 1000:.1f} ms")
+    print(f"numpy batch:     {batch * 1000:.1f} ms")
+    print(f"numpy columns:   {columns * 1000:.1f} ms")
+    print(f"speedup:         {loop / batch:.1f}x (objects), {loop / columns:.1f}x (columns)")
+
+
+if __name__ == "__main__":
+    main()
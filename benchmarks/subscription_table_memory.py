@@ -0,0 +1,54 @@
+"""Compare memory of list of Subscription objects and SubscriptionTable for the same documents"""
+import gc
+import random
+import tracemalloc
+from datetime import date, timedelta
+
+from subscription_manager.common.constants import CURRENCIES, FREQUENCIES
+from subscription_manager.subscription import Subscription
+from subscription_manager.subscription_table import SubscriptionTable
+
+ROWS = 1_000_000
+OWNERS = [f"owner-{number}" for number in range(10_000)]
+NAMES = ["Spotify", "Netflix", "Coursera", "Amazon Prime", "Sky Store", "Youtube Music"]
+
+
+def documents(count: int):
+    """Yield documents like DBHelper does: every document has its own string objects"""
+    rnd = random.Random(42)
+    today = date.today()
+    for number in range(count):
+        yield dict(
+            owner="".join(rnd.choice(OWNERS)),
+            name="".join(rnd.choice(NAMES)),
+            frequency="".join(rnd.choice(FREQUENCIES)),
+            start_date=today - timedelta(days=rnd.randint(0, 3650)),
+            price=round(rnd.uniform(1.99, 49.99), 2),
+            currency="".join(rnd.choice(CURRENCIES)),
+            comment=f"comment {number}" if number % 10 == 0 else "",
+        )
+
+
+def retained_mb(build) -> float:
+    """Return size of memory retained by result of build in megabytes"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 1024 / 1024
+
+
+def main():
+    objects = retained_mb(lambda: [Subscription(**document) for document in documents(ROWS)])
+    table = retained_mb(lambda: SubscriptionTable.from_documents(documents(ROWS)))
+    print(f"rows: {ROWS}")
+    print(f"list of Subscription: {objects:8.1f} MB")
+    print(f"SubscriptionTable:    {table:8.1f} MB")
+    print(f"ratio:                {objects / table:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Offline benchmark suite of subscription hot paths with JSON results and comparison against baseline.
+
+Run from the repository root:
+    python -m benchmarks.suite                          # all cases at 1k, 100k and 1M records
+    python -m benchmarks.suite --sizes 1000 --output results.json
+    python -m benchmarks.suite --save-baseline          # store results as benchmarks/baseline.json
+Exit code is 1 if some case is slower than baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from subscription_manager.common import utils
+from subscription_manager.common.constants import CURRENCIES, FREQUENCIES
+from subscription_manager.controller import Controller
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+
+SIZES = (1_000, 100_000, 1_000_000)
+# Ages of subscriptions in years, cost of payment date computation grew with age before closed-form dates
+AGES = (1, 5, 20)
+TODAY = date(2020, 7, 1)
+SEED = 42
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Case is flagged if it is slower than baseline by this fraction
+DEFAULT_THRESHOLD = 0.25
+
+
+def make_records(count: int, age_years: int, seed: int = SEED) -> List[dict]:
+    """Return valid subscription dicts started about age_years ago, frequencies and currencies are mixed"""
+    rnd = random.Random(seed)
+    oldest = TODAY - timedelta(days=365 * age_years)
+    return [
+        dict(
+            owner=f"Owner {rnd.randrange(1000)}",
+            name=f"Service {number}",
+            frequency=rnd.choice(FREQUENCIES),
+            start_date=oldest + timedelta(days=rnd.randrange(365)),
+            price=round(rnd.uniform(1.99, 49.99), 2),
+            currency=rnd.choice(CURRENCIES),
+            comment="",
+        )
+        for number in range(count)
+    ]
+
+
+def consume(iterator):
+    """Exhaust iterator without keeping results, so measured code is not slowed down by list growth"""
+    deque(iterator, maxlen=0)
+
+
+def case_next_payment_date(size: int, age_years: int) -> Callable[[], None]:
+    subscriptions = [utils.create_subscription(**record) for record in make_records(size, age_years)]
+    return lambda: consume(subscription.get_next_payment_date(TODAY) for subscription in subscriptions)
+
+
+def case_create_subscription(size: int) -> Callable[[], None]:
+    records = make_records(size, AGES[0])
+    return lambda: consume(utils.create_subscription(**record) for record in records)
+
+
+def case_validate_subscription_changes(size: int) -> Callable[[], None]:
+    subscriptions = [utils.create_subscription(**record) for record in make_records(size, AGES[0])]
+    changes = dict(price=10.99, comment="Price has been increased")
+    return lambda: consume(
+        utils.validate_subscription_changes(subscription, changes) for subscription in subscriptions
+    )
+
+
+def case_get_subscriptions_list(size: int) -> Callable[[], None]:
+    dbhelper = InMemoryDBHelper()
+    dbhelper.add_subscriptions([utils.create_subscription(**record) for record in make_records(size, AGES[0])])
+    controller = Controller(dbhelper)
+    return controller.get_subscriptions_list
+
+
+def cases(size: int) -> List[Tuple[str, Callable[[], Callable[[], None]]]]:
+    """Return names and factories of all cases, factories prepare data and return measured function"""
+    return [
+        *(
+            (f"next_payment_date[age={age}y]", lambda age=age: case_next_payment_date(size, age))
+            for age in AGES
+        ),
+        ("create_subscription", lambda: case_create_subscription(size)),
+        ("validate_subscription_changes", lambda: case_validate_subscription_changes(size)),
+        ("get_subscriptions_list[memory]", lambda: case_get_subscriptions_list(size)),
+    ]
+
+
+def run(sizes, repeat: int) -> Dict[str, dict]:
+    """Run all cases, every case is measured repeat times and the best time is kept"""
+    results = {}
+    for size in sizes:
+        for name, factory in cases(size):
+            measured = factory()
+            # large inputs are measured fewer times, the best of several runs of 1M records is stable enough
+            best = min(timeit.repeat(measured, number=1, repeat=repeat if size < 1_000_000 else min(repeat, 2)))
+            del measured
+            key = f"{name}@{size}"
+            results[key] = {"size": size, "seconds": best, "us_per_record": best / size * 1e6}
+            print(f"{key:45} {best * 1000:10.2f} ms {best / size * 1e6:8.3f} us/record", flush=True)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Return descriptions of cases, which are slower than baseline by more than threshold"""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        ratio = result["us_per_record"] / reference["us_per_record"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{key}: {result['us_per_record']:.3f} us/record, "
+                f"baseline {reference['us_per_record']:.3f} us/record ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="counts of records")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements of every case")
+    parser.add_argument("--output", help="path of JSON file with results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="path of JSON file with baseline results")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to the baseline file")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": run(args.sizes, args.repeat),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"baseline {args.baseline} not found, results are not compared")
+        return 0
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(report["results"], baseline["results"], args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"no regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
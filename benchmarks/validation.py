@@ -0,0 +1,73 @@
+"""Compare per-record cost of subscription validation before and after precompiled schema"""
+import timeit
+from dataclasses import asdict, fields
+from datetime import date
+
+from subscription_manager.common import utils
+from subscription_manager.common.constants import *
+from subscription_manager.common.exceptions import *
+from subscription_manager.subscription import Subscription
+
+RECORDS = 10_000
+
+
+def legacy_create_subscription(**params) -> Subscription:
+    """utils.create_subscription before the schema was compiled at import time"""
+    expected_fields = {field.name: field.type for field in fields(Subscription)}
+    if params.keys() != expected_fields.keys():
+        raise MissingFieldsException(MISSING_FIELDS_MSG)
+    for key, value in params.items():
+        if type(value) != expected_fields[key]:
+            raise WrongTypeException(
+                WRONG_TYPE_MSG.format(
+                    expected=expected_fields[key], recieved_type=type(value), field=value
+                )
+            )
+    if params["currency"] not in CURRENCIES:
+        raise InvalidValueException(UNEXPECTED_CURRENCY_MSG.format(currency=params["currency"]))
+    if params["frequency"] not in FREQUENCIES:
+        raise InvalidValueException(UNEXPECTED_FREQUENCY_MSG.format(frequency=params["frequency"]))
+    if params["start_date"] > date.today():
+        raise InvalidValueException(FUTURE_START_DATE_MSG)
+    return Subscription(**params)
+
+
+def legacy_validate_subscription_changes(subscription: Subscription, changes: dict) -> Subscription:
+    """utils.validate_subscription_changes before the changed fields fast path"""
+    updated_subscription = asdict(subscription)
+    updated_subscription.update(changes)
+    return legacy_create_subscription(**updated_subscription)
+
+
+def per_record_us(func, records) -> float:
+    """Return best per-record time in microseconds"""
+    best = min(timeit.repeat(lambda: [func(record) for record in records], number=1, repeat=5))
+    return best / len(records) * 1_000_000
+
+
+def main():
+    records = [utils.subscription_generator() for _ in range(RECORDS)]
+    subscription = utils.create_subscription(**records[0])
+    changes = dict(price=10.99)
+    results = [
+        ("create_subscription", lambda r: legacy_create_subscription(**r), lambda r: utils.create_subscription(**r)),
+        ("validate_many", None, None),
+        (
+            "validate_subscription_changes",
+            lambda r: legacy_validate_subscription_changes(subscription, changes),
+            lambda r: utils.validate_subscription_changes(subscription, changes),
+        ),
+    ]
+    print(f"records: {RECORDS}")
+    for name, before, after in results:
+        if name == "validate_many":
+            best = min(timeit.repeat(lambda: utils.validate_many(records), number=1, repeat=5))
+            print(f"{name:30} after: {best / RECORDS * 1_000_000:6.2f} us/record")
+            continue
+        before_us = per_record_us(before, records)
+        after_us = per_record_us(after, records)
+        print(f"{name:30} before: {before_us:6.2f} us/record, after: {after_us:6.2f} us/record")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Command-line interface of Subscription manager.
+
+Only argparse, json and os are imported at startup. Controller, storage helpers and their
+dependencies are imported by commands, which use the database, so --help and cached reads stay fast.
+Startup time can be checked with:
+    python -X importtime -m clients.subscriptions_cli --help 2> importtime.log
+"""
+import argparse
+import json
+import os
+import sys
+
+CACHE_ENV_VAR = "SUBSCRIPTION_MANAGER_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "subscription_manager", "subscriptions.json")
+# Environment variables with MongoDB connection settings, credentials are not taken from the command line
+DB_URL_ENV_VAR = "SUBSCRIPTION_MANAGER_DB_URL"
+DB_NAME_ENV_VAR = "SUBSCRIPTION_MANAGER_DB_NAME"
+DB_USER_ENV_VAR = "SUBSCRIPTION_MANAGER_DB_USER"
+DB_PASSWORD_ENV_VAR = "SUBSCRIPTION_MANAGER_DB_PASSWORD"
+FIELDS = ("owner", "name", "frequency", "start_date", "price", "currency", "comment")
+# Version of the cache file layout, files of other versions are ignored and the cache is filled again
+CACHE_FORMAT = 2
+NOT_CACHED_MSG = "{what} is not in the local cache, run the command without --cached first"
+
+
+class CLIError(Exception):
+    """Error reported to the user without traceback"""
+
+
+class LocalCache:
+    """Subscriptions received by previous commands, stored in JSON file.
+    Subscriptions of different owners can have the same name, so they are kept by owner and name.
+    Listing is answered from cache only if all subscriptions of the owner (or all subscriptions) were listed before.
+    The cache listens to Controller of the CLI like SubscriptionListener, which is not imported to keep startup fast,
+    so writes made by the CLI are applied to the cache and it stays complete. When all subscriptions were listed,
+    the cache keeps the watermark of storage changes and later listings receive only changes after it.
+        Attributes:
+            path (str): path of the cache file
+            watermark (int): the largest sequence number of storage changes in the cache, 0 if it is unknown
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("format") != CACHE_FORMAT:
+            data = {}
+        # (owner, name) -> subscription record
+        self.subscriptions = {
+            (record["owner"], record["name"]): record for record in data.get("subscriptions", ())
+        }
+        self.complete = data.get("complete", False)
+        self.complete_owners = set(data.get("complete_owners", ()))
+        self.watermark = data.get("watermark", 0)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "format": CACHE_FORMAT,
+            "subscriptions": list(self.subscriptions.values()),
+            "complete": self.complete,
+            "complete_owners": sorted(self.complete_owners),
+            "watermark": self.watermark,
+        }
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(temporary_path, self.path)
+
+    def get(self, name: str) -> dict:
+        """Return the first cached subscription with the name"""
+        for (_, subscription_name), subscription in self.subscriptions.items():
+            if subscription_name == name:
+                return subscription
+        raise CLIError(NOT_CACHED_MSG.format(what=f"Subscription '{name}'"))
+
+    def list(self, owner: str = None) -> list:
+        if not self.complete and owner not in self.complete_owners:
+            raise CLIError(NOT_CACHED_MSG.format(what="List of subscriptions"))
+        return [
+            subscription
+            for (subscription_owner, _), subscription in self.subscriptions.items()
+            if owner is None or subscription_owner == owner
+        ]
+
+    def put(self, subscription: dict):
+        self.subscriptions[(subscription["owner"], subscription["name"])] = subscription
+
+    def remove(self, name: str, owner: str = None):
+        """Remove subscription by owner and name, subscriptions of the name of every owner if owner is unknown"""
+        if owner is not None:
+            self.subscriptions.pop((owner, name), None)
+            return
+        self.subscriptions = {key: record for key, record in self.subscriptions.items() if key[1] != name}
+
+    def subscription_added(self, subscription):
+        self.put(to_record(subscription))
+
+    def subscription_edited(self, subscription_name: str, subscription, owner: str = None):
+        self.remove(subscription_name, owner)
+        self.put(to_record(subscription))
+
+    def subscription_deleted(self, subscription_name: str, owner: str = None):
+        self.remove(subscription_name, owner)
+
+    def replace_listed(self, subscriptions: list, owner: str = None):
+        """Replace cached subscriptions of the owner (or all subscriptions) with the listed ones"""
+        if owner is None:
+            self.subscriptions = {}
+            self.complete = True
+        else:
+            self.subscriptions = {
+                key: subscription for key, subscription in self.subscriptions.items() if key[0] != owner
+            }
+            self.complete_owners.add(owner)
+        for subscription in subscriptions:
+            self.put(subscription)
+
+    def apply_changes(self, changes: list, complete: bool = False):
+        """
+        Apply storage changes and move the watermark,
+        if complete is True the changes are all subscriptions and they replace the cache
+        """
+        if complete:
+            self.subscriptions = {}
+            self.complete = True
+        for change in changes:
+            if change.subscription is None:
+                self.remove(change.name, change.owner)
+            else:
+                self.put(document_to_record(change.subscription))
+            self.watermark = max(self.watermark, change.sequence)
+
+
+def document_to_record(document: dict) -> dict:
+    """Convert subscription dict to JSON compatible dict, start_date is written in ISO format"""
+    record = {field: document[field] for field in FIELDS}
+    record["start_date"] = record["start_date"].isoformat()
+    return record
+
+
+def to_record(subscription) -> dict:
+    """Convert Subscription to JSON compatible dict"""
+    return document_to_record(vars(subscription))
+
+
+def format_record(record: dict) -> str:
+    """Format subscription record like str(Subscription)"""
+    return "(" + ", ".join(str(record[field]) for field in FIELDS) + ")"
+
+
+def parse_date(value: str):
+    from datetime import date
+
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected date in format YYYY-MM-DD, received: {value}")
+
+
+def create_controller(args, cache: LocalCache):
+    """
+    Create Controller for the configured backend, storage modules are imported here.
+    Writes of the Controller are applied to the cache
+    """
+    from subscription_manager.backends import create_dbhelper, resolve_backend
+    from subscription_manager.controller import Controller
+
+    backend = resolve_backend(args.backend)
+    options = {}
+    if backend == "sqlite":
+        options["path"] = args.sqlite_path
+    elif backend == "mongo":
+        options = dict(
+            db_url=os.environ.get(DB_URL_ENV_VAR),
+            db_name=os.environ.get(DB_NAME_ENV_VAR),
+            db_credentials={
+                "user": os.environ.get(DB_USER_ENV_VAR),
+                "password": os.environ.get(DB_PASSWORD_ENV_VAR),
+            },
+        )
+    return Controller(create_dbhelper(backend, **options), listeners=[cache])
+
+
+def subscription_fields(args, names) -> dict:
+    """Return fields given in the command line"""
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+def command_add(args, cache: LocalCache):
+    subscription_dict = subscription_fields(args, FIELDS)
+    subscription_dict.setdefault("comment", "")
+    create_controller(args, cache).add_subscription(subscription_dict)
+    return []
+
+
+def command_edit(args, cache: LocalCache):
+    changes = subscription_fields(args, [field if field != "name" else "new_name" for field in FIELDS])
+    if "new_name" in changes:
+        changes["name"] = changes.pop("new_name")
+    if not changes:
+        raise CLIError("Nothing to change, pass at least one field")
+    create_controller(args, cache).edit_subscription(args.name, changes)
+    return []
+
+
+def command_delete(args, cache: LocalCache):
+    create_controller(args, cache).delete_subscription(args.name)
+    return []
+
+
+def command_get(args, cache: LocalCache):
+    if args.cached:
+        return [cache.get(args.name)]
+    record = to_record(create_controller(args, cache).get_subscription_by_name(args.name))
+    cache.put(record)
+    return [record]
+
+
+def command_list(args, cache: LocalCache):
+    if args.cached:
+        return cache.list(args.owner)
+    controller = create_controller(args, cache)
+    if cache.complete and cache.watermark:
+        # only subscriptions changed after the previous listing are received
+        cache.apply_changes(controller.changes_since(cache.watermark))
+        return cache.list(args.owner)
+    if args.owner is None:
+        cache.apply_changes(controller.changes_since(), complete=True)
+        return cache.list()
+    records = [to_record(subscription) for subscription in controller.iter_subscriptions(args.owner)]
+    cache.replace_listed(records, args.owner)
+    return records
+
+
+def add_field_arguments(parser: argparse.ArgumentParser, required: bool):
+    parser.add_argument("--owner", required=required, help="owner of subscription")
+    parser.add_argument("--frequency", required=required, help="daily, weekly, monthly or yearly")
+    parser.add_argument("--start-date", type=parse_date, required=required, help="start date, YYYY-MM-DD")
+    parser.add_argument("--price", type=float, required=required, help="price of one payment")
+    parser.add_argument("--currency", required=required, help="USD, GBP, EUR, RUB or CNY")
+    parser.add_argument("--comment", help="comment")
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="subscriptions", description="Keep and track service subscriptions")
+    parser.add_argument(
+        "--backend", choices=("mongo", "memory", "sqlite"),
+        help="storage backend, SUBSCRIPTION_MANAGER_BACKEND environment variable or mongo by default",
+    )
+    parser.add_argument("--sqlite-path", default="subscriptions.db", help="database file of sqlite backend")
+    parser.add_argument(
+        "--cache-path", default=os.environ.get(CACHE_ENV_VAR, DEFAULT_CACHE_PATH), help="local cache file"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add subscription")
+    add.add_argument("name", help="name of subscription")
+    add_field_arguments(add, required=True)
+    add.set_defaults(handler=command_add)
+
+    edit = commands.add_parser("edit", help="change fields of subscription")
+    edit.add_argument("name", help="name of subscription")
+    edit.add_argument("--new-name", help="new name of subscription")
+    add_field_arguments(edit, required=False)
+    edit.set_defaults(handler=command_edit)
+
+    delete = commands.add_parser("delete", help="delete subscription")
+    delete.add_argument("name", help="name of subscription")
+    delete.set_defaults(handler=command_delete)
+
+    get = commands.add_parser("get", help="show subscription")
+    get.add_argument("name", help="name of subscription")
+    get.add_argument("--cached", action="store_true", help="answer from the local cache without database")
+    get.set_defaults(handler=command_get)
+
+    listing = commands.add_parser("list", help="show subscriptions")
+    listing.add_argument("--owner", help="show only subscriptions of the owner")
+    listing.add_argument("--cached", action="store_true", help="answer from the local cache without database")
+    listing.set_defaults(handler=command_list)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = create_parser().parse_args(argv)
+    cache = LocalCache(args.cache_path)
+    try:
+        records = args.handler(args, cache)
+    except CLIError as error:
+        print(error, file=sys.stderr)
+        return 1
+    except Exception as error:
+        # validation and storage errors of Controller, the module is not imported to check the type
+        if type(error).__module__ != "subscription_manager.common.exceptions":
+            raise
+        print(error, file=sys.stderr)
+        return 1
+    if not getattr(args, "cached", False):
+        cache.save()
+    for record in records:
+        print(format_record(record))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from clients import subscriptions_cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_MODULES = ("subscription_manager.controller", "pymongo", "numpy", "dateutil")
+
+
+@pytest.fixture
+def run(tmp_path, capsys):
+    options = ["--backend", "sqlite", "--sqlite-path", str(tmp_path / "subscriptions.db")]
+    options += ["--cache-path", str(tmp_path / "cache.json")]
+
+    def run(*argv):
+        code = subscriptions_cli.main([*options, *argv])
+        captured = capsys.readouterr()
+        return code, captured.out.splitlines(), captured.err
+
+    return run
+
+
+def add(run, name: str, owner: str = "Mary"):
+    return run(
+        "add", name, "--owner", owner, "--frequency", "monthly", "--start-date", "2020-04-13",
+        "--price", "9.99", "--currency", "GBP",
+    )
+
+
+def test_commands(run):
+    """Check add, get, edit, list and delete commands and exit code of missing subscription"""
+    assert add(run, "Spotify") == (0, [], "")
+    assert add(run, "Netflix", owner="Kevin")[0] == 0
+    assert run("get", "Spotify")[1] == ["(Mary, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+    assert run("edit", "Spotify", "--price", "10.99", "--new-name", "Spotify Premium")[0] == 0
+    assert run("list", "--owner", "Mary")[1] == ["(Mary, Spotify Premium, monthly, 2020-04-13, 10.99, GBP, )"]
+    assert run("delete", "Netflix")[0] == 0
+    assert len(run("list")[1]) == 1
+    code, output, error = run("get", "Netflix")
+    assert code == 1
+    assert "Netflix" in error
+
+
+def test_validation_error(run):
+    """Check that invalid subscription is reported with exit code 1"""
+    code, _, error = run(
+        "add", "Spotify", "--owner", "Mary", "--frequency", "hourly", "--start-date", "2020-04-13",
+        "--price", "9.99", "--currency", "GBP",
+    )
+    assert code == 1
+    assert "hourly" in error
+
+
+def test_cached_reads(run, tmp_path):
+    """Check that cached reads are served from local cache without database and fail for missing entries"""
+    add(run, "Spotify")
+    add(run, "Netflix", owner="Kevin")
+    assert run("list", "--cached")[0] == 1
+    run("list", "--owner", "Kevin")
+    assert run("list", "--owner", "Kevin", "--cached")[1] == [
+        "(Kevin, Netflix, monthly, 2020-04-13, 9.99, GBP, )"
+    ]
+    assert run("list", "--cached")[0] == 1
+    run("list")
+    # database is not used by cached reads
+    os.remove(tmp_path / "subscriptions.db")
+    assert len(run("list", "--cached")[1]) == 2
+    assert run("get", "Spotify", "--cached")[1] == ["(Mary, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+    assert run("get", "Hulu", "--cached")[0] == 1
+
+
+def test_listing_receives_changes(run, tmp_path):
+    """Check that listing applies changes of other clients after the cache watermark"""
+    from subscription_manager.controller import Controller
+    from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+
+    add(run, "Spotify")
+    add(run, "Netflix", owner="Kevin")
+    assert len(run("list")[1]) == 2
+    cache = subscriptions_cli.LocalCache(str(tmp_path / "cache.json"))
+    assert cache.watermark == 2
+    # another client changes the database
+    dbhelper = SQLiteDBHelper(str(tmp_path / "subscriptions.db"))
+    controller = Controller(dbhelper)
+    controller.delete_subscription("Netflix")
+    controller.edit_subscription("Spotify", {"name": "Spotify Premium"})
+    dbhelper.close()
+    assert run("list")[1] == ["(Mary, Spotify Premium, monthly, 2020-04-13, 9.99, GBP, )"]
+    assert subscriptions_cli.LocalCache(str(tmp_path / "cache.json")).watermark == 4
+
+
+def test_same_name_of_different_owners(run):
+    """Check that cache keeps subscriptions with the same name of different owners apart"""
+    add(run, "Spotify")
+    add(run, "Spotify", owner="Kevin")
+    assert run("list")[1] == [
+        "(Mary, Spotify, monthly, 2020-04-13, 9.99, GBP, )", "(Kevin, Spotify, monthly, 2020-04-13, 9.99, GBP, )"
+    ]
+    assert run("list", "--owner", "Kevin", "--cached")[1] == ["(Kevin, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+    # the first subscription with the name is deleted, only its owner is removed from the cache
+    assert run("delete", "Spotify")[0] == 0
+    assert run("list", "--cached")[1] == ["(Kevin, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+    assert run("list")[1] == ["(Kevin, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+
+
+def test_cache_of_other_format_is_ignored(run, tmp_path):
+    """Check that cache file keyed by name only is ignored and filled again by listing"""
+    add(run, "Spotify")
+    record = dict(owner="Mary", name="Hulu", frequency="monthly", start_date="2020-04-13", price=9.99,
+                  currency="GBP", comment="")
+    with open(tmp_path / "cache.json", "w", encoding="utf-8") as cache_file:
+        json.dump({"subscriptions": {"Hulu": record}, "complete": True, "watermark": 1}, cache_file)
+    assert run("list", "--cached")[0] == 1
+    assert run("list")[1] == ["(Mary, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+
+
+def test_backend_from_environment(tmp_path, monkeypatch, capsys):
+    """Check that backend is taken from SUBSCRIPTION_MANAGER_BACKEND, when --backend is not given"""
+    monkeypatch.setenv("SUBSCRIPTION_MANAGER_BACKEND", "sqlite")
+    options = ["--sqlite-path", str(tmp_path / "subscriptions.db"), "--cache-path", str(tmp_path / "cache.json")]
+    argv = ["add", "Spotify", "--owner", "Mary", "--frequency", "monthly", "--start-date", "2020-04-13",
+            "--price", "9.99", "--currency", "GBP"]
+    assert subscriptions_cli.main([*options, *argv]) == 0
+    assert subscriptions_cli.main([*options, "get", "Spotify"]) == 0
+    assert capsys.readouterr().out.splitlines() == ["(Mary, Spotify, monthly, 2020-04-13, 9.99, GBP, )"]
+    assert os.path.exists(tmp_path / "subscriptions.db")
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["list", "--cached"]])
+def test_heavy_modules_are_not_imported(argv, tmp_path):
+    """Check that help and cached listing do not import heavy modules"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "clients.subscriptions_cli",
+         "--cache-path", str(tmp_path / "cache.json"), *argv],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    imported = {line.rsplit("|", 1)[-1].strip() for line in completed.stderr.splitlines() if "|" in line}
+    assert "argparse" in imported
+    assert not imported & set(HEAVY_MODULES)
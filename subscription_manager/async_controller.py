@@ -0,0 +1,315 @@
+import asyncio
+from datetime import date
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Sequence
+
+import subscription_manager.common.utils as utils
+from subscription_manager.async_dbhelper import AsyncBaseDBHelper
+from subscription_manager.base_dbhelper import Change
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_EDIT_RETRIES,
+    EDIT_CONFLICT_MSG,
+    SPEND_GROUP_FIELDS,
+    SUBSCRIPTION_NOT_FOUND_MSG,
+)
+from subscription_manager.common.exceptions import (
+    EditConflictException,
+    SubscriptionException,
+    SubsNotFoundException,
+)
+from subscription_manager.controller import BaseController, BulkAddResult, BulkEditResult
+from subscription_manager.due_index import DueIndex
+from subscription_manager.forecast import FORECAST_PROJECTION, ForecastTotals
+from subscription_manager.listener import SubscriptionListener
+from subscription_manager.snapshot import SnapshotStore
+from subscription_manager.subscription import Subscription
+from subscription_manager.subscription_table import SubscriptionTable
+
+
+class AsyncController(BaseController):
+    """Asyncio version of Controller, every method which communicates with database is a coroutine.
+    Validation and notification of listeners are shared with Controller, while one coroutine waits for database
+    other ones are served, so many requests of bot users are handled concurrently in one thread.
+    """
+
+    def __init__(self, dbhelper: AsyncBaseDBHelper, listeners: List[SubscriptionListener] = None):
+        """Takes asyncio storage helper (MotorDBHelper or ExecutorDBHelper) for communicating with database
+        and not mandatory listeners, that are notified about every change of subscriptions"""
+        super().__init__(dbhelper, listeners)
+        self._snapshot_sync: Optional[asyncio.Task] = None
+
+    async def add_subscription(self, subscription_dict: dict):
+        """
+        Add subscription to database, see Controller.add_subscription
+        Args:
+            subscription_dict (dict): subscription to add
+        Returns:
+            identifier of created subscription
+        """
+        try:
+            subscription_obj = utils.create_subscription(**subscription_dict)
+        except SubscriptionException:
+            raise
+        result_id = await self.dbhelper.add_subscription(subscription_obj)
+        self._notify_added(subscription_obj)
+        return result_id
+
+    async def add_subscriptions(
+        self, subscriptions: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> BulkAddResult:
+        """
+        Add many subscriptions to database, see Controller.add_subscriptions
+        Args:
+            subscriptions (Iterable[dict]): subscriptions to add
+            batch_size (int): count of subscriptions written to database with one request
+        Returns:
+            BulkAddResult: identifiers of created subscriptions and rejected subscriptions
+        """
+        result = BulkAddResult()
+        for batch in self._validated_batches(subscriptions, batch_size, result):
+            inserted_ids, errors = await self.dbhelper.add_subscriptions(
+                [subscription_obj for _, _, subscription_obj in batch]
+            )
+            self._collect_batch(batch, inserted_ids, errors, result)
+        return self._sort_rejected(result)
+
+    async def edit_subscription(self, subscription_name: str, subscription_changes: dict) -> int:
+        """
+        Validate changes and edit subscription in database with one request, see Controller.edit_subscription
+        Args:
+            subscription_name (str): name of subscription to change
+            subscription_changes (dict):  dict contains changes for subscription
+        Returns:
+            int: always 1, subscription found by name is stamped with a new version even if the changes
+                are equal to its fields, so the count of subscriptions with changed fields is not known
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in database
+        """
+        try:
+            utils.validate_str_field(field=subscription_name)
+            changes = utils.validate_changes(subscription_changes)
+        except SubscriptionException:
+            raise
+        owner = await self._owner_of(subscription_name) if self.listeners and "owner" in changes else None
+        if await self._apply_changes(subscription_name, changes, owner=owner) is None:
+            raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+        return 1
+
+    async def modify_subscription(
+        self,
+        subscription_name: str,
+        modify: Callable[[Subscription], dict],
+        retries: int = DEFAULT_EDIT_RETRIES,
+    ) -> Subscription:
+        """
+        Edit subscription with changes computed from its current state, see Controller.modify_subscription
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in database
+            EditConflictException: when subscription was changed concurrently during every attempt
+        """
+        try:
+            utils.validate_str_field(field=subscription_name)
+        except SubscriptionException:
+            raise
+        for _ in range(retries):
+            document, version = await self.dbhelper.get_versioned_subscription(subscription_name)
+            changes = utils.validate_changes(modify(Subscription(**document)))
+            subscription = await self._apply_changes(subscription_name, changes, version, document["owner"])
+            if subscription is not None:
+                return subscription
+        raise EditConflictException(EDIT_CONFLICT_MSG.format(name=subscription_name, retries=retries))
+
+    async def bulk_edit(self, subscription_filter: dict, subscription_changes: dict) -> BulkEditResult:
+        """
+        Apply the same changes to all subscriptions selected by filter with one request, see Controller.bulk_edit
+        Returns:
+            BulkEditResult: count of matched and count of changed subscriptions
+        """
+        subscription_filter, changes = self._validate_bulk_edit(subscription_filter, subscription_changes)
+        matched_subscriptions = (
+            [Subscription(**document) async for document in self.dbhelper.find_subscriptions(subscription_filter)]
+            if self.listeners else []
+        )
+        matched, modified = await self.dbhelper.update_subscriptions(subscription_filter, changes)
+        self._notify_bulk_edited(matched_subscriptions, changes)
+        return BulkEditResult(matched, modified)
+
+    async def _apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None, owner: str = None
+    ) -> Optional[Subscription]:
+        """Send validated changes to storage helper and notify listeners, None is returned if nothing was changed"""
+        changed = await self.dbhelper.apply_changes(subscription_name, changes, expected_version)
+        return self._notify_edited(subscription_name, changed, changes, owner)
+
+    async def _owner_of(self, subscription_name: str) -> Optional[str]:
+        """Return owner of the first subscription with the name, None if there is no such subscription"""
+        async for document in self.dbhelper.find_subscriptions({"name": subscription_name}, {"owner": True}):
+            return document["owner"]
+        return None
+
+    async def delete_subscription(self, subscription_name: str) -> int:
+        """
+        Delete subscription by name
+        Args:
+            subscription_name (str): identifier of subscription to delete
+        Returns:
+            int: count of deleted subscriptions
+        """
+        try:
+            utils.validate_str_field(field=subscription_name)
+        except SubscriptionException:
+            raise
+        owner = await self._owner_of(subscription_name) if self.listeners else None
+        deleted_subscriptions_count = await self.dbhelper.delete_subscription(subscription_name)
+        self._notify_deleted(subscription_name, owner, deleted_subscriptions_count)
+        return deleted_subscriptions_count
+
+    async def get_subscription_by_name(self, subscription_name: str) -> Subscription:
+        """
+        Return subscription by name, from snapshot if it is opened
+        Returns:
+            <class Subscription>: found subscription like Subscription object
+        Raises:
+            SubsNotFoundException: when subscription with this id doesn't exist in database
+        """
+        try:
+            utils.validate_str_field(field=subscription_name)
+        except SubscriptionException:
+            raise
+        subscription = self._snapshot_get(subscription_name)
+        if subscription is not None:
+            return subscription
+        received_subscription: dict = await self.dbhelper.get_subscription(subscription_name)
+        return Subscription(**received_subscription)
+
+    async def get_subscriptions_list(self, owner: str = None) -> List[Subscription]:
+        """
+        Return list of subscriptions, from snapshot if it is opened
+        Args:
+            owner (str): not mandatory, if not None returns all subscriptions of specified owner
+        Returns:
+            List[Subscription]: list of all subscriptions or all user's subscription if owner is specified
+        """
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+        except SubscriptionException:
+            raise
+        subscriptions = self._snapshot_list(owner)
+        if subscriptions is not None:
+            return subscriptions
+        subscription_list = await self.dbhelper.get_all_subscriptions(owner)
+        return [Subscription(**subscription) for subscription in subscription_list]
+
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> AsyncIterator[Subscription]:
+        """
+        Lazily yield subscriptions from database cursor, see Controller.iter_subscriptions
+        Args:
+            owner (str): not mandatory, if not None yields all subscriptions of specified owner
+            batch_size (int): count of documents received from database with one request
+            projection (dict): not mandatory, fields to return or exclude, fields that were not received are None
+        Returns:
+            AsyncIterator[Subscription]: all subscriptions or all user's subscription if owner is specified
+        """
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+        except SubscriptionException:
+            raise
+        documents = self.dbhelper.iter_subscriptions(
+            owner, batch_size=batch_size, projection=projection
+        )
+        return self._stream_subscriptions(documents, projection is not None)
+
+    async def _stream_subscriptions(self, documents, partial: bool) -> AsyncIterator[Subscription]:
+        """Convert documents to Subscription objects one by one"""
+        async for document in documents:
+            yield self._from_stream(document, partial)
+
+    async def get_subscriptions_table(self, owner: str = None) -> SubscriptionTable:
+        """
+        Return subscriptions in columnar container, see Controller.get_subscriptions_table
+        Args:
+            owner (str): not mandatory, if not None returns all subscriptions of specified owner
+        Returns:
+            SubscriptionTable: all subscriptions or all user's subscription if owner is specified
+        """
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+        except SubscriptionException:
+            raise
+        return SubscriptionTable.from_documents(await self.dbhelper.get_all_subscriptions(owner))
+
+    async def spend_summary(
+        self, owner: str = None, group_by: Sequence[str] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        """
+        Return monthly spend grouped by owner, currency and frequency, see Controller.spend_summary
+        Raises:
+            InvalidValueException: when group_by contains unexpected field
+        """
+        return await self.dbhelper.spend_summary(owner, self._validate_summary(owner, group_by))
+
+    async def forecast(
+        self, window_start: date, window_end: date, owner: str = None, period: str = "day"
+    ) -> List[dict]:
+        """
+        Return totals of payments expected from window_start to window_end inclusive, see Controller.forecast.
+        Subscriptions are streamed from storage, so memory is bounded by count of periods and currencies
+        Raises:
+            WrongTypeException: when window bounds are not dates
+            InvalidValueException: when window start is later than its end or period is not supported
+        """
+        self._validate_forecast(owner, window_start, window_end, period)
+        totals = ForecastTotals(window_start, window_end, period)
+        async for subscription in self.dbhelper.iter_subscriptions(owner, projection=FORECAST_PROJECTION):
+            totals.add(subscription)
+        return totals.rows()
+
+    async def changes_since(self, watermark: int = 0) -> List[Change]:
+        """
+        Return subscriptions written and names of subscriptions deleted or renamed after the watermark,
+        see Controller.changes_since
+        """
+        return await self.dbhelper.changes_since(watermark)
+
+    def open_snapshot(self, path: str, sync: bool = True) -> SnapshotStore:
+        """
+        Serve get_subscription_by_name and get_subscriptions_list from local snapshot file,
+        see Controller.open_snapshot. Sync runs as asyncio task, wait_snapshot_synced waits for it
+        Args:
+            path (str): path of snapshot file, it is created by the first sync
+            sync (bool): apply storage changes made after the snapshot in background task
+        Returns:
+            SnapshotStore: snapshot store
+        """
+        store = self._attach_snapshot(path)
+        if sync:
+            self._snapshot_sync = asyncio.ensure_future(store.async_sync(self.dbhelper))
+        return store
+
+    async def wait_snapshot_synced(self) -> bool:
+        """Wait for background sync, return True if snapshot is synced"""
+        if self._snapshot_sync is not None:
+            await self._snapshot_sync
+        return self.snapshot is not None and self.snapshot.synced
+
+    async def close_snapshot(self):
+        """Serve reads from storage again, changes kept over snapshot are written to its file"""
+        await self.wait_snapshot_synced()
+        self._snapshot_sync = None
+        store = self._detach_snapshot()
+        if store is not None:
+            store.close()
+
+    async def create_due_index(self, owner: str = None) -> DueIndex:
+        """
+        Build index of subscriptions by next payment date and keep it up to date with changes made by AsyncController
+        Args:
+            owner (str): not mandatory, if not None index contains only subscriptions of specified owner
+        Returns:
+            DueIndex: index for queries like "subscriptions due in the next N days"
+        """
+        due_index = DueIndex(await self.get_subscriptions_list(owner), owner=owner)
+        self.add_listener(due_index)
+        return due_index
@@ -0,0 +1,196 @@
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, ChangeWatermark
+from subscription_manager.common.constants import (
+    DEFAULT_ASYNC_WORKERS,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHANGES_POLL_INTERVAL,
+    SPEND_GROUP_FIELDS,
+)
+from subscription_manager.subscription import Subscription
+
+
+class AsyncBaseDBHelper(ABC):
+    """Storage protocol used by AsyncController, implemented by ExecutorDBHelper and MotorDBHelper.
+    Methods take the arguments and return the values of BaseDBHelper methods, but they are coroutines,
+    iter_subscriptions, find_subscriptions and follow_changes are async iterators
+        Attributes:
+            changes_overlap (float): seconds, in which a write becomes visible after a write with larger
+                sequence number, see ChangeWatermark
+    """
+
+    changes_overlap = 0.0
+
+    async def ensure_indexes(self) -> List[str]:
+        """See BaseDBHelper.ensure_indexes"""
+        return []
+
+    @abstractmethod
+    async def add_subscription(self, subscription: Subscription):
+        """See BaseDBHelper.add_subscription"""
+
+    @abstractmethod
+    async def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[object]], Dict[int, str]]:
+        """See BaseDBHelper.add_subscriptions"""
+
+    @abstractmethod
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> AsyncIterator[dict]:
+        """See BaseDBHelper.iter_subscriptions"""
+
+    @abstractmethod
+    async def get_subscription(self, subscription_name: str) -> dict:
+        """See BaseDBHelper.get_subscription"""
+
+    async def get_all_subscriptions(self, owner: str = None) -> List[dict]:
+        """See BaseDBHelper.get_all_subscriptions"""
+        return [document async for document in self.iter_subscriptions(owner)]
+
+    @abstractmethod
+    async def spend_summary(
+        self, owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        """See BaseDBHelper.spend_summary"""
+
+    @abstractmethod
+    def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> AsyncIterator[dict]:
+        """See BaseDBHelper.find_subscriptions"""
+
+    @abstractmethod
+    async def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        """See BaseDBHelper.update_subscriptions"""
+
+    @abstractmethod
+    async def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        """See BaseDBHelper.get_versioned_subscription"""
+
+    @abstractmethod
+    async def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        """See BaseDBHelper.apply_changes"""
+
+    @abstractmethod
+    async def delete_subscription(self, subscription_name: str) -> int:
+        """See BaseDBHelper.delete_subscription"""
+
+    @abstractmethod
+    async def changes_since(self, watermark: int = 0) -> List[Change]:
+        """See BaseDBHelper.changes_since"""
+
+    async def follow_changes(
+        self, watermark: int = 0, poll_interval: float = DEFAULT_CHANGES_POLL_INTERVAL, stop: asyncio.Event = None
+    ) -> AsyncIterator[Change]:
+        """
+        Stream changes after the watermark and then new changes as they are written, storage is polled
+        with changes_since, see BaseDBHelper.follow_changes
+        Args:
+            watermark (int): the largest sequence number applied by the caller
+            poll_interval (float): seconds between requests of changes
+            stop (asyncio.Event): not mandatory, the stream is finished when the event is set
+        Returns:
+            AsyncIterator[Change]: changes in the order of sequence numbers
+        """
+        stop = asyncio.Event() if stop is None else stop
+        watermark = ChangeWatermark(watermark, self.changes_overlap)
+        while True:
+            for change in watermark.apply(await self.changes_since(watermark.value)):
+                yield change
+            try:
+                await asyncio.wait_for(stop.wait(), poll_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+
+class ExecutorDBHelper(AsyncBaseDBHelper):
+    """Asyncio wrapper of synchronous storage helper.
+    Every call runs in thread pool, so calls of different coroutines wait for database at the same time
+    and the event loop is not blocked.
+        Attributes:
+            dbhelper (BaseDBHelper): synchronous storage helper, it should be thread-safe
+            executor (ThreadPoolExecutor): threads for storage calls
+    """
+
+    def __init__(self, dbhelper: BaseDBHelper, max_workers: int = DEFAULT_ASYNC_WORKERS):
+        self.dbhelper = dbhelper
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def changes_overlap(self) -> float:
+        return self.dbhelper.changes_overlap
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    def close(self):
+        """Stop threads of the executor"""
+        self.executor.shutdown(wait=True)
+
+    async def ensure_indexes(self) -> List[str]:
+        return await self._run(self.dbhelper.ensure_indexes)
+
+    async def add_subscription(self, subscription: Subscription):
+        return await self._run(self.dbhelper.add_subscription, subscription)
+
+    async def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[object]], Dict[int, str]]:
+        return await self._run(self.dbhelper.add_subscriptions, subscriptions)
+
+    async def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> AsyncIterator[dict]:
+        documents = await self._run(
+            self.dbhelper.iter_subscriptions, owner, batch_size=batch_size, projection=projection
+        )
+        while True:
+            # every batch is read from the cursor in the thread pool
+            batch = await self._run(lambda: list(islice(documents, batch_size)))
+            if not batch:
+                return
+            for document in batch:
+                yield document
+
+    async def get_subscription(self, subscription_name: str) -> dict:
+        return await self._run(self.dbhelper.get_subscription, subscription_name)
+
+    async def get_all_subscriptions(self, owner: str = None) -> List[dict]:
+        return await self._run(self.dbhelper.get_all_subscriptions, owner)
+
+    async def spend_summary(
+        self, owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        return await self._run(self.dbhelper.spend_summary, owner, group_by)
+
+    async def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> AsyncIterator[dict]:
+        # filtered subscriptions are received with one call in the thread pool
+        documents = await self._run(lambda: list(self.dbhelper.find_subscriptions(subscription_filter, projection)))
+        for document in documents:
+            yield document
+
+    async def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        return await self._run(self.dbhelper.update_subscriptions, subscription_filter, changes)
+
+    async def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        return await self._run(self.dbhelper.get_versioned_subscription, subscription_name)
+
+    async def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        return await self._run(self.dbhelper.apply_changes, subscription_name, changes, expected_version)
+
+    async def delete_subscription(self, subscription_name: str) -> int:
+        return await self._run(self.dbhelper.delete_subscription, subscription_name)
+
+    async def changes_since(self, watermark: int = 0) -> List[Change]:
+        return await self._run(self.dbhelper.changes_since, watermark)
@@ -0,0 +1,64 @@
+import os
+
+from subscription_manager.base_dbhelper import BaseDBHelper
+from subscription_manager.common.constants import (
+    BACKEND_ENV_VAR,
+    DEFAULT_BACKEND,
+    DEFAULT_CACHE_TTL,
+    UNKNOWN_BACKEND_MSG,
+)
+
+
+def resolve_backend(backend: str = None) -> str:
+    """Return the given backend, or SUBSCRIPTION_MANAGER_BACKEND environment variable, or 'mongo' by default"""
+    if backend is None:
+        return os.environ.get(BACKEND_ENV_VAR, DEFAULT_BACKEND)
+    return backend
+
+
+def create_dbhelper(
+    backend: str = None, cache_size: int = 0, cache_ttl: float = DEFAULT_CACHE_TTL, **options
+) -> BaseDBHelper:
+    """
+    Create storage helper for Controller by configuration.
+    Helpers are imported on demand, so in-memory and SQLite backends don't load pymongo
+    Args:
+        backend (str): not mandatory, one of: mongo, memory, sqlite,
+            by default taken from SUBSCRIPTION_MANAGER_BACKEND environment variable or 'mongo'
+        cache_size (int): not mandatory, if positive the helper is wrapped with LRU cache of this size
+        cache_ttl (float): time to live of cached subscriptions in seconds
+        **options: arguments of the helper:
+            mongo: db_url, db_credentials, db_name, client, pool_config - see DBHelper
+            sqlite: path - see SQLiteDBHelper
+            memory: no options
+    Examples:
+        create_dbhelper("sqlite", path="subscriptions.db")
+    Returns:
+        BaseDBHelper: storage helper
+    Raises:
+        ValueError: If backend is not supported
+    """
+    dbhelper = _create_backend(backend, **options)
+    if cache_size > 0:
+        from subscription_manager.cache import CachingDBHelper
+
+        return CachingDBHelper(dbhelper, max_size=cache_size, ttl=cache_ttl)
+    return dbhelper
+
+
+def _create_backend(backend: str = None, **options) -> BaseDBHelper:
+    """Create storage helper of the backend, see create_dbhelper"""
+    backend = resolve_backend(backend)
+    if backend == "mongo":
+        from subscription_manager.dbhelper import DBHelper
+
+        return DBHelper(**options)
+    if backend == "memory":
+        from subscription_manager.memory_dbhelper import InMemoryDBHelper
+
+        return InMemoryDBHelper(**options)
+    if backend == "sqlite":
+        from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+
+        return SQLiteDBHelper(**options)
+    raise ValueError(UNKNOWN_BACKEND_MSG.format(backend=backend))
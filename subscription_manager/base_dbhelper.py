@@ -0,0 +1,302 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from threading import Event
+from time import monotonic
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHANGES_POLL_INTERVAL,
+    SPEND_GROUP_FIELDS,
+)
+from subscription_manager.common.dates import PAYMENTS_PER_MONTH
+from subscription_manager.subscription import Subscription
+
+
+@dataclass
+class Change:
+    """Change of subscription returned by BaseDBHelper.changes_since
+        Attributes:
+            sequence (int): sequence number of the change, it increases with every write of storage
+            name (str): name of subscription
+            subscription (Optional[dict]): current subscription dict, None if subscription was deleted, renamed
+                or moved to another owner
+            owner (Optional[str]): owner of subscription, None for tombstones written before they were keyed
+                by owner, such tombstones remove subscriptions of the name of every owner
+    """
+
+    sequence: int
+    name: str
+    subscription: Optional[dict]
+    owner: Optional[str] = None
+
+
+def sort_changes(changes: Iterable[Change]) -> List[Change]:
+    """Return changes in the order of sequence numbers, deletions of the same sequence number go first"""
+    return sorted(changes, key=lambda change: (change.sequence, change.subscription is not None))
+
+
+class ChangeWatermark:
+    """Watermark of changes read with changes_since, which trails the read changes by overlap seconds.
+    Writers of MongoDB reserve sequence numbers before they write, so a change with a smaller number
+    can become visible after a change with a larger number was read. Such write is not lost, if it becomes
+    visible in overlap seconds after the larger number was read: the watermark moves to the largest read number
+    only after overlap seconds, meanwhile changes are read from the previous watermark and the changes
+    read before are skipped. Storages, which write changes in the order of numbers, have zero overlap
+        Attributes:
+            value (int): sequence number, all changes up to which were read
+            latest (int): the largest read sequence number
+            overlap (float): seconds, in which writes with smaller sequence numbers become visible
+            clock (Callable): function returning current time in seconds
+        Examples:
+            changes = watermark.apply(dbhelper.changes_since(watermark.value))
+    """
+
+    def __init__(self, watermark: int = 0, overlap: float = 0.0, clock: Callable[[], float] = monotonic):
+        self.value = watermark
+        self.latest = watermark
+        self.overlap = overlap
+        self.clock = clock
+        # (time of read, the largest sequence number of the read) of reads, which are not older than overlap
+        self._reads: Deque[Tuple[float, int]] = deque()
+        # changes above the watermark, which were returned by apply
+        self._applied: Set[Tuple[int, Optional[str], str, bool]] = set()
+
+    def apply(self, changes: List[Change]) -> List[Change]:
+        """
+        Move watermark with changes read after the value
+        Returns:
+            List[Change]: changes, which were not returned before
+        """
+        now = self.clock()
+        new_changes = []
+        for change in changes:
+            key = (change.sequence, change.owner, change.name, change.subscription is None)
+            if change.sequence > self.value and key not in self._applied:
+                self._applied.add(key)
+                new_changes.append(change)
+        if changes:
+            self.latest = max([self.latest] + [change.sequence for change in changes])
+            self._reads.append((now, self.latest))
+        # all numbers of a read older than overlap are visible, so the next reads start after them
+        while self._reads and self._reads[0][0] <= now - self.overlap:
+            self.value = max(self.value, self._reads.popleft()[1])
+        self._applied = {key for key in self._applied if key[0] > self.value}
+        return new_changes
+
+
+class BaseDBHelper(ABC):
+    """Storage protocol used by Controller, implemented by MongoDB, in-memory and SQLite helpers.
+    Subscriptions are identified by name, subscriptions are received as dicts with Subscription fields.
+    Every write stamps the written subscriptions with a sequence number, subscriptions deleted, renamed
+    or moved to another owner leave tombstones keyed by owner and name, see changes_since.
+    In-memory and SQLite helpers stamp and write in one step. MongoDB can not stamp a document with
+    a counter in the same request, so DBHelper and MotorDBHelper reserve the number with one more round trip:
+        add_subscription and add_subscriptions: 2 round trips
+        edit: 2 round trips, 3 if name or owner is changed
+        delete: 3 round trips, 1 if nothing was deleted, Controller with listeners reads the owner before it
+        bulk edit: 2 round trips, 4 if owner is changed
+    The number is reserved before the write, so writes can become visible out of the order of numbers.
+    A write, which becomes visible more than changes_overlap seconds after a larger number was read,
+    is lost for readers of changes_since, which move ChangeWatermark, until they read all subscriptions again
+        Attributes:
+            changes_overlap (float): seconds, in which a write becomes visible after a write with larger
+                sequence number, see ChangeWatermark
+    """
+
+    changes_overlap = 0.0
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        Create indexes for lookup by name and listing by owner
+        Returns:
+            List[str]: names of the indexes
+        """
+        return []
+
+    @abstractmethod
+    def add_subscription(self, subscription: Subscription):
+        """
+        Insert subscription
+        Returns:
+            identifier of created subscription
+        """
+
+    @abstractmethod
+    def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[object]], Dict[int, str]]:
+        """
+        Insert batch of subscriptions
+        Args:
+            subscriptions (List[Subscription]): subscriptions to insert
+        Returns:
+            Tuple: identifiers in the order of subscriptions (None for not written subscriptions)
+                and write error messages by position of subscription
+        """
+
+    @abstractmethod
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> Iterator[dict]:
+        """
+        Stream subscriptions
+        Args:
+            owner (str): not mandatory, if not None returns subscriptions of specified owner
+            batch_size (int): count of subscriptions received from storage with one request
+            projection (dict): not mandatory, fields to return or exclude, e.g. {"comment": False}
+        Returns:
+            Iterator[dict]: subscriptions dicts
+        """
+
+    @abstractmethod
+    def get_subscription(self, subscription_name: str) -> dict:
+        """
+        Return subscription by name
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in storage
+        """
+
+    def get_all_subscriptions(self, owner: str = None) -> List[dict]:
+        """
+        Return list of subscriptions
+        Args:
+            owner (str): not mandatory, if not None returns all subscriptions of specified owner
+        """
+        return list(self.iter_subscriptions(owner))
+
+    def spend_summary(
+        self, owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        """
+        Return monthly spend of subscriptions grouped by the given fields.
+        Subscriptions are streamed and summed in Python, storages with server-side aggregation override it
+        Args:
+            owner (str): not mandatory, if not None only subscriptions of specified owner are summed
+            group_by (Tuple[str, ...]): fields from SPEND_GROUP_FIELDS
+        Returns:
+            List[dict]: rows sorted by group fields, every row contains group fields,
+                monthly_spend (sum of price * PAYMENTS_PER_MONTH[frequency]) and count of subscriptions
+        """
+        projection = dict.fromkeys({*group_by, "frequency", "price"}, True)
+        groups: Dict[tuple, list] = {}
+        for subscription in self.iter_subscriptions(owner, projection=projection):
+            key = tuple(subscription[field] for field in group_by)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0.0, 0]
+            group[0] += subscription["price"] * PAYMENTS_PER_MONTH.get(subscription["frequency"], 0.0)
+            group[1] += 1
+        return [
+            {**dict(zip(group_by, key)), "monthly_spend": spend, "count": count}
+            for key, (spend, count) in sorted(groups.items())
+        ]
+
+    def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> Iterator[dict]:
+        """
+        Stream subscriptions, which fields are equal to the filter values
+        Args:
+            subscription_filter (dict): values of fields from FILTER_FIELDS, e.g. {"name": "Spotify"}
+            projection (dict): not mandatory, fields to return or exclude, e.g. {"comment": False}
+        Returns:
+            Iterator[dict]: subscriptions dicts
+        """
+        items = subscription_filter.items()
+        for subscription in self.iter_subscriptions(subscription_filter.get("owner")):
+            if all(subscription[key] == value for key, value in items):
+                yield apply_projection(subscription, projection)
+
+    @abstractmethod
+    def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        """
+        Set changed fields of all subscriptions, which fields are equal to the filter values.
+        Version is increased only for subscriptions, which fields differ from the changes
+        Args:
+            subscription_filter (dict): values of fields from FILTER_FIELDS
+            changes (dict): validated changes of subscription fields
+        Returns:
+            Tuple[int, int]: count of matched and count of changed subscriptions
+        """
+
+    @abstractmethod
+    def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        """
+        Return subscription by name and its version, which is increased by every change
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in storage
+        """
+
+    @abstractmethod
+    def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        """
+        Atomically set changed fields of subscription and increase its version
+        Args:
+            subscription_name (str): name of subscription before changes
+            changes (dict): validated changes of subscription fields
+            expected_version (int): not mandatory, changes are applied only if subscription has this version
+        Returns:
+            Optional[dict]: changed subscription, None if subscription was not found or has another version
+        """
+
+    @abstractmethod
+    def delete_subscription(self, subscription_name: str) -> int:
+        """
+        Delete subscription by name, tombstone with owner, name and sequence number is kept for changes_since
+        Returns:
+            int: count of deleted subscriptions
+        """
+
+    @abstractmethod
+    def changes_since(self, watermark: int = 0) -> List[Change]:
+        """
+        Return subscriptions written and tombstones of subscriptions deleted, renamed or moved to another owner
+        after the watermark.
+        Every write stamps subscription with the next sequence number, so replicas apply O(changes) deltas
+        Args:
+            watermark (int): the largest sequence number applied by the caller, 0 returns all subscriptions
+        Examples:
+            watermark = ChangeWatermark(overlap=dbhelper.changes_overlap)
+            changes = watermark.apply(dbhelper.changes_since(watermark.value))
+        Returns:
+            List[Change]: changes in the order of sequence numbers, only the latest state of every subscription
+        """
+
+    def follow_changes(
+        self, watermark: int = 0, poll_interval: float = DEFAULT_CHANGES_POLL_INTERVAL, stop: Event = None
+    ) -> Iterator[Change]:
+        """
+        Stream changes after the watermark and then new changes as they are written.
+        Storage is polled with changes_since, storages with push notifications override it
+        Args:
+            watermark (int): the largest sequence number applied by the caller
+            poll_interval (float): seconds between requests of changes
+            stop (Event): not mandatory, the stream is finished when the event is set
+        Returns:
+            Iterator[Change]: changes in the order of sequence numbers
+        """
+        stop = Event() if stop is None else stop
+        watermark = ChangeWatermark(watermark, self.changes_overlap)
+        while True:
+            yield from watermark.apply(self.changes_since(watermark.value))
+            if stop.wait(poll_interval):
+                return
+
+
+def apply_projection(subscription: dict, projection: Optional[dict]) -> dict:
+    """
+    Apply MongoDB-like projection to subscription dict
+    Args:
+        subscription (dict): subscription to project
+        projection (dict): fields to return (all true values) or to exclude (all false values)
+    Returns:
+        dict: subscription with projected fields
+    """
+    if not projection:
+        return subscription
+    projection = {key: value for key, value in projection.items() if key != "_id"}
+    if any(projection.values()):
+        return {key: value for key, value in subscription.items() if projection.get(key)}
+    return {key: value for key, value in subscription.items() if key not in projection}
@@ -0,0 +1,270 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Event, Lock
+from time import monotonic
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, ChangeWatermark
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_CHANGES_POLL_INTERVAL,
+    SPEND_GROUP_FIELDS,
+)
+from subscription_manager.subscription import Subscription
+
+# Sentinel for missed cache entries, None can be a cached value
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    """Counters of cache usage
+        Attributes:
+            hits (int): count of lookups answered from cache
+            misses (int): count of lookups sent to storage
+            evictions (int): count of entries removed because cache was full
+            expirations (int): count of entries removed because their TTL was over
+            invalidations (int): count of entries removed because of writes
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """Bounded mapping with least recently used eviction and time to live for every entry.
+    All methods are thread-safe, so the cache can be shared by threads of ExecutorDBHelper
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl: float = DEFAULT_CACHE_TTL,
+        clock: Callable[[], float] = monotonic,
+    ):
+        """
+        Args:
+            max_size (int): max count of entries
+            ttl (float): time to live of every entry in seconds
+            clock (Callable): function returning current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """Return cached value or _MISSING, hit and miss counters are updated"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if self.clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self._entries[key]
+                self.stats.expirations += 1
+            self.stats.misses += 1
+            return _MISSING
+
+    def put(self, key: Hashable, value):
+        """Put value to cache, the least recently used entry is evicted if cache is full"""
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def peek(self, key: Hashable):
+        """Return cached value without changing counters and order, expired values are returned too"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return _MISSING if entry is None else entry[1]
+
+    def invalidate(self, key: Hashable):
+        """Remove entry"""
+        with self._lock:
+            self._invalidate(key)
+
+    def _invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self.stats.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Remove all entries, which keys satisfy predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._invalidate(key)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self.stats.invalidations += len(self._entries)
+            self._entries.clear()
+
+
+class CachingDBHelper(BaseDBHelper):
+    """Read-through cache in front of storage helper.
+    Subscriptions by name and lists of subscriptions by owner are cached,
+    writes made through this helper invalidate the entries of affected names and owners,
+    writes of other clients are found by invalidate_changes.
+        Attributes:
+            dbhelper (BaseDBHelper): storage helper
+            cache (LRUCache): cached lookups, see cache.stats for counters
+            watermark (int): the largest sequence number of changes applied by invalidate_changes
+    """
+
+    def __init__(
+        self,
+        dbhelper: BaseDBHelper,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl: float = DEFAULT_CACHE_TTL,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.dbhelper = dbhelper
+        self.cache = LRUCache(max_size, ttl, clock)
+        self._watermark = ChangeWatermark(overlap=dbhelper.changes_overlap, clock=clock)
+
+    @property
+    def watermark(self) -> int:
+        return self._watermark.latest
+
+    @property
+    def changes_overlap(self) -> float:
+        return self.dbhelper.changes_overlap
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def __getattr__(self, item):
+        # backend specific attributes, e.g. DBHelper.subscriptions collection
+        if item == "dbhelper":
+            raise AttributeError(item)
+        return getattr(self.dbhelper, item)
+
+    def _invalidate_subscription(self, subscription_name: str, owners: List[str]):
+        """Invalidate subscription entry, lists of the owners and list of all subscriptions"""
+        cached = self.cache.peek(("name", subscription_name))
+        if cached is _MISSING:
+            # owner of the changed subscription is unknown, every list can contain it
+            self.cache.invalidate_where(lambda key: key[0] == "owner")
+        else:
+            owners = owners + [cached["owner"]]
+        self.cache.invalidate(("name", subscription_name))
+        for owner in owners + [None]:
+            self.cache.invalidate(("owner", owner))
+
+    def invalidate_changes(self) -> int:
+        """
+        Invalidate entries of subscriptions changed in storage after the watermark, e.g. by other processes.
+        Only changes are read, the first call reads all subscriptions to find the watermark.
+        Changes of the storage overlap are read again, but applied once, see ChangeWatermark
+        Returns:
+            int: count of applied changes
+        """
+        changes = self._watermark.apply(self.dbhelper.changes_since(self._watermark.value))
+        for change in changes:
+            owners = [] if change.owner is None else [change.owner]
+            self._invalidate_subscription(change.name, owners)
+        return len(changes)
+
+    def ensure_indexes(self) -> List[str]:
+        return self.dbhelper.ensure_indexes()
+
+    def add_subscription(self, subscription: Subscription):
+        result = self.dbhelper.add_subscription(subscription)
+        self.cache.invalidate(("name", subscription.name))
+        self.cache.invalidate(("owner", subscription.owner))
+        self.cache.invalidate(("owner", None))
+        return result
+
+    def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[object]], Dict[int, str]]:
+        result = self.dbhelper.add_subscriptions(subscriptions)
+        for subscription in subscriptions:
+            self.cache.invalidate(("name", subscription.name))
+            self.cache.invalidate(("owner", subscription.owner))
+        self.cache.invalidate(("owner", None))
+        return result
+
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> Iterator[dict]:
+        # streams are used for large result sets, they are not cached
+        return self.dbhelper.iter_subscriptions(owner, batch_size=batch_size, projection=projection)
+
+    def get_subscription(self, subscription_name: str) -> dict:
+        key = ("name", subscription_name)
+        subscription = self.cache.get(key)
+        if subscription is _MISSING:
+            subscription = self.dbhelper.get_subscription(subscription_name)
+            self.cache.put(key, subscription)
+        return dict(subscription)
+
+    def get_all_subscriptions(self, owner: str = None) -> List[dict]:
+        key = ("owner", owner)
+        subscriptions = self.cache.get(key)
+        if subscriptions is _MISSING:
+            subscriptions = self.dbhelper.get_all_subscriptions(owner)
+            self.cache.put(key, subscriptions)
+        return [dict(subscription) for subscription in subscriptions]
+
+    def spend_summary(
+        self, owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        # summary is computed by storage, it can be done on server side
+        return self.dbhelper.spend_summary(owner, group_by)
+
+    def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> Iterator[dict]:
+        return self.dbhelper.find_subscriptions(subscription_filter, projection)
+
+    def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        result = self.dbhelper.update_subscriptions(subscription_filter, changes)
+        # changed subscriptions are not known, so every entry can be outdated
+        self.cache.clear()
+        return result
+
+    def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        # version check needs the current state of storage
+        return self.dbhelper.get_versioned_subscription(subscription_name)
+
+    def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        result = self.dbhelper.apply_changes(subscription_name, changes, expected_version)
+        if result is not None:
+            self._invalidate_subscription(subscription_name, [result["owner"]])
+            self.cache.invalidate(("name", result["name"]))
+        return result
+
+    def delete_subscription(self, subscription_name: str) -> int:
+        result = self.dbhelper.delete_subscription(subscription_name)
+        self._invalidate_subscription(subscription_name, [])
+        return result
+
+    def changes_since(self, watermark: int = 0) -> List[Change]:
+        return self.dbhelper.changes_since(watermark)
+
+    def follow_changes(
+        self, watermark: int = 0, poll_interval: float = DEFAULT_CHANGES_POLL_INTERVAL, stop: Event = None
+    ) -> Iterator[Change]:
+        return self.dbhelper.follow_changes(watermark, poll_interval, stop)
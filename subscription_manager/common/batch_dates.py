@@ -0,0 +1,106 @@
+from datetime import date
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from subscription_manager.common.dates import DAYS_IN_PERIOD, MONTHS_IN_PERIOD
+from subscription_manager.subscription import Subscription
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def as_datetime64(dates: Sequence[date]) -> np.ndarray:
+    """
+    Convert dates to datetime64[D] array.
+    Python date objects are converted through ordinals, it is much faster than numpy parsing of every object.
+    Args:
+        dates (Sequence[date]): date objects or numpy array
+    Returns:
+        np.ndarray: datetime64[D] array
+    """
+    if isinstance(dates, np.ndarray):
+        return dates.astype("datetime64[D]")
+    ordinals = np.fromiter(
+        (day.toordinal() for day in dates), dtype=np.int64, count=len(dates)
+    )
+    return (ordinals - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def _month_length(months: np.ndarray) -> np.ndarray:
+    """Return count of days in every month of datetime64[M] array"""
+    return (
+        (months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")
+    ).astype(np.int64)
+
+
+def _add_months(months: np.ndarray, days: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Vectorized version of dates.add_months for start months and days of month"""
+    target = months + count
+    clamped_days = np.minimum(days, _month_length(target))
+    return target.astype("datetime64[D]") + (clamped_days - 1)
+
+
+def next_payment_dates(
+    start_dates: Sequence[date], frequencies: Sequence[str], today: date = None
+) -> np.ndarray:
+    """
+    Return next payment dates, that are bigger or equal than today, for columns of subscription fields.
+    All dates are computed with numpy datetime64 arithmetic in one pass without python loop per subscription.
+    Args:
+        start_dates (Sequence[date]): dates when subscriptions started, date objects or datetime64 array
+        frequencies (Sequence[str]): payment periods from the list: daily, weekly, monthly, yearly
+        today (date): not mandatory, date to count from, date.today() by default
+    Examples:
+        next_payment_dates([date(2020, 1, 31)], ["monthly"], today=date(2020, 2, 1))
+            -> array(['2020-02-29'], dtype='datetime64[D]')
+    Returns:
+        np.ndarray: datetime64[D] array of the next payment dates in the order of start_dates
+    """
+    starts = as_datetime64(start_dates)
+    frequencies = np.asarray(frequencies)
+    today = np.datetime64(date.today() if today is None else today, "D")
+
+    # subscriptions with unsupported frequency get NaT
+    result = np.full(starts.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+    passed_days = np.maximum((today - starts).astype(np.int64), 0)
+    for frequency, period in DAYS_IN_PERIOD.items():
+        mask = frequencies == frequency
+        if not mask.any():
+            continue
+        # ceil division of the passed days by the period length
+        number = -(-passed_days[mask] // period)
+        result[mask] = starts[mask] + number * period
+
+    for frequency, period in MONTHS_IN_PERIOD.items():
+        mask = frequencies == frequency
+        if not mask.any():
+            continue
+        start = starts[mask]
+        start_months = start.astype("datetime64[M]")
+        days = (start - start_months.astype("datetime64[D]")).astype(np.int64) + 1
+        months = (today.astype("datetime64[M]") - start_months).astype(np.int64)
+        number = np.maximum(months, 0) // period
+        candidate = _add_months(start_months, days, number * period)
+        # clamped day of the month can not be bigger than today, so one step forward is enough
+        number += candidate < today
+        result[mask] = _add_months(start_months, days, number * period)
+
+    return result
+
+
+def subscriptions_next_payment_dates(
+    subscriptions: Iterable[Subscription], today: date = None
+) -> np.ndarray:
+    """
+    Return next payment dates for the list of subscriptions, see next_payment_dates
+    Args:
+        subscriptions (Iterable[Subscription]): subscriptions to compute payment dates for
+        today (date): not mandatory, date to count from, date.today() by default
+    Returns:
+        np.ndarray: datetime64[D] array of the next payment dates in the order of subscriptions
+    """
+    subscriptions = list(subscriptions)
+    start_dates = [subscription.start_date for subscription in subscriptions]
+    frequencies = [subscription.frequency for subscription in subscriptions]
+    return next_payment_dates(start_dates, frequencies, today)
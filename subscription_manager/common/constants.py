@@ -1,6 +1,57 @@
 CURRENCIES = ("USD", "GBP", "EUR", "RUB", "CNY")
 FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
 DEFAULT_COLLECTION_NAME = "subscriptions"
+# Collection with counter of change sequence numbers of subscriptions
+SEQUENCES_COLLECTION_NAME = "sequences"
+# Collection with sequence numbers of deleted and renamed subscriptions
+TOMBSTONES_COLLECTION_NAME = "tombstones"
+# Collection with materialized monthly spend of every owner in every currency
+OWNER_TOTALS_COLLECTION_NAME = "owner_totals"
+# Totals which differ less than this relative tolerance are not reported as drift
+TOTALS_RELATIVE_TOLERANCE = 1e-9
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CACHE_SIZE = 1024
+# Time to live of cached subscriptions in seconds
+DEFAULT_CACHE_TTL = 60.0
+# MongoClient connection pool defaults
+DEFAULT_MAX_POOL_SIZE = 100
+DEFAULT_CONNECT_TIMEOUT_MS = 10000
+DEFAULT_SERVER_SELECTION_TIMEOUT_MS = 10000
+# Seconds before rates source is asked again, after it failed and snapshot rates were used
+DEFAULT_RATES_RETRY_INTERVAL = 300.0
+# Threads running synchronous storage calls of AsyncController
+DEFAULT_ASYNC_WORKERS = 16
+BACKENDS = ("mongo", "memory", "sqlite")
+DEFAULT_BACKEND = "mongo"
+BACKEND_ENV_VAR = "SUBSCRIPTION_MANAGER_BACKEND"
+# Indexed fields of subscriptions collection: point lookup by name, listing by owner,
+# bulk edit filters by currency and frequency, changes by sequence number
+SUBSCRIPTION_INDEXES = (("owner",), ("name",), ("owner", "name"), ("currency",), ("frequency",), ("sequence",))
+# Fields, which identify subscription in tombstones and local replicas
+KEY_FIELDS = ("owner", "name")
+# Fields, by which subscriptions can be selected for bulk edit
+FILTER_FIELDS = ("name", "owner", "currency", "frequency")
+# Seconds between requests of changes, when storage can not push them
+DEFAULT_CHANGES_POLL_INTERVAL = 1.0
+# Seconds between reservation of sequence number and write of MongoDB, in which the write becomes visible.
+# Readers read changes again for this time, so writes visible after writes with larger numbers are not lost
+DEFAULT_CHANGES_OVERLAP = 30.0
+# Snapshot file is rewritten, when changes kept over it exceed this share of its subscriptions
+SNAPSHOT_COMPACT_RATIO = 0.25
+# Attempts of read-modify-write edit, when subscription is changed concurrently
+DEFAULT_EDIT_RETRIES = 5
+# Fields, by which spend summary can be grouped
+SPEND_GROUP_FIELDS = ("owner", "currency", "frequency")
+# Periods, by which payments forecast is totaled
+FORECAST_PERIODS = ("day", "month")
+# Days between payment reminder and payment
+DEFAULT_REMINDER_LEAD_DAYS = 1
+# Max count of reminders passed to the sender at once
+DEFAULT_REMINDER_BATCH_SIZE = 100
+# Upper bounds of latency histogram buckets of instrumented calls in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Prefix of exported Prometheus metric names
+METRICS_PREFIX = "subscription_manager"
 
 """Application messages"""
 EMPTY_FIELD_MSG = "Field length should be more than one"
@@ -13,3 +64,22 @@ UNEXPECTED_CURRENCY_MSG = (
     "Unexpected currency: {currency}, supported currencies: " + " ".join(CURRENCIES)
 )
 MISSING_FIELDS_MSG = "Some fields in the taken subscription are missing"
+WRITE_FAILED_MSG = "Subscription was not written to database: {error}"
+SUBSCRIPTION_NOT_FOUND_MSG = "Subscription with name '{name}' was not found"
+UNEXPECTED_GROUP_FIELD_MSG = (
+    "Unexpected group field: {field}, supported fields: " + " ".join(SPEND_GROUP_FIELDS)
+)
+UNEXPECTED_FILTER_FIELD_MSG = (
+    "Unexpected filter field: {field}, supported fields: " + " ".join(FILTER_FIELDS)
+)
+EMPTY_FILTER_MSG = "Filter should contain at least one field, empty filter would change all subscriptions"
+BULK_RENAME_MSG = "Bulk edit can not change name, it would give the same name to all matched subscriptions"
+EDIT_CONFLICT_MSG = (
+    "Subscription with name '{name}' was changed concurrently {retries} times, changes were not applied"
+)
+RATES_NOT_AVAILABLE_MSG = "Exchange rates for {currency} are not available: {error}"
+UNEXPECTED_PERIOD_MSG = (
+    "Unexpected forecast period: {period}, supported periods: " + " ".join(FORECAST_PERIODS)
+)
+WRONG_WINDOW_MSG = "Window start {start} should not be later than window end {end}"
+UNKNOWN_BACKEND_MSG = "Unknown storage backend: {backend}, supported backends: " + " ".join(BACKENDS)
@@ -0,0 +1,116 @@
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Iterator
+
+"""Number of months in one payment period for month based frequencies"""
+MONTHS_IN_PERIOD = {"monthly": 1, "yearly": 12}
+"""Number of days in one payment period for day based frequencies"""
+DAYS_IN_PERIOD = {"daily": 1, "weekly": 7}
+"""Average count of days in one month of the Gregorian calendar"""
+DAYS_IN_MONTH = 365.2425 / 12
+"""Count of payments in one average month for every frequency, price * factor gives monthly spend"""
+PAYMENTS_PER_MONTH = {
+    **{frequency: 1 / months for frequency, months in MONTHS_IN_PERIOD.items()},
+    **{frequency: DAYS_IN_MONTH / days for frequency, days in DAYS_IN_PERIOD.items()},
+}
+
+
+def add_months(start_date: date, months: int) -> date:
+    """
+    Shift date by the given count of months keeping the day of the start date.
+    If the target month is shorter, the day is clamped to the last day of the month.
+    Args:
+        start_date (date): date to shift
+        months (int): count of months to add
+    Examples:
+        add_months(date(2020, 1, 31), 1) -> date(2020, 2, 29)
+        add_months(date(2020, 2, 29), 12) -> date(2021, 2, 28)
+    Returns:
+        date: shifted date
+    """
+    month_index = start_date.year * 12 + start_date.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    day = min(start_date.day, monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def payment_date(start_date: date, frequency: str, number: int) -> date:
+    """
+    Return payment date with the given sequence number, the payment on start_date has number 0
+    Args:
+        start_date (date): date when subscription started
+        frequency (str): payment period from the list: daily, weekly, monthly, yearly
+        number (int): sequence number of the payment
+    Returns:
+        date: date of the payment
+    """
+    if frequency in DAYS_IN_PERIOD:
+        return start_date + timedelta(days=DAYS_IN_PERIOD[frequency] * number)
+    return add_months(start_date, MONTHS_IN_PERIOD[frequency] * number)
+
+
+def payment_number(start_date: date, frequency: str, day: date) -> int:
+    """
+    Return sequence number of the first payment that is bigger or equal than day
+    Args:
+        start_date (date): date when subscription started
+        frequency (str): payment period from the list: daily, weekly, monthly, yearly
+        day (date): lower bound for the payment date
+    Returns:
+        int: sequence number of the payment, 0 if day is not after start_date
+    """
+    if day <= start_date:
+        return 0
+    if frequency in DAYS_IN_PERIOD:
+        period = DAYS_IN_PERIOD[frequency]
+        # ceil division of the passed days by the period length
+        return -(-(day - start_date).days // period)
+    period = MONTHS_IN_PERIOD[frequency]
+    months = (day.year - start_date.year) * 12 + day.month - start_date.month
+    number = months // period
+    # clamped day of the month can not be bigger than the day, so one step forward is enough
+    if add_months(start_date, number * period) < day:
+        number += 1
+    return number
+
+
+def payment_dates(start_date: date, frequency: str, window_start: date, window_end: date) -> Iterator[date]:
+    """
+    Stream payment dates inside the window, the first date is computed with calendar arithmetic,
+    so payments before the window are not visited
+    Args:
+        start_date (date): date when subscription started
+        frequency (str): payment period from the list: daily, weekly, monthly, yearly
+        window_start (date): first day of the window
+        window_end (date): last day of the window, it is included
+    Examples:
+        payment_dates(date(2020, 1, 31), "monthly", date(2020, 2, 1), date(2020, 4, 30)) ->
+        date(2020, 2, 29), date(2020, 3, 31), date(2020, 4, 30)
+    Returns:
+        Iterator[date]: payment dates in ascending order
+    """
+    number = payment_number(start_date, frequency, window_start)
+    day = payment_date(start_date, frequency, number)
+    while day <= window_end:
+        yield day
+        number += 1
+        day = payment_date(start_date, frequency, number)
+
+
+def next_payment_date(start_date: date, frequency: str, today: date = None) -> date:
+    """
+    Return next payment date, that is bigger or equal than today.
+    Computed with calendar arithmetic, without building the sequence of previous payments.
+    Args:
+        start_date (date): date when subscription started
+        frequency (str): payment period from the list: daily, weekly, monthly, yearly
+        today (date): not mandatory, date to count from, date.today() by default
+    Returns:
+        date: date of the next payment. Example: 'date(2020, 06, 18)'
+    """
+    if today is None:
+        today = date.today()
+    return payment_date(
+        start_date, frequency, payment_number(start_date, frequency, today)
+    )
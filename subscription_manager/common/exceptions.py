@@ -16,3 +16,15 @@ class WrongTypeException(SubscriptionException):
 
 class SubsNotFoundException(Exception):
     """Raises when the input subscription was not found"""
+
+
+class WriteFailedException(Exception):
+    """Raises when subscription was not written to database"""
+
+
+class EditConflictException(Exception):
+    """Raises when subscription was changed concurrently during every attempt of edit"""
+
+
+class RatesNotAvailableException(Exception):
+    """Raises when exchange rates can be neither fetched nor loaded from snapshot"""
@@ -1,40 +1,46 @@
-from dataclasses import fields, asdict
-from datetime import datetime, date
+from dataclasses import fields, replace
+from datetime import datetime, date, timedelta
+from operator import is_
 from random import choice, uniform, randint
+from time import time
+from typing import Iterable, List, Tuple
 
 from subscription_manager.common.constants import *
 from subscription_manager.common.exceptions import *
 from subscription_manager.subscription import Subscription
 
 
+OWNER_NAMES = ("Mary", "Eva", "Nancy", "Ann", "Kevin", "John", "Ben", "Robin")
+SUBSCRIPTION_NAMES = (
+    "Google music",
+    "Spotify",
+    "Apple Music",
+    "Youtube Music",
+    "Coursera",
+    "Pluralsight",
+    "Amazon Prime",
+    "Netflix",
+    "Sky Store",
+    "Pet insurance",
+    "Mobile payment",
+)
+
+
 def subscription_generator() -> dict:
     """
     Generate subscription with correct fields.
+    See data_generator.generate_subscriptions for seeded generation of large volumes
     Returns:
         subscription (dict): generated subscription
     """
-    names = ["Mary", "Eva", "Nancy", "Ann", "Kevin", "John", "Ben", "Robin"]
-    subscription_names = [
-        "Google music",
-        "Spotify",
-        "Apple Music",
-        "Youtube Music",
-        "Coursera",
-        "Pluralsight",
-        "Amazon Prime",
-        "Netflix",
-        "Sky Store",
-        "Pet insurance",
-        "Mobile payment",
-    ]
     # generate random day from the beginning of the current year to today
     start_dt = date.today().replace(day=1, month=1).toordinal()
     end_dt = date.today().toordinal()
     random_day = date.fromordinal(randint(start_dt, end_dt))
 
     return dict(
-        owner=choice(names),
-        name=choice(subscription_names),
+        owner=choice(OWNER_NAMES),
+        name=choice(SUBSCRIPTION_NAMES),
         frequency=choice(FREQUENCIES),
         start_date=random_day,
         price=round(uniform(1.99, 49.99), 2),
@@ -43,6 +49,79 @@ def subscription_generator() -> dict:
     )
 
 
+# Expected type of every Subscription field, computed once at import time
+SUBSCRIPTION_FIELDS = {field.name: field.type for field in fields(Subscription)}
+
+
+def _check_currency(currency: str):
+    """Check that given subscription currency is supported"""
+    if currency not in CURRENCIES:
+        raise InvalidValueException(UNEXPECTED_CURRENCY_MSG.format(currency=currency))
+
+
+def _check_frequency(frequency: str):
+    """Check that given subscription frequency is supported"""
+    if frequency not in FREQUENCIES:
+        raise InvalidValueException(UNEXPECTED_FREQUENCY_MSG.format(frequency=frequency))
+
+
+# Cached today's date and timestamp of the next midnight, when the cache expires
+_today_cache = [date.min, 0.0]
+
+
+def today() -> date:
+    """Return date.today(), cached until the next midnight, date.today() is slow for validation hot path"""
+    if time() >= _today_cache[1]:
+        current_date = date.today()
+        next_midnight = datetime.combine(current_date + timedelta(days=1), datetime.min.time())
+        _today_cache[:] = [current_date, next_midnight.timestamp()]
+    return _today_cache[0]
+
+
+def _check_start_date(start_date: date):
+    """Check that start_date is less than today"""
+    if start_date > today():
+        raise InvalidValueException(FUTURE_START_DATE_MSG)
+
+
+# Value checks of the fields in the order they are applied after type checks
+VALUE_CHECKS = (
+    ("currency", _check_currency),
+    ("frequency", _check_frequency),
+    ("start_date", _check_start_date),
+)
+
+
+def _validate_fields(params: dict):
+    """
+    Check types and values of the taken subscription fields
+    Raises:
+        MissingFieldsException: If some of taken fields is not a Subscription field
+        InvalidValueException: If some of taken fields have invalid values
+        WrongTypeException: If some of taken fields have wrong types
+    """
+    # Check that types of all fields are correct, the loop below finds the wrong field
+    if not all(map(is_, map(type, params.values()), map(SUBSCRIPTION_FIELDS.get, params))):
+        _raise_type_error(params)
+    for key, check in VALUE_CHECKS:
+        if key in params:
+            check(params[key])
+
+
+def _raise_type_error(params: dict):
+    """Raise exception for the first field of unknown name or wrong type"""
+    for key, value in params.items():
+        expected_type = SUBSCRIPTION_FIELDS.get(key)
+        if expected_type is None:
+            raise MissingFieldsException(MISSING_FIELDS_MSG)
+        if type(value) is not expected_type:
+            raise WrongTypeException(
+                WRONG_TYPE_MSG.format(
+                    expected=expected_type, recieved_type=type(value), field=value,
+                )
+            )
+
+
 def create_subscription(**params) -> Subscription:
     """
     Take subscription, validate its every field and return Subscription object
@@ -64,37 +143,103 @@ def create_subscription(**params) -> Subscription:
         WrongTypeException: If some of taken fields have wrong types
     """
     # Check that there is no missed fields in the subscription
-    expected_fields = {field.name: field.type for field in fields(Subscription)}
-    if params.keys() != expected_fields.keys():
+    if params.keys() != SUBSCRIPTION_FIELDS.keys():
         raise MissingFieldsException(MISSING_FIELDS_MSG)
+    _validate_fields(params)
+    return Subscription(**params)
 
-    # Check that types of all fields are correct
-    for key, value in params.items():
-        if type(value) != expected_fields[key]:
-            raise WrongTypeException(
-                WRONG_TYPE_MSG.format(
-                    expected=expected_fields[key],
-                    recieved_type=type(value),
-                    field=value,
-                )
-            )
 
-    # Check that given subscription currency is supported
-    if params["currency"] not in CURRENCIES:
-        raise InvalidValueException(
-            UNEXPECTED_CURRENCY_MSG.format(currency=params["currency"])
-        )
+def validate_many(
+    subscriptions: Iterable[dict],
+) -> Tuple[List[Subscription], List[Tuple[int, dict, SubscriptionException]]]:
+    """
+    Validate batch of subscriptions and report all invalid subscriptions at once
+    Args:
+        subscriptions (Iterable[dict]): subscriptions to validate, see create_subscription
+    Returns:
+        Tuple: list of valid Subscription objects
+            and list of invalid subscriptions with their index in the batch and exception
+    """
+    valid = []
+    errors = []
+    for index, params in enumerate(subscriptions):
+        try:
+            valid.append(create_subscription(**params))
+        except SubscriptionException as exc:
+            errors.append((index, params, exc))
+    return valid, errors
 
-    # Check that given subscription frequency is supported
-    if params["frequency"] not in FREQUENCIES:
-        raise InvalidValueException(
-            UNEXPECTED_FREQUENCY_MSG.format(frequency=params["frequency"])
-        )
 
-    # Check that start_date is less than today
-    if params["start_date"] > date.today():
-        raise InvalidValueException(FUTURE_START_DATE_MSG)
-    return Subscription(**params)
+def validate_changes(changes: dict) -> dict:
+    """
+    Validate only the changed fields of subscription
+    Args:
+        changes (dict): dict contains subscription changes
+    Returns:
+        dict: validated changes
+    Raises:
+        MissingFieldsException: If some of changed fields is not a Subscription field
+        InvalidValueException: If some of changed fields have invalid values
+        WrongTypeException: If some of changed fields have wrong types
+    """
+    _validate_fields(changes)
+    return changes
+
+
+def validate_bulk_changes(changes: dict) -> dict:
+    """
+    Validate changes applied to all subscriptions selected by filter, name can not be changed
+    Args:
+        changes (dict): dict contains subscription changes
+    Returns:
+        dict: validated changes
+    Raises:
+        InvalidValueException: If changes contain name or some of changed fields have invalid values
+        MissingFieldsException: If some of changed fields is not a Subscription field
+        WrongTypeException: If some of changed fields have wrong types
+    """
+    if "name" in changes:
+        raise InvalidValueException(BULK_RENAME_MSG)
+    return validate_changes(changes)
+
+
+def validate_filter(subscription_filter: dict) -> dict:
+    """
+    Validate filter, which selects subscriptions by equality of fields
+    Args:
+        subscription_filter (dict): values of fields from FILTER_FIELDS, e.g. {"name": "Spotify"}
+    Returns:
+        dict: validated filter
+    Raises:
+        InvalidValueException: If filter is empty, has not supported field or invalid value
+        WrongTypeException: If some of filter values have wrong types
+    """
+    if not subscription_filter:
+        raise InvalidValueException(EMPTY_FILTER_MSG)
+    for key in subscription_filter:
+        if key not in FILTER_FIELDS:
+            raise InvalidValueException(UNEXPECTED_FILTER_FIELD_MSG.format(field=key))
+    _validate_fields(subscription_filter)
+    return subscription_filter
+
+
+def validate_forecast_window(window_start: date, window_end: date, period: str):
+    """
+    Args:
+        window_start (date): first day of the window
+        window_end (date): last day of the window
+        period (str): period from FORECAST_PERIODS
+    Raises:
+        WrongTypeException: If window bounds are not dates
+        InvalidValueException: If window start is later than its end or period is not supported
+    """
+    for bound in (window_start, window_end):
+        if type(bound) is not date:
+            raise WrongTypeException(WRONG_TYPE_MSG.format(expected=date, recieved_type=type(bound), field=bound))
+    if window_start > window_end:
+        raise InvalidValueException(WRONG_WINDOW_MSG.format(start=window_start, end=window_end))
+    if period not in FORECAST_PERIODS:
+        raise InvalidValueException(UNEXPECTED_PERIOD_MSG.format(period=period))
 
 
 def validate_str_field(field: str, none_allowed: bool = False):
@@ -113,7 +258,6 @@ def validate_str_field(field: str, none_allowed: bool = False):
             WRONG_TYPE_MSG.format(expected=str, recieved_type=type(field), field=field)
         )
     if not none_allowed and field is None:
-        print(none_allowed, field)
         raise WrongTypeException(
             WRONG_TYPE_MSG.format(expected=str, recieved_type=type(field), field=field)
         )
@@ -126,13 +270,11 @@ def validate_subscription_changes(
 ) -> Subscription:
     """
     Validate changes and return updated Subscription object
+    Only changed fields are validated, subscription itself is considered as valid
     Args:
         subscription (Subscription): subscription object to change
         changes (dict): dict contains subscription changes
     Returns:
         Subscription: updated Subscription object to send to to Database
     """
-    updated_subscription: dict = asdict(subscription)
-    updated_subscription.update(changes)
-    result = create_subscription(**updated_subscription)
-    return result
+    return replace(subscription, **validate_changes(changes))
@@ -1,17 +1,220 @@
-from typing import List
+from dataclasses import dataclass, field, replace
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import subscription_manager.common.utils as utils
-from subscription_manager.common.exceptions import SubscriptionException
-from subscription_manager.dbhelper import DBHelper
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_EDIT_RETRIES,
+    EDIT_CONFLICT_MSG,
+    SPEND_GROUP_FIELDS,
+    SUBSCRIPTION_NOT_FOUND_MSG,
+    UNEXPECTED_GROUP_FIELD_MSG,
+    WRITE_FAILED_MSG,
+)
+from subscription_manager.common.exceptions import (
+    EditConflictException,
+    InvalidValueException,
+    SubscriptionException,
+    SubsNotFoundException,
+    WriteFailedException,
+)
+from subscription_manager.base_dbhelper import BaseDBHelper, Change
+from subscription_manager.due_index import DueIndex
+from subscription_manager.forecast import FORECAST_PROJECTION, forecast_totals
+from subscription_manager.listener import SubscriptionListener
+from subscription_manager.owner_totals import OwnerTotals
+from subscription_manager.reminder_scheduler import Reminder, ReminderScheduler
+from subscription_manager.snapshot import SnapshotStore
 from subscription_manager.subscription import Subscription
 
+# Fields of streamed subscription, which were not received with projection
+_EMPTY_SUBSCRIPTION = dict.fromkeys(utils.SUBSCRIPTION_FIELDS)
 
-class Controller:
-    """Class for creation, validation, edition, deletion and getting of subscription objects"""
+if TYPE_CHECKING:
+    # numpy is imported only when subscriptions table is requested, it dominates import time of Controller
+    from subscription_manager.subscription_table import SubscriptionTable
+
+
+@dataclass
+class BulkAddResult:
+    """Result of bulk subscriptions addition
+        Attributes:
+            inserted_ids (list): identifiers of created subscriptions
+            rejected (List[Tuple[int, dict, Exception]]): index in the taken iterable, subscription and the reason
+    """
+
+    inserted_ids: list = field(default_factory=list)
+    rejected: List[Tuple[int, dict, Exception]] = field(default_factory=list)
+
+
+@dataclass
+class BulkEditResult:
+    """Result of bulk subscriptions edition
+        Attributes:
+            matched (int): count of subscriptions selected by the filter
+            modified (int): count of subscriptions, which fields were changed
+    """
+
+    matched: int = 0
+    modified: int = 0
+
+
+class BaseController:
+    """Listeners, validation and batching shared by Controller and AsyncController,
+    the controllers differ only in the way they call storage helper
+    """
 
-    def __init__(self, dbhelper: DBHelper):
-        """Takes DBHelper instance for communicating with database"""
+    def __init__(self, dbhelper, listeners: List[SubscriptionListener] = None):
         self.dbhelper = dbhelper
+        self.listeners: List[SubscriptionListener] = list(listeners or [])
+        # local copy of subscriptions for reads, see open_snapshot
+        self.snapshot: Optional[SnapshotStore] = None
+
+    def add_listener(self, listener: SubscriptionListener):
+        """Register listener, that will be notified about subscriptions changes"""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: SubscriptionListener):
+        """Unregister listener"""
+        self.listeners.remove(listener)
+
+    @staticmethod
+    def _validated_batches(
+        subscriptions: Iterable[dict], batch_size: int, result: BulkAddResult
+    ) -> Iterator[List[Tuple[int, dict, Subscription]]]:
+        """Validate subscriptions and yield batches of valid ones, invalid ones are put to the result"""
+        batch = []
+        for index, subscription_dict in enumerate(subscriptions):
+            try:
+                subscription_obj = utils.create_subscription(**subscription_dict)
+            except SubscriptionException as exc:
+                result.rejected.append((index, subscription_dict, exc))
+                continue
+            batch.append((index, subscription_dict, subscription_obj))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _collect_batch(
+        self,
+        batch: List[Tuple[int, dict, Subscription]],
+        inserted_ids: list,
+        errors: Dict[int, str],
+        result: BulkAddResult,
+    ):
+        """Put inserted identifiers and write errors of the written batch to the result and notify listeners"""
+        for position, (index, subscription_dict, subscription_obj) in enumerate(batch):
+            if position in errors:
+                error = WriteFailedException(WRITE_FAILED_MSG.format(error=errors[position]))
+                result.rejected.append((index, subscription_dict, error))
+                continue
+            result.inserted_ids.append(inserted_ids[position])
+            self._notify_added(subscription_obj)
+
+    @staticmethod
+    def _sort_rejected(result: BulkAddResult) -> BulkAddResult:
+        # write errors are added after validation errors of the next items
+        result.rejected.sort(key=lambda rejected: rejected[0])
+        return result
+
+    def _notify_added(self, subscription: Subscription):
+        for listener in self.listeners:
+            listener.subscription_added(subscription)
+
+    def _notify_edited(
+        self, subscription_name: str, changed: Optional[dict], changes: dict, owner: str = None
+    ) -> Optional[Subscription]:
+        """
+        Notify listeners about subscription changed by storage helper, None is returned if nothing was changed.
+        Owner before changes is taken from the changed subscription, if owner is not changed
+        """
+        if changed is None:
+            return None
+        subscription = Subscription(**changed)
+        if owner is None and "owner" not in changes:
+            owner = subscription.owner
+        for listener in self.listeners:
+            listener.subscription_edited(subscription_name, subscription, owner)
+        return subscription
+
+    def _notify_bulk_edited(self, matched_subscriptions: List[Subscription], changes: dict):
+        """Notify listeners about matched subscriptions, which fields differ from the changes"""
+        for subscription in matched_subscriptions:
+            changed = replace(subscription, **changes)
+            if changed != subscription:
+                for listener in self.listeners:
+                    listener.subscription_edited(subscription.name, changed, subscription.owner)
+
+    def _notify_deleted(self, subscription_name: str, owner: Optional[str], deleted_subscriptions_count: int):
+        if deleted_subscriptions_count:
+            for listener in self.listeners:
+                listener.subscription_deleted(subscription_name, owner)
+
+    @staticmethod
+    def _validate_bulk_edit(subscription_filter: dict, subscription_changes: dict) -> Tuple[dict, dict]:
+        try:
+            return utils.validate_filter(subscription_filter), utils.validate_bulk_changes(subscription_changes)
+        except SubscriptionException:
+            raise
+
+    @staticmethod
+    def _validate_summary(owner: Optional[str], group_by: Sequence[str]) -> Tuple[str, ...]:
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+        except SubscriptionException:
+            raise
+        for group_field in group_by:
+            if group_field not in SPEND_GROUP_FIELDS:
+                raise InvalidValueException(UNEXPECTED_GROUP_FIELD_MSG.format(field=group_field))
+        return tuple(group_by)
+
+    @staticmethod
+    def _validate_forecast(owner: Optional[str], window_start: date, window_end: date, period: str):
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+            utils.validate_forecast_window(window_start, window_end, period)
+        except SubscriptionException:
+            raise
+
+    @staticmethod
+    def _from_stream(document: dict, partial: bool) -> Subscription:
+        """Convert streamed document to Subscription object, fields that were not received are set to None"""
+        return Subscription(**{**_EMPTY_SUBSCRIPTION, **document}) if partial else Subscription(**document)
+
+    def _snapshot_get(self, subscription_name: str) -> Optional[Subscription]:
+        """Return subscription from snapshot, None if there is no snapshot or subscription is not known locally"""
+        return None if self.snapshot is None else self.snapshot.get(subscription_name)
+
+    def _snapshot_list(self, owner: str = None) -> Optional[List[Subscription]]:
+        """Return subscriptions from snapshot, None until snapshot file is mapped"""
+        if self.snapshot is not None and self.snapshot.available:
+            return self.snapshot.list(owner)
+        return None
+
+    def _attach_snapshot(self, path: str) -> SnapshotStore:
+        store = SnapshotStore(path)
+        self.add_listener(store)
+        self.snapshot = store
+        return store
+
+    def _detach_snapshot(self) -> Optional[SnapshotStore]:
+        store = self.snapshot
+        if store is not None:
+            self.remove_listener(store)
+            self.snapshot = None
+        return store
+
+
+class Controller(BaseController):
+    """Class for creation, validation, edition, deletion and getting of subscription objects"""
+
+    def __init__(self, dbhelper: BaseDBHelper, listeners: List[SubscriptionListener] = None):
+        """Takes storage helper (DBHelper, InMemoryDBHelper, SQLiteDBHelper) for communicating with database
+        and not mandatory listeners, that are notified about every change of subscriptions"""
+        super().__init__(dbhelper, listeners)
 
     def add_subscription(self, subscription_dict: dict) -> int:
         """
@@ -35,13 +238,37 @@ class Controller:
         except SubscriptionException:
             raise
         result_id = self.dbhelper.add_subscription(subscription_obj)
+        self._notify_added(subscription_obj)
         return result_id
 
+    def add_subscriptions(
+        self, subscriptions: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> BulkAddResult:
+        """
+        Add many subscriptions to database.
+        Validates every subscription, invalid ones are reported and skipped,
+        valid ones are sent to DBHelper in batches of batch_size subscriptions
+        Args:
+            subscriptions (Iterable[dict]): subscriptions to add, see add_subscription
+            batch_size (int): count of subscriptions written to database with one request
+        Returns:
+            BulkAddResult: identifiers of created subscriptions and rejected subscriptions
+        """
+        result = BulkAddResult()
+        for batch in self._validated_batches(subscriptions, batch_size, result):
+            inserted_ids, errors = self.dbhelper.add_subscriptions(
+                [subscription_obj for _, _, subscription_obj in batch]
+            )
+            self._collect_batch(batch, inserted_ids, errors, result)
+        return self._sort_rejected(result)
+
     def edit_subscription(
         self, subscription_name: str, subscription_changes: dict
     ) -> int:
         """
-        Validate changes and edit subscription in database
+        Validate changes and edit subscription in database.
+        Only the changed fields are validated and written with one atomic request,
+        so concurrent edits of different fields don't overwrite each other
         Args:
             subscription_name (str): name of subscription to change
             subscription_changes (dict):  dict contains changes for subscription
@@ -50,18 +277,92 @@ class Controller:
             {"price": 8.99,
              "comment": 'Price has been increased since Jun, 21'}
         Returns:
-            int: count of changed subscriptions
+            int: always 1, subscription found by name is stamped with a new version even if the changes
+                are equal to its fields, so the count of subscriptions with changed fields is not known
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in database
         """
         try:
             utils.validate_str_field(field=subscription_name)
-            subscription_to_edit = self.get_subscription_by_name(subscription_name)
-            subscription_to_change = utils.validate_subscription_changes(
-                subscription_to_edit, subscription_changes
-            )
+            changes = utils.validate_changes(subscription_changes)
         except SubscriptionException:
             raise
-        result = self.dbhelper.update_subscription(subscription_to_change)
-        return result
+        # listeners keep subscriptions by owner, so the owner before changes is read when it is changed
+        owner = self._owner_of(subscription_name) if self.listeners and "owner" in changes else None
+        if self._apply_changes(subscription_name, changes, owner=owner) is None:
+            raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+        return 1
+
+    def modify_subscription(
+        self,
+        subscription_name: str,
+        modify: Callable[[Subscription], dict],
+        retries: int = DEFAULT_EDIT_RETRIES,
+    ) -> Subscription:
+        """
+        Edit subscription with changes computed from its current state, e.g. raise price by 10%.
+        Changes are applied only if subscription was not changed after it was read,
+        otherwise subscription is read again and the changes are recomputed
+        Args:
+            subscription_name (str): name of subscription to change
+            modify (Callable): function taking current subscription and returning dict of changes
+            retries (int): count of attempts
+        Examples:
+            modify_subscription("Spotify", lambda subscription: {"price": round(subscription.price * 1.1, 2)})
+        Returns:
+            Subscription: changed subscription
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in database
+            EditConflictException: when subscription was changed concurrently during every attempt
+        """
+        try:
+            utils.validate_str_field(field=subscription_name)
+        except SubscriptionException:
+            raise
+        for _ in range(retries):
+            document, version = self.dbhelper.get_versioned_subscription(subscription_name)
+            changes = utils.validate_changes(modify(Subscription(**document)))
+            subscription = self._apply_changes(subscription_name, changes, version, document["owner"])
+            if subscription is not None:
+                return subscription
+        raise EditConflictException(EDIT_CONFLICT_MSG.format(name=subscription_name, retries=retries))
+
+    def bulk_edit(self, subscription_filter: dict, subscription_changes: dict) -> BulkEditResult:
+        """
+        Apply the same changes to all subscriptions selected by filter with one request.
+        Changes are validated once, filter fields are indexed in database.
+        If there are listeners, changed subscriptions are read before the update to notify them
+        Args:
+            subscription_filter (dict): values of fields from FILTER_FIELDS, e.g. {"name": "Spotify"}
+            subscription_changes (dict): dict contains changes for subscriptions
+        Examples:
+            bulk_edit({"name": "Spotify", "currency": "GBP"}, {"price": 10.99})
+        Returns:
+            BulkEditResult: count of matched and count of changed subscriptions
+        Raises:
+            InvalidValueException: when filter is empty or contains not supported field, or changes contain name
+        """
+        subscription_filter, changes = self._validate_bulk_edit(subscription_filter, subscription_changes)
+        matched_subscriptions = (
+            [Subscription(**document) for document in self.dbhelper.find_subscriptions(subscription_filter)]
+            if self.listeners else []
+        )
+        matched, modified = self.dbhelper.update_subscriptions(subscription_filter, changes)
+        self._notify_bulk_edited(matched_subscriptions, changes)
+        return BulkEditResult(matched, modified)
+
+    def _apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None, owner: str = None
+    ) -> Optional[Subscription]:
+        """Send validated changes to DBHelper and notify listeners, None is returned if nothing was changed"""
+        changed = self.dbhelper.apply_changes(subscription_name, changes, expected_version)
+        return self._notify_edited(subscription_name, changed, changes, owner)
+
+    def _owner_of(self, subscription_name: str) -> Optional[str]:
+        """Return owner of the first subscription with the name, None if there is no such subscription"""
+        for document in self.dbhelper.find_subscriptions({"name": subscription_name}, {"owner": True}):
+            return document["owner"]
+        return None
 
     def delete_subscription(self, subscription_name: str) -> int:
         """
@@ -75,9 +376,12 @@ class Controller:
             utils.validate_str_field(field=subscription_name)
         except SubscriptionException:
             raise
+        # listeners keep subscriptions by owner, so the owner is read before deletion
+        owner = self._owner_of(subscription_name) if self.listeners else None
         deleted_subscriptions_count = self.dbhelper.delete_subscription(
             subscription_name
         )
+        self._notify_deleted(subscription_name, owner, deleted_subscriptions_count)
         return deleted_subscriptions_count
 
     def get_subscription_by_name(self, subscription_name: str) -> Subscription:
@@ -92,6 +396,9 @@ class Controller:
             utils.validate_str_field(field=subscription_name)
         except SubscriptionException:
             raise
+        subscription = self._snapshot_get(subscription_name)
+        if subscription is not None:
+            return subscription
         received_subscription: dict = self.dbhelper.get_subscription(subscription_name)
         return Subscription(**received_subscription)
 
@@ -107,6 +414,173 @@ class Controller:
             utils.validate_str_field(field=owner, none_allowed=True)
         except SubscriptionException:
             raise
+        subscriptions = self._snapshot_list(owner)
+        if subscriptions is not None:
+            return subscriptions
         subscription_list = self.dbhelper.get_all_subscriptions(owner)
         # Convert start_date type from datetime to date, convert every dict to Subscription
         return [Subscription(**subscription) for subscription in subscription_list]
+
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> Iterator[Subscription]:
+        """
+        Lazily yield subscriptions from database cursor, memory does not grow with collection size
+        Args:
+            owner (str): not mandatory, if not None yields all subscriptions of specified owner
+            batch_size (int): count of documents received from database with one request
+            projection (dict): not mandatory, fields to return or exclude, e.g. {"comment": False},
+                fields that were not received are set to None
+        Returns:
+            Iterator[Subscription]: all subscriptions or all user's subscription if owner is specified
+        """
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+        except SubscriptionException:
+            raise
+        documents = self.dbhelper.iter_subscriptions(
+            owner, batch_size=batch_size, projection=projection
+        )
+        return self._stream_subscriptions(documents, projection is not None)
+
+    def _stream_subscriptions(self, documents: Iterable[dict], partial: bool) -> Iterator[Subscription]:
+        """Convert documents to Subscription objects one by one"""
+        for document in documents:
+            yield self._from_stream(document, partial)
+
+    def get_subscriptions_table(self, owner: str = None) -> "SubscriptionTable":
+        """
+        Return subscriptions in columnar container, it takes less memory than list for large result sets
+        Args:
+            owner (str): not mandatory, if not None returns all subscriptions of specified owner
+        Returns:
+            SubscriptionTable: all subscriptions or all user's subscription if owner is specified
+        """
+        try:
+            utils.validate_str_field(field=owner, none_allowed=True)
+        except SubscriptionException:
+            raise
+        from subscription_manager.subscription_table import SubscriptionTable
+
+        return SubscriptionTable.from_documents(self.dbhelper.get_all_subscriptions(owner))
+
+    def spend_summary(
+        self, owner: str = None, group_by: Sequence[str] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        """
+        Return monthly spend grouped by owner, currency and frequency or by part of these fields.
+        Every price is normalized to a per-month amount, e.g. yearly price is divided by 12.
+        Prices in different currencies are not converted, so currency should be grouped by to get meaningful sums
+        Args:
+            owner (str): not mandatory, if not None only subscriptions of specified owner are summed
+            group_by (Sequence[str]): fields from SPEND_GROUP_FIELDS
+        Examples:
+            spend_summary("Mary", ("currency",)) ->
+            [{"currency": "GBP", "monthly_spend": 17.98, "count": 2},
+             {"currency": "USD", "monthly_spend": 1.25, "count": 1}]
+        Returns:
+            List[dict]: rows sorted by group fields with monthly_spend and count of subscriptions
+        Raises:
+            InvalidValueException: when group_by contains unexpected field
+        """
+        return self.dbhelper.spend_summary(owner, self._validate_summary(owner, group_by))
+
+    def forecast(
+        self, window_start: date, window_end: date, owner: str = None, period: str = "day"
+    ) -> List[dict]:
+        """
+        Return totals of payments expected from window_start to window_end inclusive.
+        Subscriptions are streamed from storage, so memory is bounded by count of periods and currencies
+        Args:
+            window_start (date): first day of the window
+            window_end (date): last day of the window
+            owner (str): not mandatory, if not None only subscriptions of specified owner are forecasted
+            period (str): "day" for daily totals or "month" for monthly totals
+        Examples:
+            forecast(date(2020, 7, 1), date(2020, 8, 31), "Mary", "month") ->
+            [{"date": date(2020, 7, 1), "currency": "GBP", "total": 21.98, "count": 2},
+             {"date": date(2020, 8, 1), "currency": "GBP", "total": 21.98, "count": 2}]
+        Returns:
+            List[dict]: rows sorted by date and currency with date (first day of the period), currency,
+                total of prices and count of payments
+        Raises:
+            WrongTypeException: when window bounds are not dates
+            InvalidValueException: when window start is later than its end or period is not supported
+        """
+        self._validate_forecast(owner, window_start, window_end, period)
+        subscriptions = self.dbhelper.iter_subscriptions(owner, projection=FORECAST_PROJECTION)
+        return forecast_totals(subscriptions, window_start, window_end, period)
+
+    def changes_since(self, watermark: int = 0) -> List[Change]:
+        """
+        Return subscriptions written and names of subscriptions deleted or renamed after the watermark,
+        so local copies apply only changes instead of receiving all subscriptions again
+        Args:
+            watermark (int): the largest sequence number applied by the caller, 0 returns all subscriptions
+        Returns:
+            List[Change]: changes in the order of sequence numbers, subscriptions are dicts
+        """
+        return self.dbhelper.changes_since(watermark)
+
+    def open_snapshot(self, path: str, sync: bool = True) -> SnapshotStore:
+        """
+        Serve get_subscription_by_name and get_subscriptions_list from local snapshot file.
+        Snapshot is memory-mapped, so reads are served at once after restart, changes made by Controller
+        are applied over it. Subscriptions missing in snapshot are requested from storage
+        Args:
+            path (str): path of snapshot file, it is created by the first sync
+            sync (bool): apply storage changes made after the snapshot in background thread
+        Returns:
+            SnapshotStore: snapshot store, SnapshotStore.wait_synced waits for background sync
+        """
+        store = self._attach_snapshot(path)
+        if sync:
+            store.start_sync(self.dbhelper)
+        return store
+
+    def close_snapshot(self):
+        """Serve reads from storage again, changes kept over snapshot are written to its file"""
+        store = self._detach_snapshot()
+        if store is not None:
+            store.wait_synced()
+            store.close()
+
+    def create_due_index(self, owner: str = None) -> DueIndex:
+        """
+        Build index of subscriptions by next payment date and keep it up to date with changes made by Controller
+        Args:
+            owner (str): not mandatory, if not None index contains only subscriptions of specified owner
+        Returns:
+            DueIndex: index for queries like "subscriptions due in the next N days"
+        """
+        due_index = DueIndex(self.get_subscriptions_list(owner), owner=owner)
+        self.add_listener(due_index)
+        return due_index
+
+    def create_owner_totals(self, collection=None) -> OwnerTotals:
+        """
+        Build per-owner spend totals and keep them up to date with changes made by Controller
+        Args:
+            collection: not mandatory, MongoDB collection to persist totals, e.g. DBHelper.owner_totals
+        Returns:
+            OwnerTotals: totals with O(1) reads, see OwnerTotals.check for consistency check
+        """
+        owner_totals = OwnerTotals.build(self.dbhelper, collection)
+        self.add_listener(owner_totals)
+        return owner_totals
+
+    def create_reminder_scheduler(
+        self, send: Callable[[List[Reminder]], None], owner: str = None, **options
+    ) -> ReminderScheduler:
+        """
+        Build scheduler of payment reminders and re-arm its entries with changes made by Controller
+        Args:
+            send (Callable[[List[Reminder]], None]): receiver of reminder batches, e.g. messenger client
+            owner (str): not mandatory, if not None only subscriptions of specified owner are scheduled
+            options: clock, lead_days, remind_at and batch_size of ReminderScheduler
+        Returns:
+            ReminderScheduler: scheduler, ReminderScheduler.run sends reminders as their moments come
+        """
+        scheduler = ReminderScheduler(send, self.iter_subscriptions(owner), owner=owner, **options)
+        self.add_listener(scheduler)
+        return scheduler
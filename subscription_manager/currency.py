@@ -0,0 +1,189 @@
+import json
+import os
+from dataclasses import dataclass
+from datetime import date
+from threading import Lock
+from time import monotonic
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import subscription_manager.common.utils as utils
+from subscription_manager.common.constants import DEFAULT_RATES_RETRY_INTERVAL, RATES_NOT_AVAILABLE_MSG
+from subscription_manager.common.exceptions import RatesNotAvailableException
+from subscription_manager.subscription_table import DictionaryColumn, SubscriptionTable
+
+# Function returning rates for the base currency: {currency: amount of currency for 1 unit of base}
+RateSource = Callable[[str], Dict[str, float]]
+
+
+def forex_rate_source(base_currency: str) -> Dict[str, float]:
+    """Fetch the whole rate table for the base currency with forex-python"""
+    from forex_python.converter import CurrencyRates
+
+    return CurrencyRates().get_rates(base_currency)
+
+
+@dataclass
+class RateTable:
+    """Exchange rates of one base currency
+        Attributes:
+            base (str): base currency
+            fetched_on (date): date when rates were fetched from the source
+            rates (Dict[str, float]): amount of every currency for 1 unit of base currency
+    """
+
+    base: str
+    fetched_on: date
+    rates: Dict[str, float]
+
+    def rate(self, currency: str) -> float:
+        """Return amount of currency for 1 unit of base currency"""
+        if currency == self.base:
+            return 1.0
+        try:
+            return self.rates[currency]
+        except KeyError:
+            raise RatesNotAvailableException(
+                RATES_NOT_AVAILABLE_MSG.format(currency=currency, error=f"no rate to {self.base}")
+            ) from None
+
+
+class CurrencyConverter:
+    """Currency conversion with rate tables memoized for a day.
+    Every base currency is fetched from the source at most once per day,
+    fetched tables are persisted to the snapshot file, which is used when the source is not available.
+    Snapshot rates are memoized only for retry_interval, then the source is asked again.
+        Attributes:
+            source (RateSource): function fetching rates, forex-python by default
+            snapshot_path (str): not mandatory, JSON file with the last fetched rate tables
+            today (Callable): function returning current date
+            retry_interval (float): seconds before the failed source is asked again
+            clock (Callable): function returning current time in seconds
+    """
+
+    def __init__(
+        self,
+        source: RateSource = forex_rate_source,
+        snapshot_path: Optional[str] = None,
+        today: Callable[[], date] = utils.today,
+        retry_interval: float = DEFAULT_RATES_RETRY_INTERVAL,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.source = source
+        self.snapshot_path = snapshot_path
+        self.today = today
+        self.retry_interval = retry_interval
+        self.clock = clock
+        # base currency -> (day of memoization, time of retry or None for today's rates, rate table)
+        self._tables: Dict[str, Tuple[date, Optional[float], RateTable]] = {}
+        self._lock = Lock()
+
+    def _memoized(self, base_currency: str, today: date) -> Optional[RateTable]:
+        memoized = self._tables.get(base_currency)
+        if memoized is None:
+            return None
+        day, retry_at, table = memoized
+        if day != today or (retry_at is not None and self.clock() >= retry_at):
+            return None
+        return table
+
+    def get_rates(self, base_currency: str) -> RateTable:
+        """
+        Return rate table of the base currency
+        Args:
+            base_currency (str): currency, which rates are returned
+        Returns:
+            RateTable: today's rates, or the last persisted rates when the source fails
+        Raises:
+            RatesNotAvailableException: when source fails and snapshot has no rates of the currency
+        """
+        today = self.today()
+        table = self._memoized(base_currency, today)
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._memoized(base_currency, today)
+            if table is not None:
+                return table
+            table = self._fetch(base_currency, today)
+            # older snapshot rates are memoized for a short time, so offline process does not wait
+            # for network on every call, and today's rates are fetched soon after the source recovers
+            retry_at = None if table.fetched_on == today else self.clock() + self.retry_interval
+            self._tables[base_currency] = (today, retry_at, table)
+            return table
+
+    def _fetch(self, base_currency: str, today: date) -> RateTable:
+        try:
+            rates = self.source(base_currency)
+        except Exception as exc:  # network and API errors of the source are not known in advance
+            table = self._load_snapshot().get(base_currency)
+            if table is None:
+                raise RatesNotAvailableException(
+                    RATES_NOT_AVAILABLE_MSG.format(currency=base_currency, error=exc)
+                ) from exc
+            return table
+        table = RateTable(base_currency, today, dict(rates))
+        self._save_snapshot(table)
+        return table
+
+    def _load_snapshot(self) -> Dict[str, RateTable]:
+        if self.snapshot_path is None or not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, encoding="utf-8") as snapshot:
+            return {
+                base: RateTable(base, date.fromisoformat(table["fetched_on"]), table["rates"])
+                for base, table in json.load(snapshot).items()
+            }
+
+    def _save_snapshot(self, table: RateTable):
+        if self.snapshot_path is None:
+            return
+        tables = self._load_snapshot()
+        tables[table.base] = table
+        content = {
+            base: {"fetched_on": table.fetched_on.isoformat(), "rates": table.rates}
+            for base, table in tables.items()
+        }
+        # file is replaced at once, so reader never sees half written snapshot
+        temporary_path = f"{self.snapshot_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as snapshot:
+            json.dump(content, snapshot)
+        os.replace(temporary_path, self.snapshot_path)
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """Return amount of to_currency for 1 unit of from_currency"""
+        if from_currency == to_currency:
+            return 1.0
+        return 1.0 / self.get_rates(to_currency).rate(from_currency)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+        """Convert amount from one currency to another"""
+        return amount * self.rate(from_currency, to_currency)
+
+    def convert_many(
+        self,
+        prices: Sequence[float],
+        currencies: Union[Sequence[str], DictionaryColumn],
+        to_currency: str,
+    ) -> np.ndarray:
+        """
+        Convert prices in different currencies to one currency.
+        Only the rate table of to_currency is used, rates are looked up once per distinct currency
+        and applied to the whole array with one multiplication.
+        Args:
+            prices (Sequence[float]): prices to convert
+            currencies (Sequence[str] or DictionaryColumn): currency of every price
+            to_currency (str): currency to convert to
+        Returns:
+            np.ndarray: float64 array of converted prices
+        """
+        if not isinstance(currencies, DictionaryColumn):
+            currencies = DictionaryColumn.encode(currencies)
+        table = self.get_rates(to_currency)
+        factors = np.array([1.0 / table.rate(currency) for currency in currencies.values], dtype=np.float64)
+        return np.asarray(prices, dtype=np.float64) * factors[currencies.codes]
+
+    def convert_table(self, table: SubscriptionTable, to_currency: str) -> np.ndarray:
+        """Return prices of all rows of subscription table in one currency"""
+        return self.convert_many(table.prices, table.currencies, to_currency)
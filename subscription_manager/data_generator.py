@@ -0,0 +1,170 @@
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+
+from subscription_manager.base_dbhelper import BaseDBHelper
+from subscription_manager.common.constants import DEFAULT_BATCH_SIZE
+from subscription_manager.common.utils import SUBSCRIPTION_NAMES
+from subscription_manager.subscription import Subscription
+
+# Count of subscriptions drawn with one call of numpy generator, it bounds memory of streaming
+GENERATION_CHUNK_SIZE = 65_536
+
+
+@dataclass
+class GeneratorConfig:
+    """Distributions of generated subscriptions
+        Attributes:
+            owners (int): count of distinct owners
+            owner_skew (float): exponent of Zipf-like distribution of owners, 0 for uniform
+            mean_age_days (float): mean age of subscriptions in days, ages are distributed exponentially
+            max_age_days (int): max age of subscriptions in days
+            frequencies (Dict[str, float]): weights of frequencies
+            currencies (Dict[str, float]): weights of currencies
+            price_median (float): median price, prices are distributed log-normally
+            price_sigma (float): standard deviation of price logarithm
+            min_price (float): min price
+            max_price (float): max price
+            unique_names (bool): add number to every name, so names can be used as identifiers
+    """
+
+    owners: int = 10_000
+    owner_skew: float = 1.1
+    mean_age_days: float = 730.0
+    max_age_days: int = 3650
+    frequencies: Dict[str, float] = field(
+        default_factory=lambda: {"monthly": 0.6, "yearly": 0.2, "weekly": 0.1, "daily": 0.1}
+    )
+    currencies: Dict[str, float] = field(
+        default_factory=lambda: {"USD": 0.35, "EUR": 0.25, "GBP": 0.2, "RUB": 0.1, "CNY": 0.1}
+    )
+    price_median: float = 9.99
+    price_sigma: float = 0.8
+    min_price: float = 0.99
+    max_price: float = 999.99
+    unique_names: bool = True
+
+
+def _probabilities(weights: Iterable[float]) -> np.ndarray:
+    weights = np.asarray(list(weights), dtype=np.float64)
+    return weights / weights.sum()
+
+
+def generate_subscriptions(
+    count: int, config: GeneratorConfig = None, seed: int = 0, today: date = None
+) -> Iterator[dict]:
+    """
+    Stream valid subscriptions drawn from the configured distributions.
+    The same seed, config and today give the same subscriptions. Values are drawn by numpy in chunks,
+    only dicts are built one by one
+    Args:
+        count (int): count of subscriptions
+        config (GeneratorConfig): not mandatory, distributions, GeneratorConfig() by default
+        seed (int): seed of random generator
+        today (date): not mandatory, start dates are not later than today, date.today() by default
+    Returns:
+        Iterator[dict]: subscriptions in the format of Controller.add_subscription
+    """
+    config = GeneratorConfig() if config is None else config
+    today_ordinal = (date.today() if today is None else today).toordinal()
+    rng = np.random.default_rng(seed)
+    owners = [f"Owner {number}" for number in range(config.owners)]
+    owner_probabilities = _probabilities(
+        1 / np.arange(1, config.owners + 1, dtype=np.float64) ** config.owner_skew
+    )
+    frequencies = list(config.frequencies)
+    frequency_probabilities = _probabilities(config.frequencies.values())
+    currencies = list(config.currencies)
+    currency_probabilities = _probabilities(config.currencies.values())
+    # decoded values are reused, so only one date object is created for every day
+    start_dates = [date.fromordinal(today_ordinal - age) for age in range(config.max_age_days + 1)]
+
+    for chunk_start in range(0, count, GENERATION_CHUNK_SIZE):
+        size = min(GENERATION_CHUNK_SIZE, count - chunk_start)
+        owner_codes = rng.choice(config.owners, size=size, p=owner_probabilities).tolist()
+        name_codes = rng.integers(len(SUBSCRIPTION_NAMES), size=size).tolist()
+        frequency_codes = rng.choice(len(frequencies), size=size, p=frequency_probabilities).tolist()
+        currency_codes = rng.choice(len(currencies), size=size, p=currency_probabilities).tolist()
+        ages = np.minimum(
+            rng.exponential(config.mean_age_days, size=size), config.max_age_days
+        ).astype(np.int64).tolist()
+        prices = np.clip(
+            rng.lognormal(np.log(config.price_median), config.price_sigma, size=size),
+            config.min_price,
+            config.max_price,
+        ).round(2).tolist()
+        for offset in range(size):
+            name = SUBSCRIPTION_NAMES[name_codes[offset]]
+            yield {
+                "owner": owners[owner_codes[offset]],
+                "name": f"{name} {chunk_start + offset}" if config.unique_names else name,
+                "frequency": frequencies[frequency_codes[offset]],
+                "start_date": start_dates[ages[offset]],
+                "price": prices[offset],
+                "currency": currencies[currency_codes[offset]],
+                "comment": "",
+            }
+
+
+def to_json_line(subscription: dict) -> str:
+    """Encode subscription as one JSON line, fields are known, so the generic encoder is not needed"""
+    return (
+        f'{{"owner": {encode_basestring_ascii(subscription["owner"])}, '
+        f'"name": {encode_basestring_ascii(subscription["name"])}, '
+        f'"frequency": {encode_basestring_ascii(subscription["frequency"])}, '
+        f'"start_date": "{subscription["start_date"].isoformat()}", '
+        f'"price": {float(subscription["price"])!r}, '
+        f'"currency": {encode_basestring_ascii(subscription["currency"])}, '
+        f'"comment": {encode_basestring_ascii(subscription["comment"])}}}\n'
+    )
+
+
+def write_jsonl(subscriptions: Iterable[dict], path: str) -> int:
+    """
+    Write subscriptions to JSON Lines file, start_date is written in ISO format
+    Returns:
+        int: count of written subscriptions
+    """
+    written = 0
+    subscriptions = iter(subscriptions)
+    with open(path, "w", encoding="utf-8") as output:
+        while True:
+            chunk = islice(subscriptions, GENERATION_CHUNK_SIZE)
+            lines = [to_json_line(subscription) for subscription in chunk]
+            if not lines:
+                return written
+            output.writelines(lines)
+            written += len(lines)
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    """Stream subscriptions from JSON Lines file written by write_jsonl"""
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            subscription = json.loads(line)
+            subscription["start_date"] = date.fromisoformat(subscription["start_date"])
+            yield subscription
+
+
+def insert_subscriptions(
+    dbhelper: BaseDBHelper, subscriptions: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """
+    Insert generated subscriptions with bulk requests of batch_size subscriptions.
+    Generated subscriptions are valid, so validation of Controller is skipped
+    Returns:
+        int: count of inserted subscriptions
+    """
+    inserted = 0
+    subscriptions = iter(subscriptions)
+    while True:
+        batch = [Subscription(**subscription) for subscription in islice(subscriptions, batch_size)]
+        if not batch:
+            return inserted
+        inserted_ids, _ = dbhelper.add_subscriptions(batch)
+        inserted += sum(inserted_id is not None for inserted_id in inserted_ids)
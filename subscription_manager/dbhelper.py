@@ -1,17 +1,597 @@
-from pymongo import MongoClient
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, time
+from threading import Event
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple
 
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
 
-class DBHelper:
-    """Class for communication with MongoDB"""
-    def __init__(self, db_url: str, db_credentials: dict, db_name: str):
-        _connection_string = \
-            f"mongodb+srv://{db_credentials['user']}:{db_credentials['password']}@{db_url}/{db_name}?" \
-            f"retryWrites=true&w=majority"
-        self.client = MongoClient(_connection_string)
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, ChangeWatermark, sort_changes
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHANGES_OVERLAP,
+    DEFAULT_CHANGES_POLL_INTERVAL,
+    DEFAULT_COLLECTION_NAME,
+    KEY_FIELDS,
+    OWNER_TOTALS_COLLECTION_NAME,
+    SEQUENCES_COLLECTION_NAME,
+    SPEND_GROUP_FIELDS,
+    SUBSCRIPTION_INDEXES,
+    SUBSCRIPTION_NOT_FOUND_MSG,
+    TOMBSTONES_COLLECTION_NAME,
+)
+from subscription_manager.common.dates import PAYMENTS_PER_MONTH
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.listener import SubscriptionKey
+from subscription_manager.mongo_pool import PoolConfig, get_client
+from subscription_manager.subscription import Subscription
+
+
+def to_document(subscription: Subscription) -> dict:
+    """Convert Subscription to MongoDB document, start_date is stored as datetime"""
+    document = asdict(subscription)
+    document["start_date"] = datetime.combine(subscription.start_date, time())
+    return document
+
+
+def to_new_document(subscription: Subscription, sequence: int) -> dict:
+    """Convert Subscription to MongoDB document of not changed subscription with version 0 and sequence number"""
+    document = to_document(subscription)
+    document["version"] = 0
+    document["sequence"] = sequence
+    return document
+
+
+def to_document_changes(changes: dict) -> dict:
+    """Convert changes of subscription fields to MongoDB $set operand, start_date is stored as datetime"""
+    if "start_date" not in changes:
+        return changes
+    return {**changes, "start_date": datetime.combine(changes["start_date"], time())}
+
+
+def version_query(subscription_name: str, expected_version: int = None) -> dict:
+    """Return query of subscription by name and version, documents written before versioning have version 0"""
+    query = {"name": subscription_name}
+    if expected_version == 0:
+        # null matches missing field
+        query["version"] = {"$in": [0, None]}
+    elif expected_version is not None:
+        query["version"] = expected_version
+    return query
+
+
+def bulk_update_pipeline(changes: dict, sequence: int) -> List[dict]:
+    """
+    Return update pipeline, which sets changed fields, increases version and stamps sequence number
+    of documents, which fields differ. Updates with aggregation pipeline need MongoDB 4.2 or higher.
+    Values are wrapped with $literal, so strings starting with $ are not taken as field paths
+    """
+    changes = to_document_changes(changes)
+    version = {"$ifNull": ["$version", 0]}
+    unchanged = {"$and": [{"$eq": [f"${key}", {"$literal": value}]} for key, value in changes.items()]}
+    return [{
+        "$set": {
+            **{key: {"$literal": value} for key, value in changes.items()},
+            # expressions of one stage see the document before the stage
+            "version": {"$cond": [unchanged, version, {"$add": [version, 1]}]},
+            "sequence": {"$cond": [unchanged, {"$ifNull": ["$sequence", 0]}, sequence]},
+        }
+    }]
+
+
+def moved_query(subscription_filter: dict, changes: dict) -> Optional[dict]:
+    """
+    Return query of subscriptions, which owner or name is changed by bulk changes,
+    None if the changes keep owners and names
+    """
+    key_changes = [{key: {"$ne": changes[key]}} for key in KEY_FIELDS if key in changes]
+    if not key_changes:
+        return None
+    return {"$and": [subscription_filter, {"$or": key_changes}]}
+
+
+def moved_keys(document: dict, changes: dict) -> List[SubscriptionKey]:
+    """Return owner and name of document before changes, if the changes move it to another owner or name"""
+    key = (document["owner"], document["name"])
+    return [key] if any(changes.get(field, value) != value for field, value in zip(KEY_FIELDS, key)) else []
+
+
+def tombstone_update(key: SubscriptionKey, sequence: int) -> Tuple[dict, dict]:
+    """Return filter and update of upsert, which writes tombstone of deleted or moved subscription"""
+    owner, name = key
+    return {"_id": {"owner": owner, "name": name}}, {"$set": {"sequence": sequence}}
+
+
+def tombstone_requests(keys: List[SubscriptionKey], sequence: int) -> List[UpdateOne]:
+    """Return requests of bulk_write, which write tombstones of deleted or moved subscriptions"""
+    return [UpdateOne(*tombstone_update(key, sequence), upsert=True) for key in keys]
+
+
+def changes_query(watermark: int) -> dict:
+    """Return query of subscriptions and tombstones stamped after the watermark"""
+    return {} if watermark == 0 else {"sequence": {"$gt": watermark}}
+
+
+def from_tombstone(document: dict) -> Change:
+    """Convert tombstone document to deletion, tombstones written before they were keyed by owner have name _id"""
+    key = document["_id"]
+    if isinstance(key, dict):
+        return Change(document["sequence"], key["name"], None, key["owner"])
+    return Change(document["sequence"], key, None)
+
+
+def from_changed_document(document: dict) -> Change:
+    """Convert written subscription document to change, documents written before sequence numbers have 0"""
+    return Change(document.get("sequence", 0), document["name"], from_document(document), document["owner"])
+
+
+def change_stream_pipeline(db_name: str) -> List[dict]:
+    """Return change stream pipeline, which passes writes of subscriptions and tombstones"""
+    return [{
+        "$match": {
+            "ns.db": db_name,
+            "ns.coll": {"$in": [DEFAULT_COLLECTION_NAME, TOMBSTONES_COLLECTION_NAME]},
+        }
+    }]
+
+
+def from_document(document: dict) -> dict:
+    """
+    Convert MongoDB document to subscription dict: _id, version and sequence are removed,
+    start_date is converted to date
+    """
+    document.pop("_id", None)
+    document.pop("version", None)
+    document.pop("sequence", None)
+    if isinstance(document.get("start_date"), datetime):
+        document["start_date"] = document["start_date"].date()
+    return document
+
+
+def split_write_errors(
+    documents: List[dict], exc: BulkWriteError = None
+) -> Tuple[List[Optional[ObjectId]], Dict[int, str]]:
+    """Return identifiers of inserted documents (None for not written ones) and write errors by position"""
+    errors = {} if exc is None else {
+        error["index"]: error["errmsg"] for error in exc.details["writeErrors"]
+    }
+    # identifiers are assigned on client side, so written documents already have them
+    inserted_ids = [
+        None if index in errors else document["_id"] for index, document in enumerate(documents)
+    ]
+    return inserted_ids, errors
+
+
+def spend_pipeline(owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS) -> List[dict]:
+    """
+    Return aggregation pipeline, which sums monthly spend of subscriptions grouped by the given fields
+    Args:
+        owner (str): not mandatory, if not None only subscriptions of specified owner are summed
+        group_by (Tuple[str, ...]): fields from SPEND_GROUP_FIELDS
+    Returns:
+        List[dict]: pipeline stages
+    """
+    # nested $cond instead of $switch, which is not supported by every test double of MongoDB
+    payments_per_month = 0.0
+    for frequency, factor in reversed(list(PAYMENTS_PER_MONTH.items())):
+        payments_per_month = {"$cond": [{"$eq": ["$frequency", frequency]}, factor, payments_per_month]}
+    pipeline = [] if owner is None else [{"$match": {"owner": owner}}]
+    pipeline.append({
+        "$group": {
+            "_id": {field: f"${field}" for field in group_by} if group_by else None,
+            "monthly_spend": {"$sum": {"$multiply": ["$price", payments_per_month]}},
+            "count": {"$sum": 1},
+        }
+    })
+    if group_by:
+        pipeline.append({"$sort": {f"_id.{field}": ASCENDING for field in group_by}})
+    return pipeline
+
+
+# Methods of collections, which return cursors, the cursors are read to lists by helpers
+CURSOR_METHODS = ("find", "aggregate")
+
+
+@dataclass
+class MongoRequest:
+    """Request to collection of MongoDB, it is sent by DBHelper and awaited by MotorDBHelper
+        Attributes:
+            collection (str): attribute of the helper with the collection: subscriptions, sequences or tombstones
+            method (str): method of the collection, cursors of CURSOR_METHODS are read to lists
+            args (tuple): positional arguments of the method
+            kwargs (dict): keyword arguments of the method
+    """
+
+    collection: str
+    method: str
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+
+# Requests of one call of the helper: generator yields requests, receives their results or errors
+# and returns the result of the call. The same plans are sent by DBHelper and awaited by MotorDBHelper
+RequestPlan = Generator[MongoRequest, Any, Any]
+
+
+def ensure_indexes_plan() -> RequestPlan:
+    """Create indexes for lookup by name, listing by owner and reading of changes, return their names"""
+    names = []
+    for keys in SUBSCRIPTION_INDEXES:
+        names.append((yield MongoRequest("subscriptions", "create_index", ([(key, ASCENDING) for key in keys],))))
+    names.append((yield MongoRequest("tombstones", "create_index", ([("sequence", ASCENDING)],))))
+    return names
+
+
+def reserve_sequence_plan(count: int = 1) -> RequestPlan:
+    """Reserve count of sequence numbers with one atomic increment of the counter, return the first number"""
+    counter = yield MongoRequest(
+        "sequences",
+        "find_one_and_update",
+        ({"_id": DEFAULT_COLLECTION_NAME}, {"$inc": {"value": count}}),
+        {"upsert": True, "return_document": ReturnDocument.AFTER},
+    )
+    return counter["value"] - count + 1
+
+
+def bury_plan(keys: List[SubscriptionKey], sequence: int) -> RequestPlan:
+    """Write tombstones of deleted or moved subscriptions with one request"""
+    if len(keys) == 1:
+        yield MongoRequest("tombstones", "update_one", tombstone_update(keys[0], sequence), {"upsert": True})
+    elif keys:
+        yield MongoRequest("tombstones", "bulk_write", (tombstone_requests(keys, sequence),), {"ordered": False})
+
+
+def add_subscription_plan(subscription: Subscription) -> RequestPlan:
+    """Reserve sequence number and insert subscription, return its identifier"""
+    sequence = yield from reserve_sequence_plan()
+    result = yield MongoRequest("subscriptions", "insert_one", (to_new_document(subscription, sequence),))
+    return result.inserted_id
+
+
+def add_subscriptions_plan(subscriptions: List[Subscription]) -> RequestPlan:
+    """Reserve sequence numbers and insert subscriptions with one unordered insert_many, see split_write_errors"""
+    if not subscriptions:
+        return [], {}
+    first = yield from reserve_sequence_plan(len(subscriptions))
+    documents = [
+        to_new_document(subscription, sequence)
+        for sequence, subscription in enumerate(subscriptions, first)
+    ]
+    try:
+        yield MongoRequest("subscriptions", "insert_many", (documents,), {"ordered": False})
+    except BulkWriteError as exc:
+        return split_write_errors(documents, exc)
+    return split_write_errors(documents)
+
+
+def find_by_name_plan(subscription_name: str) -> RequestPlan:
+    """Return document of subscription by name, SubsNotFoundException is raised if there is no such subscription"""
+    document = yield MongoRequest("subscriptions", "find_one", ({"name": subscription_name},))
+    if document is None:
+        raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+    return document
+
+
+def get_subscription_plan(subscription_name: str) -> RequestPlan:
+    """Return subscription by name"""
+    document = yield from find_by_name_plan(subscription_name)
+    return from_document(document)
+
+
+def get_versioned_subscription_plan(subscription_name: str) -> RequestPlan:
+    """Return subscription by name and its version, documents written before versioning have version 0"""
+    document = yield from find_by_name_plan(subscription_name)
+    version = document.get("version", 0)
+    return from_document(document), version
+
+
+def spend_summary_plan(owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS) -> RequestPlan:
+    """Sum monthly spend on server side, return aggregated rows, see BaseDBHelper.spend_summary"""
+    rows = yield MongoRequest("subscriptions", "aggregate", (spend_pipeline(owner, group_by),))
+    return [
+        {**(row["_id"] or {}), "monthly_spend": row["monthly_spend"], "count": row["count"]} for row in rows
+    ]
+
+
+def update_subscriptions_plan(subscription_filter: dict, changes: dict) -> RequestPlan:
+    """
+    Set changed fields of all matched subscriptions with one update_many, return count of matched
+    and count of changed subscriptions. Owners and names of moved subscriptions are read before the update
+    and their tombstones are written after it
+    """
+    sequence = yield from reserve_sequence_plan()
+    query = moved_query(subscription_filter, changes)
+    moved = [] if query is None else (
+        yield MongoRequest("subscriptions", "find", (query, {"_id": False, "owner": True, "name": True}))
+    )
+    result = yield MongoRequest(
+        "subscriptions", "update_many", (subscription_filter, bulk_update_pipeline(changes, sequence))
+    )
+    yield from bury_plan([(document["owner"], document["name"]) for document in moved], sequence)
+    return result.matched_count, result.modified_count
+
+
+def apply_changes_plan(subscription_name: str, changes: dict, expected_version: int = None) -> RequestPlan:
+    """
+    Set changed fields, increase version and stamp sequence number with one find_one_and_update,
+    return changed subscription or None. Tombstone of subscription moved to another owner or name
+    is written after it
+    """
+    sequence = yield from reserve_sequence_plan()
+    document_changes = to_document_changes(changes)
+    document = yield MongoRequest(
+        "subscriptions",
+        "find_one_and_update",
+        (
+            version_query(subscription_name, expected_version),
+            {"$inc": {"version": 1}, "$set": {**document_changes, "sequence": sequence}},
+        ),
+    )
+    if document is None:
+        return None
+    yield from bury_plan(moved_keys(document, changes), sequence)
+    return from_document({**document, **document_changes})
+
+
+def delete_subscription_plan(subscription_name: str) -> RequestPlan:
+    """
+    Delete subscription by name, then reserve sequence number and write tombstone with its owner,
+    return count of deleted subscriptions. Nothing else is sent if nothing was deleted
+    """
+    document = yield MongoRequest("subscriptions", "find_one_and_delete", ({"name": subscription_name}, {"owner": True}))
+    if document is None:
+        return 0
+    sequence = yield from reserve_sequence_plan()
+    yield from bury_plan([(document["owner"], subscription_name)], sequence)
+    return 1
+
+
+def changes_since_plan(watermark: int = 0) -> RequestPlan:
+    """Read subscriptions and tombstones stamped after the watermark, return changes in the order of numbers"""
+    query = changes_query(watermark)
+    documents = yield MongoRequest("subscriptions", "find", (query,))
+    tombstones = yield MongoRequest("tombstones", "find", (query,))
+    changes = [from_changed_document(document) for document in documents]
+    changes.extend(from_tombstone(document) for document in tombstones)
+    return sort_changes(changes)
+
+
+class DBHelper(BaseDBHelper):
+    """Class for communication with MongoDB.
+    Every write stamps subscriptions with a sequence number reserved from the counter in sequences collection,
+    deletions and moves to another owner or name are kept as tombstones keyed by owner and name,
+    so changes_since reads only changed documents by index. Round trips of writes and the window, in which
+    a write is read by ChangeWatermark readers, are described in BaseDBHelper.
+    Tombstones are written after the write, which returned the owner and name of the subscription,
+    so a process stopped between them leaves the old subscription to readers of changes until they
+    read all subscriptions again
+    """
+
+    changes_overlap = DEFAULT_CHANGES_OVERLAP
+
+    def __init__(
+        self,
+        db_url: str,
+        db_credentials: dict,
+        db_name: str,
+        client: MongoClient = None,
+        pool_config: PoolConfig = None,
+    ):
+        """Uses process-wide client of MongoDB Atlas cluster, so connections are shared by all DBHelper instances.
+        Already connected client can be taken instead, e.g. for local mongod.
+        DBHelper doesn't close the client, shared clients are closed by mongo_pool.close_clients"""
+        if client is None:
+            _connection_string = \
+                f"mongodb+srv://{db_credentials['user']}:{db_credentials['password']}@{db_url}/{db_name}?" \
+                f"retryWrites=true&w=majority"
+            client = get_client(_connection_string, pool_config)
+        self.client = client
         self.db = getattr(self.client, db_name)
+        self.subscriptions = self.db[DEFAULT_COLLECTION_NAME]
+        self.sequences = self.db[SEQUENCES_COLLECTION_NAME]
+        # {owner, name} of deleted or moved subscription -> sequence number of the deletion
+        self.tombstones = self.db[TOMBSTONES_COLLECTION_NAME]
+        # not used by DBHelper itself, it is the storage for OwnerTotals
+        self.owner_totals = self.db[OWNER_TOTALS_COLLECTION_NAME]
+
+    @classmethod
+    def from_client(cls, client: MongoClient, db_name: str) -> "DBHelper":
+        """Return DBHelper for database of already connected client"""
+        return cls(db_url=None, db_credentials=None, db_name=db_name, client=client)
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        Create indexes for lookup by name, listing by owner and reading of changes,
+        existing indexes are not changed
+        Returns:
+            List[str]: names of the indexes
+        """
+        return self._send(ensure_indexes_plan())
+
+    def _request(self, request: MongoRequest):
+        """Send request to the collection, cursor of the reply is read to list"""
+        method = getattr(getattr(self, request.collection), request.method)
+        reply = method(*request.args, **request.kwargs)
+        return list(reply) if request.method in CURSOR_METHODS else reply
+
+    def _send(self, plan: RequestPlan):
+        """Send requests of the plan one by one, reply or error of every request is passed back to the plan"""
+        reply = error = None
+        while True:
+            try:
+                request = plan.send(reply) if error is None else plan.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            reply = error = None
+            try:
+                reply = self._request(request)
+            except PyMongoError as exc:
+                error = exc
+
+    def _reserve_sequence(self, count: int = 1) -> int:
+        """
+        Reserve count of sequence numbers with one atomic increment of the counter
+        Returns:
+            int: the first reserved number
+        """
+        return self._send(reserve_sequence_plan(count))
+
+    def add_subscription(self, subscription: Subscription):
+        """
+        Insert subscription
+        Returns:
+            ObjectId: identifier of created subscription
+        """
+        return self._send(add_subscription_plan(subscription))
+
+    def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[ObjectId]], Dict[int, str]]:
+        """
+        Insert subscriptions with one unordered insert_many call, sequence numbers are reserved with one request
+        Args:
+            subscriptions (List[Subscription]): subscriptions to insert
+        Returns:
+            Tuple: identifiers in the order of subscriptions (None for not written subscriptions)
+                and write error messages by position of subscription
+        """
+        return self._send(add_subscriptions_plan(subscriptions))
+
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> Iterator[dict]:
+        """
+        Stream subscriptions from database cursor, documents are received by batches of batch_size.
+        The listing by owner uses index on owner
+        Args:
+            owner (str): not mandatory, if not None returns subscriptions of specified owner
+            batch_size (int): count of documents received from database with one request
+            projection (dict): not mandatory, fields to return or exclude, e.g. {"comment": False}
+        Returns:
+            Iterator[dict]: subscriptions dicts without _id
+        """
+        query = {} if owner is None else {"owner": owner}
+        cursor = self.subscriptions.find(query, projection, batch_size=batch_size)
+        return (from_document(document) for document in cursor)
+
+    def get_subscription(self, subscription_name: str) -> dict:
+        """
+        Return subscription by name, the lookup uses index on name
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in database
+        """
+        return self._send(get_subscription_plan(subscription_name))
+
+    def spend_summary(
+        self, owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        """Sum monthly spend on server side, only aggregated rows are received, see BaseDBHelper.spend_summary"""
+        return self._send(spend_summary_plan(owner, group_by))
+
+    def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> Iterator[dict]:
+        """
+        Stream subscriptions, which fields are equal to the filter values, the query uses indexes of filter fields
+        Args:
+            subscription_filter (dict): values of fields from FILTER_FIELDS, e.g. {"name": "Spotify"}
+            projection (dict): not mandatory, fields to return or exclude, e.g. {"comment": False}
+        Returns:
+            Iterator[dict]: subscriptions dicts without _id
+        """
+        cursor = self.subscriptions.find(subscription_filter, projection)
+        return (from_document(document) for document in cursor)
+
+    def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        """
+        Set changed fields of all matched subscriptions with one update_many request,
+        version and sequence number are changed only for subscriptions, which fields differ from the changes.
+        The request is update with aggregation pipeline, it needs MongoDB 4.2 or higher.
+        If owner is changed, owners and names of moved subscriptions are read before the update
+        and their tombstones are written after it
+        Args:
+            subscription_filter (dict): values of fields from FILTER_FIELDS
+            changes (dict): validated changes of subscription fields
+        Returns:
+            Tuple[int, int]: count of matched and count of changed subscriptions
+        """
+        return self._send(update_subscriptions_plan(subscription_filter, changes))
+
+    def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        """
+        Return subscription by name and its version
+        Raises:
+            SubsNotFoundException: when subscription with this name doesn't exist in database
+        """
+        return self._send(get_versioned_subscription_plan(subscription_name))
+
+    def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        """
+        Set changed fields, increase version and stamp sequence number with one find_one_and_update round trip,
+        the sequence number is reserved before it. The request returns subscription before changes,
+        so tombstone of subscription moved to another owner or name is written after it
+        Args:
+            subscription_name (str): name of subscription before changes
+            changes (dict): validated changes of subscription fields
+            expected_version (int): not mandatory, changes are applied only if subscription has this version
+        Returns:
+            Optional[dict]: changed subscription, None if subscription was not found or has another version
+        """
+        return self._send(apply_changes_plan(subscription_name, changes, expected_version))
+
+    def delete_subscription(self, subscription_name: str) -> int:
+        """
+        Delete subscription by name, then reserve sequence number and write tombstone with its owner.
+        Nothing else is sent if nothing was deleted
+        Returns:
+            int: count of deleted subscriptions
+        """
+        return self._send(delete_subscription_plan(subscription_name))
+
+    def changes_since(self, watermark: int = 0) -> List[Change]:
+        """
+        Read subscriptions and tombstones stamped after the watermark, the queries use indexes on sequence.
+        Documents written before sequence numbers are returned with sequence 0 when watermark is 0
+        Args:
+            watermark (int): the largest sequence number applied by the caller
+        Returns:
+            List[Change]: changes in the order of sequence numbers
+        """
+        return self._send(changes_since_plan(watermark))
 
-    def add_subscription(self, subscription_dict):
-        database = self.db
-        subscriptions = database.subscriptions
-        result = subscriptions.insert_one(subscription_dict)
-        return result.inserted_id
+    def follow_changes(
+        self, watermark: int = 0, poll_interval: float = DEFAULT_CHANGES_POLL_INTERVAL, stop: Event = None
+    ) -> Iterator[Change]:
+        """
+        Stream changes after the watermark and then new changes as they are written.
+        Change stream of the database wakes the reader, changes are read with changes_since,
+        so they keep the order of sequence numbers. Servers without change streams are polled
+        Args:
+            watermark (int): the largest sequence number applied by the caller
+            poll_interval (float): seconds between checks of stop event, or between requests of polling
+            stop (Event): not mandatory, the stream is finished when the event is set
+        Returns:
+            Iterator[Change]: changes in the order of sequence numbers
+        """
+        stop = Event() if stop is None else stop
+        stream = None
+        # mongomock databases have no watch method, standalone servers refuse to open change stream
+        if hasattr(type(self.db), "watch"):
+            try:
+                # the stream is opened before the first read, so writes made meanwhile wake the reader
+                stream = self.db.watch(
+                    change_stream_pipeline(self.db.name), max_await_time_ms=int(poll_interval * 1000)
+                )
+            except OperationFailure:
+                pass
+        if stream is None:
+            yield from super().follow_changes(watermark, poll_interval, stop)
+            return
+        watermark = ChangeWatermark(watermark, self.changes_overlap)
+        with stream:
+            while not stop.is_set():
+                yield from watermark.apply(self.changes_since(watermark.value))
+                # every event is followed by one read, events of writes read by it give empty reads
+                while not stop.is_set() and stream.try_next() is None:
+                    pass
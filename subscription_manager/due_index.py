@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from subscription_manager.common.dates import next_payment_date
+from subscription_manager.listener import NameIndex, SubscriptionKey, SubscriptionListener, subscription_key
+from subscription_manager.subscription import Subscription
+
+
+class DueIndex(SubscriptionListener):
+    """Index of subscriptions by the next payment date.
+    Subscriptions are kept in buckets by next payment date, the sorted list of bucket dates is searched with bisect.
+    All next payment dates lie between today and today + one year, so there are no more than 367 buckets
+    and range query costs O(log n + k). Subscriptions are kept by owner and name.
+        Attributes:
+            owner (str): not mandatory, if not None only subscriptions of specified owner are indexed
+            today (date): date the index is actual for, entries with passed payment dates are rolled forward
+        Methods:
+            add: add subscription or replace subscription of the same owner with the same name
+            remove: remove subscription by name and owner
+            roll_forward: move passed payment dates to the next occurrence
+            due_between: return subscriptions with next payment date in the range
+            due_within: return subscriptions with next payment date in the next days
+    """
+
+    def __init__(
+        self, subscriptions: Iterable[Subscription] = (), owner: str = None, today: date = None
+    ):
+        self.owner = owner
+        self.today = date.today() if today is None else today
+        self._dates: List[date] = []
+        self._buckets: Dict[date, Dict[SubscriptionKey, Subscription]] = {}
+        self._due_dates: Dict[SubscriptionKey, date] = {}
+        self._names = NameIndex()
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def __len__(self):
+        return len(self._due_dates)
+
+    def __contains__(self, subscription_name: str):
+        return subscription_name in self._names
+
+    def _put(self, due_date: date, subscription: Subscription):
+        """Put subscription to the bucket of its next payment date"""
+        bucket = self._buckets.get(due_date)
+        if bucket is None:
+            bucket = self._buckets[due_date] = {}
+            insort(self._dates, due_date)
+        key = subscription_key(subscription)
+        bucket[key] = subscription
+        self._due_dates[key] = due_date
+        self._names.add(key)
+
+    def add(self, subscription: Subscription):
+        """
+        Add subscription to the index, subscription of the same owner with the same name is replaced
+        Args:
+            subscription (Subscription): subscription to add
+        """
+        if self.owner is not None and subscription.owner != self.owner:
+            return
+        self.remove(subscription.name, subscription.owner)
+        due_date = next_payment_date(subscription.start_date, subscription.frequency, self.today)
+        self._put(due_date, subscription)
+
+    def remove(self, subscription_name: str, owner: str = None) -> bool:
+        """
+        Remove subscription from the index
+        Args:
+            subscription_name (str): name of subscription to remove
+            owner (str): not mandatory, owner of subscription, the first subscription with the name if None
+        Returns:
+            bool: True if subscription was in the index
+        """
+        key = self._names.key(subscription_name, owner)
+        due_date = None if key is None else self._due_dates.pop(key, None)
+        if due_date is None:
+            return False
+        self._names.discard(key)
+        bucket = self._buckets[due_date]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[due_date]
+            del self._dates[bisect_left(self._dates, due_date)]
+        return True
+
+    def roll_forward(self, today: date = None):
+        """
+        Move subscriptions with payment dates before today to their next payment dates.
+        Only passed buckets are touched, the rest of the index is not rebuilt.
+        Args:
+            today (date): not mandatory, new date of the index, date.today() by default
+        """
+        today = date.today() if today is None else today
+        if today <= self.today:
+            return
+        self.today = today
+        passed = bisect_left(self._dates, today)
+        passed_dates = self._dates[:passed]
+        del self._dates[:passed]
+        for due_date in passed_dates:
+            for subscription in self._buckets.pop(due_date).values():
+                next_date = next_payment_date(subscription.start_date, subscription.frequency, today)
+                self._put(next_date, subscription)
+
+    def due_between(
+        self, start: date, end: date, today: date = None
+    ) -> List[Tuple[date, Subscription]]:
+        """
+        Return subscriptions with next payment date in the range, including both ends
+        Only the next payment of every subscription is indexed, so later payments in long ranges are not returned.
+        Args:
+            start (date): first date of the range
+            end (date): last date of the range
+            today (date): not mandatory, current date, date.today() by default
+        Returns:
+            List[Tuple[date, Subscription]]: pairs of payment date and subscription sorted by payment date
+        """
+        self.roll_forward(today)
+        first = bisect_left(self._dates, start)
+        last = bisect_right(self._dates, end)
+        return [
+            (due_date, subscription)
+            for due_date in self._dates[first:last]
+            for subscription in self._buckets[due_date].values()
+        ]
+
+    def due_within(self, days: int, today: date = None) -> List[Tuple[date, Subscription]]:
+        """
+        Return subscriptions, that should be paid today or during the next days
+        Args:
+            days (int): count of days after today
+            today (date): not mandatory, current date, date.today() by default
+        Returns:
+            List[Tuple[date, Subscription]]: pairs of payment date and subscription sorted by payment date
+        """
+        today = date.today() if today is None else today
+        return self.due_between(today, today + timedelta(days=days), today)
+
+    def subscription_added(self, subscription: Subscription):
+        self.add(subscription)
+
+    def subscription_edited(self, subscription_name: str, subscription: Subscription, owner: str = None):
+        self.remove(subscription_name, owner)
+        self.add(subscription)
+
+    def subscription_deleted(self, subscription_name: str, owner: str = None):
+        self.remove(subscription_name, owner)
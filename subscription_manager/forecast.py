@@ -0,0 +1,152 @@
+import heapq
+from datetime import date, timedelta
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+from subscription_manager.common.dates import DAYS_IN_PERIOD, add_months, payment_dates, payment_number
+from subscription_manager.subscription import Subscription
+
+# Fields of subscription needed to total its forecasted payments
+FORECAST_PROJECTION = {"frequency": True, "start_date": True, "price": True, "currency": True}
+
+
+class Payment(NamedTuple):
+    """One forecasted payment of subscription"""
+
+    day: date
+    owner: str
+    name: str
+    price: float
+    currency: str
+
+
+def _as_dict(subscription: Union[Subscription, dict]) -> dict:
+    return subscription if isinstance(subscription, dict) else vars(subscription)
+
+
+def iter_payments(
+    subscription: Union[Subscription, dict], window_start: date, window_end: date
+) -> Iterator[Payment]:
+    """
+    Stream payments of subscription from window_start to window_end inclusive,
+    payments before the window are skipped without visiting them
+    Args:
+        subscription (Union[Subscription, dict]): subscription or subscription dict
+        window_start (date): first day of the window
+        window_end (date): last day of the window
+    Returns:
+        Iterator[Payment]: payments in ascending order of dates
+    """
+    subscription = _as_dict(subscription)
+    owner, name = subscription.get("owner"), subscription.get("name")
+    price, currency = subscription["price"], subscription["currency"]
+    for day in payment_dates(subscription["start_date"], subscription["frequency"], window_start, window_end):
+        yield Payment(day, owner, name, price, currency)
+
+
+def merge_payments(
+    subscriptions: Iterable[Union[Subscription, dict]], window_start: date, window_end: date
+) -> Iterator[Payment]:
+    """
+    Stream payments of all subscriptions in ascending order of dates.
+    Streams of subscriptions are merged with heap, so only one pending payment of every subscription is kept
+    Args:
+        subscriptions (Iterable[Union[Subscription, dict]]): subscriptions or subscription dicts
+        window_start (date): first day of the window
+        window_end (date): last day of the window
+    Returns:
+        Iterator[Payment]: payments, payments of the same day are in the order of subscriptions
+    """
+    return heapq.merge(
+        *(iter_payments(subscription, window_start, window_end) for subscription in subscriptions),
+        key=attrgetter("day"),
+    )
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _add_payments(totals: Dict[Tuple[date, str], list], key: Tuple[date, str], amount: float, count: int):
+    total = totals.get(key)
+    if total is None:
+        total = totals[key] = [0.0, 0]
+    total[0] += amount * count
+    total[1] += count
+
+
+class ForecastTotals:
+    """Totals of forecasted payments by day or by month and currency, subscriptions are added one by one,
+    so they can be taken from synchronous and asynchronous streams.
+    Memory is bounded by count of periods and currencies.
+    Payments of daily and weekly subscriptions are counted per month with calendar arithmetic, not one by one
+    """
+
+    def __init__(self, window_start: date, window_end: date, period: str = "day"):
+        """
+        Args:
+            window_start (date): first day of the window
+            window_end (date): last day of the window
+            period (str): period from FORECAST_PERIODS, "day" or "month"
+        """
+        self.window_start = window_start
+        self.window_end = window_end
+        self.period = period
+        self._totals: Dict[Tuple[date, str], list] = {}
+        self._months = []
+        if period == "month":
+            month = _month_start(window_start)
+            while month <= window_end:
+                self._months.append(month)
+                month = add_months(month, 1)
+
+    def add(self, subscription: Union[Subscription, dict]):
+        """Add forecasted payments of subscription or subscription dict"""
+        subscription = _as_dict(subscription)
+        start_date, frequency = subscription["start_date"], subscription["frequency"]
+        price, currency = subscription["price"], subscription["currency"]
+        window_start, window_end = self.window_start, self.window_end
+        if self.period == "month" and frequency in DAYS_IN_PERIOD:
+            for month in self._months:
+                first_day = max(month, window_start)
+                next_day = min(add_months(month, 1), window_end + timedelta(days=1))
+                count = payment_number(start_date, frequency, next_day) - payment_number(
+                    start_date, frequency, first_day
+                )
+                if count:
+                    _add_payments(self._totals, (month, currency), price, count)
+            return
+        for day in payment_dates(start_date, frequency, window_start, window_end):
+            _add_payments(self._totals, (_month_start(day) if self.period == "month" else day, currency), price, 1)
+
+    def rows(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: rows sorted by date and currency with date (first day of the period), currency,
+                total (sum of prices) and count of payments
+        """
+        return [
+            {"date": day, "currency": currency, "total": total, "count": count}
+            for (day, currency), (total, count) in sorted(self._totals.items())
+        ]
+
+
+def forecast_totals(
+    subscriptions: Iterable[Union[Subscription, dict]], window_start: date, window_end: date, period: str = "day"
+) -> List[dict]:
+    """
+    Sum forecasted payments by day or by month and currency, see ForecastTotals.
+    Subscriptions are consumed one by one, memory is bounded by count of periods and currencies
+    Args:
+        subscriptions (Iterable[Union[Subscription, dict]]): subscriptions or subscription dicts
+        window_start (date): first day of the window
+        window_end (date): last day of the window
+        period (str): period from FORECAST_PERIODS, "day" or "month"
+    Returns:
+        List[dict]: rows sorted by date and currency with date (first day of the period), currency,
+            total (sum of prices) and count of payments
+    """
+    totals = ForecastTotals(window_start, window_end, period)
+    for subscription in subscriptions:
+        totals.add(subscription)
+    return totals.rows()
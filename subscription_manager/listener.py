@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional, Tuple
+
+from subscription_manager.subscription import Subscription
+
+# Subscriptions of different owners can have the same name, so structures keep them by owner and name
+SubscriptionKey = Tuple[str, str]
+
+
+def subscription_key(subscription: Subscription) -> SubscriptionKey:
+    return subscription.owner, subscription.name
+
+
+class SubscriptionListener:
+    """Base class for structures that follow subscription changes made through Controller.
+        Methods:
+            subscription_added: called after subscription was added to database
+            subscription_edited: called after subscription was changed in database
+            subscription_deleted: called after subscription was deleted from database
+    """
+
+    def subscription_added(self, subscription: Subscription):
+        """
+        Args:
+            subscription (Subscription): added subscription
+        """
+
+    def subscription_edited(self, subscription_name: str, subscription: Subscription, owner: str = None):
+        """
+        Args:
+            subscription_name (str): name of subscription before changes
+            subscription (Subscription): changed subscription
+            owner (str): owner of subscription before changes, None if it is unknown
+        """
+
+    def subscription_deleted(self, subscription_name: str, owner: str = None):
+        """
+        Args:
+            subscription_name (str): name of deleted subscription
+            owner (str): owner of deleted subscription, None if it is unknown
+        """
+
+
+class NameIndex:
+    """Owners of subscriptions by name, used to resolve notifications without owner.
+    Like storage helpers, such notifications refer to the first added subscription with the name
+    """
+
+    def __init__(self):
+        # values are dicts used as insertion ordered sets of owners
+        self._owners: Dict[str, Dict[str, None]] = {}
+
+    def __contains__(self, subscription_name: str):
+        return subscription_name in self._owners
+
+    def add(self, key: SubscriptionKey):
+        owner, name = key
+        self._owners.setdefault(name, {})[owner] = None
+
+    def discard(self, key: SubscriptionKey):
+        owner, name = key
+        owners = self._owners.get(name)
+        if owners is not None:
+            owners.pop(owner, None)
+            if not owners:
+                del self._owners[name]
+
+    def keys(self, subscription_name: str) -> List[SubscriptionKey]:
+        """Return keys of all subscriptions with the name in order of addition"""
+        return [(owner, subscription_name) for owner in self._owners.get(subscription_name, ())]
+
+    def key(self, subscription_name: str, owner: str = None) -> Optional[SubscriptionKey]:
+        """Return key of subscription, the first subscription with the name if owner is None"""
+        if owner is not None:
+            return owner, subscription_name
+        owners = self._owners.get(subscription_name)
+        return None if not owners else (next(iter(owners)), subscription_name)
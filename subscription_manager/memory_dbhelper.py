@@ -0,0 +1,182 @@
+from itertools import count
+from threading import RLock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, apply_projection
+from subscription_manager.common.constants import DEFAULT_BATCH_SIZE, SUBSCRIPTION_NOT_FOUND_MSG
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.listener import SubscriptionKey
+from subscription_manager.subscription import Subscription
+
+
+class InMemoryDBHelper(BaseDBHelper):
+    """Dict based storage of subscriptions with indexes by owner and name.
+    Every operation takes O(1) or O(k) for listing of k subscriptions, all operations are thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._ids = count(1)
+        self._subscriptions: Dict[int, dict] = {}
+        # identifier -> count of changes of subscription, absent for not changed subscriptions
+        self._versions: Dict[int, int] = {}
+        # values are dicts used as insertion ordered sets of identifiers
+        self._by_name: Dict[str, Dict[int, None]] = {}
+        self._by_owner: Dict[str, Dict[int, None]] = {}
+        self._sequence = count(1)
+        # (identifier, None) of subscriptions and (None, (owner, name)) of tombstones -> sequence number
+        # of the last write, the dict is ordered by sequence numbers, so changes after watermark are at its end
+        self._change_log: Dict[Tuple[Optional[int], Optional[SubscriptionKey]], int] = {}
+
+    def _stamp(self, key: Tuple[Optional[int], Optional[SubscriptionKey]], sequence: int):
+        """Move subscription or tombstone to the end of change log with the sequence number of the write"""
+        self._change_log.pop(key, None)
+        self._change_log[key] = sequence
+
+    def _index(self, subscription_id: int, subscription: dict):
+        self._by_name.setdefault(subscription["name"], {})[subscription_id] = None
+        self._by_owner.setdefault(subscription["owner"], {})[subscription_id] = None
+
+    def _unindex(self, subscription_id: int, subscription: dict):
+        for index, key in ((self._by_name, "name"), (self._by_owner, "owner")):
+            ids = index[subscription[key]]
+            del ids[subscription_id]
+            if not ids:
+                del index[subscription[key]]
+
+    def _find_id(self, subscription_name: str) -> Optional[int]:
+        """Return identifier of the first subscription with the given name"""
+        ids = self._by_name.get(subscription_name)
+        return next(iter(ids)) if ids else None
+
+    def add_subscription(self, subscription: Subscription) -> int:
+        with self._lock:
+            subscription_id = next(self._ids)
+            document = dict(vars(subscription))
+            self._subscriptions[subscription_id] = document
+            self._index(subscription_id, document)
+            self._stamp((subscription_id, None), next(self._sequence))
+            return subscription_id
+
+    def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[int]], Dict[int, str]]:
+        with self._lock:
+            return [self.add_subscription(subscription) for subscription in subscriptions], {}
+
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> Iterator[dict]:
+        with self._lock:
+            if owner is None:
+                documents = list(self._subscriptions.values())
+            else:
+                ids = self._by_owner.get(owner, {})
+                documents = [self._subscriptions[subscription_id] for subscription_id in ids]
+        return (apply_projection(dict(document), projection) for document in documents)
+
+    def get_subscription(self, subscription_name: str) -> dict:
+        with self._lock:
+            subscription_id = self._find_id(subscription_name)
+            if subscription_id is None:
+                raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+            return dict(self._subscriptions[subscription_id])
+
+    def _candidate_ids(self, subscription_filter: dict) -> List[int]:
+        """Return identifiers of subscriptions selected by name or owner index, all identifiers otherwise"""
+        if "name" in subscription_filter:
+            return list(self._by_name.get(subscription_filter["name"], ()))
+        if "owner" in subscription_filter:
+            return list(self._by_owner.get(subscription_filter["owner"], ()))
+        return list(self._subscriptions)
+
+    def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> Iterator[dict]:
+        items = subscription_filter.items()
+        with self._lock:
+            documents = [
+                self._subscriptions[subscription_id]
+                for subscription_id in self._candidate_ids(subscription_filter)
+            ]
+        return (
+            apply_projection(dict(document), projection)
+            for document in documents
+            if all(document[key] == value for key, value in items)
+        )
+
+    def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        items = subscription_filter.items()
+        matched = modified = 0
+        with self._lock:
+            # all subscriptions changed by one call get one sequence number
+            sequence = next(self._sequence)
+            for subscription_id in self._candidate_ids(subscription_filter):
+                document = self._subscriptions[subscription_id]
+                if not all(document[key] == value for key, value in items):
+                    continue
+                matched += 1
+                changed = {**document, **changes}
+                if changed != document:
+                    self._replace(subscription_id, changed, sequence)
+                    modified += 1
+        return matched, modified
+
+    def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        with self._lock:
+            subscription_id = self._find_id(subscription_name)
+            if subscription_id is None:
+                raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+            return dict(self._subscriptions[subscription_id]), self._versions.get(subscription_id, 0)
+
+    def _replace(self, subscription_id: int, document: dict, sequence: int):
+        """Replace subscription document, update indexes, increase version and stamp sequence number"""
+        old_document = self._subscriptions[subscription_id]
+        # order of subscriptions with the same name or owner is kept when indexed fields are not changed
+        if old_document["name"] != document["name"] or old_document["owner"] != document["owner"]:
+            self._unindex(subscription_id, old_document)
+            self._index(subscription_id, document)
+        self._subscriptions[subscription_id] = document
+        self._versions[subscription_id] = self._versions.get(subscription_id, 0) + 1
+        if old_document["name"] != document["name"] or old_document["owner"] != document["owner"]:
+            self._stamp((None, (old_document["owner"], old_document["name"])), sequence)
+        self._stamp((subscription_id, None), sequence)
+
+    def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        with self._lock:
+            subscription_id = self._find_id(subscription_name)
+            if subscription_id is None:
+                return None
+            if expected_version is not None and self._versions.get(subscription_id, 0) != expected_version:
+                return None
+            document = {**self._subscriptions[subscription_id], **changes}
+            self._replace(subscription_id, document, next(self._sequence))
+            return dict(document)
+
+    def delete_subscription(self, subscription_name: str) -> int:
+        with self._lock:
+            subscription_id = self._find_id(subscription_name)
+            if subscription_id is None:
+                return 0
+            document = self._subscriptions.pop(subscription_id)
+            self._unindex(subscription_id, document)
+            self._versions.pop(subscription_id, None)
+            del self._change_log[(subscription_id, None)]
+            self._stamp((None, (document["owner"], subscription_name)), next(self._sequence))
+            return 1
+
+    def changes_since(self, watermark: int = 0) -> List[Change]:
+        """Return changes from the end of change log, it takes O(changes)"""
+        changes = []
+        with self._lock:
+            for (subscription_id, key), sequence in reversed(self._change_log.items()):
+                if sequence <= watermark:
+                    break
+                if subscription_id is None:
+                    owner, name = key
+                    changes.append(Change(sequence, name, None, owner))
+                else:
+                    document = self._subscriptions[subscription_id]
+                    changes.append(Change(sequence, document["name"], dict(document), document["owner"]))
+        changes.reverse()
+        return changes
@@ -0,0 +1,289 @@
+import inspect
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from subscription_manager.common.constants import LATENCY_BUCKETS, METRICS_PREFIX
+
+# Type of database operation made by every storage helper method
+DB_OPERATIONS = {
+    "ensure_indexes": "index",
+    "add_subscription": "insert",
+    "add_subscriptions": "insert",
+    "iter_subscriptions": "find",
+    "find_subscriptions": "find",
+    "get_subscription": "find",
+    "get_versioned_subscription": "find",
+    "get_all_subscriptions": "find",
+    "spend_summary": "aggregate",
+    "apply_changes": "update",
+    "update_subscriptions": "update",
+    "delete_subscription": "delete",
+    "changes_since": "find",
+    "follow_changes": "find",
+}
+
+
+@dataclass
+class CallStats:
+    """Statistics of calls of one method
+        Attributes:
+            count (int): count of calls
+            errors (int): count of calls, which raised exception
+            seconds (float): total latency
+            buckets (List[int]): count of calls by latency bucket, the last bucket is +Inf
+            result_size (int): total size of results: length of lists, yielded items, returned counts
+            sized_results (int): count of calls with known result size
+    """
+
+    count: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    result_size: int = 0
+    sized_results: int = 0
+
+
+class MetricsRegistry:
+    """Latency histograms, call counts and result sizes of instrumented methods.
+    Methods are recorded by component (controller or dbhelper), method name and database operation type.
+        Methods:
+            record: record one call
+            record_result_size: record size of result, which is known after the call, e.g. of iterator
+            snapshot: return all metrics as dict
+            to_prometheus: return all metrics in Prometheus text exposition format
+            reset: remove all metrics
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats: Dict[Tuple[str, str, str], CallStats] = {}
+
+    def _get_stats(self, key: Tuple[str, str, str]) -> CallStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = CallStats()
+        return stats
+
+    def record(
+        self, component: str, method: str, operation: str, seconds: float,
+        failed: bool = False, result_size: Optional[int] = None,
+    ):
+        with self._lock:
+            stats = self._get_stats((component, method, operation))
+            stats.count += 1
+            stats.errors += failed
+            stats.seconds += seconds
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if result_size is not None:
+                stats.result_size += result_size
+                stats.sized_results += 1
+
+    def record_result_size(self, component: str, method: str, operation: str, result_size: int):
+        with self._lock:
+            stats = self._get_stats((component, method, operation))
+            stats.result_size += result_size
+            stats.sized_results += 1
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Return copy of all metrics
+        Examples:
+            {"controller.get_subscriptions_list": {"component": "controller", "method": "get_subscriptions_list",
+             "operation": "", "count": 2, "errors": 0, "seconds": 0.0012,
+             "buckets": {"0.0001": 0, ..., "+Inf": 2}, "result_size": 10, "sized_results": 2}}
+        Returns:
+            Dict[str, dict]: metrics by "component.method", buckets are cumulative like in Prometheus
+        """
+        with self._lock:
+            items = [(key, CallStats(**vars(stats))) for key, stats in self._stats.items()]
+        snapshot = {}
+        for (component, method, operation), stats in sorted(items):
+            snapshot[f"{component}.{method}"] = {
+                "component": component,
+                "method": method,
+                "operation": operation,
+                "count": stats.count,
+                "errors": stats.errors,
+                "seconds": stats.seconds,
+                "buckets": dict(zip(_bucket_labels(), _cumulative(stats.buckets))),
+                "result_size": stats.result_size,
+                "sized_results": stats.sized_results,
+            }
+        return snapshot
+
+    def to_prometheus(self) -> str:
+        """Return all metrics in Prometheus text exposition format"""
+        duration = f"{METRICS_PREFIX}_call_duration_seconds"
+        errors = f"{METRICS_PREFIX}_call_errors_total"
+        result_size = f"{METRICS_PREFIX}_result_size"
+        lines = [
+            f"# HELP {duration} Latency of Controller and storage helper calls.",
+            f"# TYPE {duration} histogram",
+        ]
+        snapshot = self.snapshot()
+        for metrics in snapshot.values():
+            labels = _labels(metrics)
+            for bound, count in metrics["buckets"].items():
+                lines.append(f'{duration}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{duration}_sum{{{labels}}} {metrics['seconds']!r}")
+            lines.append(f"{duration}_count{{{labels}}} {metrics['count']}")
+        lines += [f"# HELP {errors} Calls, which raised exception.", f"# TYPE {errors} counter"]
+        for metrics in snapshot.values():
+            lines.append(f"{errors}{{{_labels(metrics)}}} {metrics['errors']}")
+        lines += [
+            f"# HELP {result_size} Count of subscriptions returned or changed by calls.",
+            f"# TYPE {result_size} summary",
+        ]
+        for metrics in snapshot.values():
+            if metrics["sized_results"]:
+                labels = _labels(metrics)
+                lines.append(f"{result_size}_sum{{{labels}}} {metrics['result_size']}")
+                lines.append(f"{result_size}_count{{{labels}}} {metrics['sized_results']}")
+        return "\n".join(lines) + "\n"
+
+
+def _bucket_labels() -> List[str]:
+    return [repr(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+
+
+def _cumulative(buckets: List[int]) -> List[int]:
+    total = 0
+    cumulative = []
+    for count in buckets:
+        total += count
+        cumulative.append(total)
+    return cumulative
+
+
+def _labels(metrics: dict) -> str:
+    return (
+        f'component="{metrics["component"]}",method="{metrics["method"]}",operation="{metrics["operation"]}"'
+    )
+
+
+# Registry used when no registry is passed to instrument functions
+REGISTRY = MetricsRegistry()
+
+
+def _tuple_size(result: tuple) -> int:
+    """Size of identifiers and errors of add_subscriptions, subscription and version, matched and modified counts"""
+    first = result[0] if result else None
+    if isinstance(first, list):
+        return len(first)
+    if isinstance(first, dict):
+        return 1
+    if isinstance(first, int):
+        return first
+    return len(result)
+
+
+def _object_size(result) -> Optional[int]:
+    """Size of BulkAddResult, BulkEditResult, single subscription or other container"""
+    if hasattr(result, "inserted_ids"):
+        return len(result.inserted_ids)
+    if hasattr(result, "matched"):
+        return result.matched
+    if isinstance(result, dict) or hasattr(result, "__dict__") and not hasattr(result, "__len__"):
+        return 1
+    if hasattr(result, "__len__"):
+        return len(result)
+    return None
+
+
+# Size functions of result types, results of other types are sized by _object_size
+_RESULT_SIZES: Tuple[Tuple[type, Callable[..., Optional[int]]], ...] = (
+    (int, int),
+    (list, len),
+    (tuple, _tuple_size),
+)
+
+
+def result_size(result) -> Optional[int]:
+    """Return count of subscriptions in result of Controller or storage helper method, None if it is unknown"""
+    if result is None or isinstance(result, bool):
+        return None
+    for result_type, size in _RESULT_SIZES:
+        if isinstance(result, result_type):
+            return size(result)
+    return _object_size(result)
+
+
+def _counted(iterator: Iterator, registry: MetricsRegistry, key: Tuple[str, str, str]) -> Iterator:
+    """Yield items of iterator and record their count, when iterator is exhausted or closed"""
+    count = 0
+    try:
+        for item in iterator:
+            count += 1
+            yield item
+    finally:
+        registry.record_result_size(*key, count)
+
+
+def _timed(method, registry: MetricsRegistry, component: str, name: str):
+    key = (component, name, DB_OPERATIONS.get(name, "") if component == "dbhelper" else "")
+
+    @wraps(method)
+    def timed(*args, **kwargs):
+        started = perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            registry.record(*key, perf_counter() - started, failed=True)
+            raise
+        elapsed = perf_counter() - started
+        if hasattr(result, "__next__"):
+            # latency of streams is time of the first request, size is known when stream is consumed
+            registry.record(*key, elapsed)
+            return _counted(result, registry, key)
+        registry.record(*key, elapsed, result_size=result_size(result))
+        return result
+
+    timed.instrumented = True
+    return timed
+
+
+def instrument(target, component: str, registry: MetricsRegistry = None):
+    """
+    Record calls of all public methods of the object, methods are replaced on the instance only,
+    so not instrumented objects have no overhead at all
+    Args:
+        target: Controller, storage helper or other object
+        component (str): label of the object in metrics, e.g. "controller" or "dbhelper"
+        registry (MetricsRegistry): not mandatory, REGISTRY by default
+    """
+    registry = REGISTRY if registry is None else registry
+    for name, _ in inspect.getmembers(type(target), inspect.isfunction):
+        if name.startswith("_") or getattr(vars(target).get(name), "instrumented", False):
+            continue
+        setattr(target, name, _timed(getattr(target, name), registry, component, name))
+
+
+def uninstrument(target):
+    """Remove instrumentation from the object"""
+    for name, value in list(vars(target).items()):
+        if getattr(value, "instrumented", False):
+            delattr(target, name)
+
+
+def instrument_controller(controller, registry: MetricsRegistry = None) -> MetricsRegistry:
+    """
+    Record calls of Controller methods and of its storage helper methods
+    Examples:
+        registry = instrument_controller(controller, MetricsRegistry())
+        controller.get_subscriptions_list("Mary")
+        print(registry.to_prometheus())
+    Returns:
+        MetricsRegistry: registry with metrics
+    """
+    registry = REGISTRY if registry is None else registry
+    instrument(controller, "controller", registry)
+    instrument(controller.dbhelper, "dbhelper", registry)
+    return registry
@@ -0,0 +1,84 @@
+import atexit
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+from pymongo import MongoClient
+
+from subscription_manager.common.constants import (
+    DEFAULT_CONNECT_TIMEOUT_MS,
+    DEFAULT_MAX_POOL_SIZE,
+    DEFAULT_SERVER_SELECTION_TIMEOUT_MS,
+)
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Connection pool settings of MongoClient
+        Attributes:
+            max_pool_size (int): max count of connections to every server
+            min_pool_size (int): count of connections kept open even when they are idle
+            max_idle_time_ms (int): not mandatory, idle connections are closed after this time
+            connect_timeout_ms (int): timeout of opening connection
+            server_selection_timeout_ms (int): timeout of finding available server for operation
+    """
+
+    max_pool_size: int = DEFAULT_MAX_POOL_SIZE
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    connect_timeout_ms: int = DEFAULT_CONNECT_TIMEOUT_MS
+    server_selection_timeout_ms: int = DEFAULT_SERVER_SELECTION_TIMEOUT_MS
+
+    def client_options(self) -> dict:
+        """Return MongoClient keyword arguments"""
+        return dict(
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=self.min_pool_size,
+            maxIdleTimeMS=self.max_idle_time_ms,
+            connectTimeoutMS=self.connect_timeout_ms,
+            serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+        )
+
+
+_clients: Dict[str, MongoClient] = {}
+_clients_lock = Lock()
+
+
+def get_client(
+    connection_string: str,
+    config: PoolConfig = None,
+    client_factory: Callable[..., MongoClient] = None,
+) -> MongoClient:
+    """
+    Return process-wide MongoClient for the connection string.
+    The first call creates the client, so TLS handshake, SRV lookup and server discovery are done once,
+    next calls reuse the client and its connection pool. Clients are closed at interpreter exit.
+    Args:
+        connection_string (str): MongoDB connection string
+        config (PoolConfig): not mandatory, pool settings, used only when the client is created
+        client_factory (Callable): not mandatory, class or function creating the client, MongoClient by default
+    Returns:
+        MongoClient: shared client
+    """
+    client = _clients.get(connection_string)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(connection_string)
+        if client is None:
+            options = (config or PoolConfig()).client_options()
+            client = (client_factory or MongoClient)(connection_string, **options)
+            _clients[connection_string] = client
+        return client
+
+
+def close_clients():
+    """Close all shared clients, next get_client call creates new client"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(close_clients)
@@ -0,0 +1,129 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson.objectid import ObjectId
+from pymongo.errors import PyMongoError
+
+from subscription_manager.async_dbhelper import AsyncBaseDBHelper
+from subscription_manager.base_dbhelper import Change
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHANGES_OVERLAP,
+    DEFAULT_COLLECTION_NAME,
+    SEQUENCES_COLLECTION_NAME,
+    SPEND_GROUP_FIELDS,
+    TOMBSTONES_COLLECTION_NAME,
+)
+from subscription_manager.dbhelper import (
+    CURSOR_METHODS,
+    MongoRequest,
+    RequestPlan,
+    add_subscription_plan,
+    add_subscriptions_plan,
+    apply_changes_plan,
+    changes_since_plan,
+    delete_subscription_plan,
+    ensure_indexes_plan,
+    from_document,
+    get_subscription_plan,
+    get_versioned_subscription_plan,
+    reserve_sequence_plan,
+    spend_summary_plan,
+    update_subscriptions_plan,
+)
+from subscription_manager.subscription import Subscription
+
+
+class MotorDBHelper(AsyncBaseDBHelper):
+    """Asyncio helper for MongoDB on top of motor driver, methods mirror DBHelper as coroutines.
+    Requests are built by the plans of DBHelper and awaited, so writes take the same round trips
+    and a write is lost for readers of changes, if it becomes visible more than changes_overlap seconds
+    after a larger sequence number was read, see BaseDBHelper. Changes are followed by polling
+    """
+
+    changes_overlap = DEFAULT_CHANGES_OVERLAP
+
+    def __init__(self, db_url: str, db_credentials: dict, db_name: str, client=None):
+        """Connects to MongoDB Atlas cluster, already connected AsyncIOMotorClient can be taken instead"""
+        if client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            _connection_string = \
+                f"mongodb+srv://{db_credentials['user']}:{db_credentials['password']}@{db_url}/{db_name}?" \
+                f"retryWrites=true&w=majority"
+            client = AsyncIOMotorClient(_connection_string)
+        self.client = client
+        self.db = self.client[db_name]
+        self.subscriptions = self.db[DEFAULT_COLLECTION_NAME]
+        self.sequences = self.db[SEQUENCES_COLLECTION_NAME]
+        self.tombstones = self.db[TOMBSTONES_COLLECTION_NAME]
+
+    async def _request(self, request: MongoRequest):
+        """Await request to the collection, cursor of the reply is read to list"""
+        method = getattr(getattr(self, request.collection), request.method)
+        if request.method in CURSOR_METHODS:
+            return [document async for document in method(*request.args, **request.kwargs)]
+        return await method(*request.args, **request.kwargs)
+
+    async def _send(self, plan: RequestPlan):
+        """Await requests of the plan one by one, reply or error of every request is passed back to the plan"""
+        reply = error = None
+        while True:
+            try:
+                request = plan.send(reply) if error is None else plan.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            reply = error = None
+            try:
+                reply = await self._request(request)
+            except PyMongoError as exc:
+                error = exc
+
+    async def ensure_indexes(self) -> List[str]:
+        return await self._send(ensure_indexes_plan())
+
+    async def _reserve_sequence(self, count: int = 1) -> int:
+        return await self._send(reserve_sequence_plan(count))
+
+    async def add_subscription(self, subscription: Subscription):
+        return await self._send(add_subscription_plan(subscription))
+
+    async def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[ObjectId]], Dict[int, str]]:
+        return await self._send(add_subscriptions_plan(subscriptions))
+
+    async def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> AsyncIterator[dict]:
+        query = {} if owner is None else {"owner": owner}
+        async for document in self.subscriptions.find(query, projection, batch_size=batch_size):
+            yield from_document(document)
+
+    async def get_subscription(self, subscription_name: str) -> dict:
+        return await self._send(get_subscription_plan(subscription_name))
+
+    async def spend_summary(
+        self, owner: str = None, group_by: Tuple[str, ...] = SPEND_GROUP_FIELDS
+    ) -> List[dict]:
+        return await self._send(spend_summary_plan(owner, group_by))
+
+    async def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> AsyncIterator[dict]:
+        async for document in self.subscriptions.find(subscription_filter, projection):
+            yield from_document(document)
+
+    async def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        return await self._send(update_subscriptions_plan(subscription_filter, changes))
+
+    async def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        return await self._send(get_versioned_subscription_plan(subscription_name))
+
+    async def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        return await self._send(apply_changes_plan(subscription_name, changes, expected_version))
+
+    async def delete_subscription(self, subscription_name: str) -> int:
+        return await self._send(delete_subscription_plan(subscription_name))
+
+    async def changes_since(self, watermark: int = 0) -> List[Change]:
+        return await self._send(changes_since_plan(watermark))
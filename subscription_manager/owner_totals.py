@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+from math import isclose
+from typing import Dict, Iterable, List, Tuple
+
+from subscription_manager.base_dbhelper import BaseDBHelper
+from subscription_manager.common.constants import TOTALS_RELATIVE_TOLERANCE
+from subscription_manager.common.dates import PAYMENTS_PER_MONTH
+from subscription_manager.listener import NameIndex, SubscriptionKey, SubscriptionListener
+from subscription_manager.subscription import Subscription
+
+# Fields of subscription needed to count its contribution to totals
+CONTRIBUTION_PROJECTION = {"name": True, "owner": True, "currency": True, "frequency": True, "price": True}
+
+# owner -> currency -> [monthly spend, count]
+Totals = Dict[str, Dict[str, list]]
+
+
+def monthly_spend(subscription: dict) -> float:
+    """Return monthly spend of subscription dict"""
+    return subscription["price"] * PAYMENTS_PER_MONTH.get(subscription["frequency"], 0.0)
+
+
+def sum_totals(subscriptions: Iterable[dict]) -> Totals:
+    """Sum monthly spend and count of subscriptions by owner and currency"""
+    totals: Totals = {}
+    for subscription in subscriptions:
+        total = totals.setdefault(subscription["owner"], {}).setdefault(subscription["currency"], [0.0, 0])
+        total[0] += monthly_spend(subscription)
+        total[1] += 1
+    return totals
+
+
+def load_totals(collection) -> Totals:
+    """Return totals persisted to MongoDB collection by OwnerTotals"""
+    totals: Totals = {}
+    for document in collection.find({}, {"_id": False}):
+        totals.setdefault(document["owner"], {})[document["currency"]] = [
+            document["monthly_spend"], document["count"]
+        ]
+    return totals
+
+
+@dataclass
+class TotalsDrift:
+    """Difference between maintained and rebuilt total of one owner in one currency
+        Attributes:
+            owner (str): owner of subscriptions
+            currency (str): currency of subscriptions
+            monthly_spend (float): maintained monthly spend
+            expected_monthly_spend (float): monthly spend rebuilt from subscriptions
+            count (int): maintained count of subscriptions
+            expected_count (int): count of subscriptions in storage
+    """
+
+    owner: str
+    currency: str
+    monthly_spend: float
+    expected_monthly_spend: float
+    count: int
+    expected_count: int
+
+
+class OwnerTotals(SubscriptionListener):
+    """Materialized monthly spend of every owner in every currency.
+    Totals are updated with deltas when Controller adds, edits or deletes subscriptions, so reading costs O(1).
+    Contribution of every subscription is kept by owner and name to compute deltas of edits and deletions.
+    If collection is given, totals are persisted there with $inc updates, one document per owner and currency,
+    and build takes totals from it instead of rewriting it.
+        Attributes:
+            collection: not mandatory, MongoDB collection for persisted totals, e.g. DBHelper.owner_totals
+        Methods:
+            build: build totals from storage and persisted totals
+            monthly_total: return monthly spend of owner in currency
+            yearly_total: return yearly spend of owner in currency
+            totals: return monthly spend of owner in every currency
+            check: sum totals from storage and report drift
+    """
+
+    def __init__(self, subscriptions: Iterable[dict] = (), collection=None, totals: Totals = None):
+        """
+        Args:
+            subscriptions (Iterable[dict]): subscriptions dicts with name, owner, currency, frequency and price
+            collection: not mandatory, MongoDB collection for persisted totals, it is overwritten if totals are None
+            totals (Totals): not mandatory, totals loaded from collection, subscriptions give only contributions
+        """
+        self._totals: Totals = {}
+        # (owner, subscription name) -> (currency, monthly spend)
+        self._contributions: Dict[SubscriptionKey, Tuple[str, float]] = {}
+        self._names = NameIndex()
+        # initial totals are persisted at once, not with update per subscription
+        self.collection = None
+        for subscription in subscriptions:
+            self._add(subscription)
+        self.collection = collection
+        if totals is None:
+            self._save_all()
+        else:
+            self._totals = totals
+
+    @classmethod
+    def build(cls, dbhelper: BaseDBHelper, collection=None) -> "OwnerTotals":
+        """Build totals from all subscriptions of storage, only needed fields are received.
+        Not empty collection is not rewritten, totals are loaded from it, check reports its drift
+        """
+        totals = load_totals(collection) if collection is not None else None
+        return cls(dbhelper.iter_subscriptions(projection=CONTRIBUTION_PROJECTION), collection, totals or None)
+
+    def __len__(self):
+        return len(self._contributions)
+
+    def monthly_total(self, owner: str, currency: str) -> float:
+        """Return monthly spend of owner's subscriptions in currency"""
+        total = self._totals.get(owner, {}).get(currency)
+        return 0.0 if total is None else total[0]
+
+    def yearly_total(self, owner: str, currency: str) -> float:
+        """Return yearly spend of owner's subscriptions in currency"""
+        return self.monthly_total(owner, currency) * 12
+
+    def totals(self, owner: str) -> Dict[str, float]:
+        """Return monthly spend of owner's subscriptions by currency"""
+        return {currency: total[0] for currency, total in self._totals.get(owner, {}).items()}
+
+    def _apply(self, owner: str, currency: str, monthly_spend: float, count: int):
+        """Add delta to the total of owner in currency, empty totals are removed"""
+        currencies = self._totals.setdefault(owner, {})
+        total = currencies.setdefault(currency, [0.0, 0])
+        total[0] += monthly_spend
+        total[1] += count
+        if self.collection is not None:
+            self.collection.update_one(
+                {"owner": owner, "currency": currency},
+                {"$inc": {"monthly_spend": monthly_spend, "count": count}},
+                upsert=True,
+            )
+        if total[1] == 0:
+            del currencies[currency]
+            if not currencies:
+                del self._totals[owner]
+            if self.collection is not None:
+                self.collection.delete_one({"owner": owner, "currency": currency, "count": 0})
+
+    def _add(self, subscription: dict):
+        key = (subscription["owner"], subscription["name"])
+        self._remove(key)
+        contribution = (subscription["currency"], monthly_spend(subscription))
+        self._contributions[key] = contribution
+        self._names.add(key)
+        self._apply(key[0], *contribution, 1)
+
+    def _remove(self, key: SubscriptionKey):
+        contribution = self._contributions.pop(key, None)
+        if contribution is not None:
+            self._names.discard(key)
+            currency, spend = contribution
+            self._apply(key[0], currency, -spend, -1)
+
+    def _save_all(self):
+        """Replace persisted totals with totals kept in memory"""
+        if self.collection is None:
+            return
+        self.collection.delete_many({})
+        documents = [
+            {"owner": owner, "currency": currency, "monthly_spend": total[0], "count": total[1]}
+            for owner, currencies in self._totals.items()
+            for currency, total in currencies.items()
+        ]
+        if documents:
+            self.collection.insert_many(documents)
+
+    def check(self, dbhelper: BaseDBHelper, repair: bool = False) -> List[TotalsDrift]:
+        """
+        Sum totals from storage without maintained contributions and compare them with maintained totals
+        Args:
+            dbhelper (BaseDBHelper): storage with subscriptions
+            repair (bool): replace maintained and persisted totals with rebuilt ones
+        Returns:
+            List[TotalsDrift]: totals that differ, sorted by owner and currency
+        """
+        subscriptions = list(dbhelper.iter_subscriptions(projection=CONTRIBUTION_PROJECTION))
+        expected_totals = sum_totals(subscriptions)
+        drifts = []
+        for owner in sorted(self._totals.keys() | expected_totals.keys()):
+            currencies = self._totals.get(owner, {})
+            expected_currencies = expected_totals.get(owner, {})
+            for currency in sorted(currencies.keys() | expected_currencies.keys()):
+                monthly_spend, count = currencies.get(currency, (0.0, 0))
+                expected_monthly_spend, expected_count = expected_currencies.get(currency, (0.0, 0))
+                if count != expected_count or not isclose(
+                    monthly_spend, expected_monthly_spend, rel_tol=TOTALS_RELATIVE_TOLERANCE
+                ):
+                    drifts.append(TotalsDrift(
+                        owner, currency, monthly_spend, expected_monthly_spend, count, expected_count
+                    ))
+        if repair:
+            rebuilt = OwnerTotals(subscriptions)
+            self._totals = rebuilt._totals
+            self._contributions = rebuilt._contributions
+            self._names = rebuilt._names
+            self._save_all()
+        return drifts
+
+    def subscription_added(self, subscription: Subscription):
+        self._add(vars(subscription))
+
+    def subscription_edited(self, subscription_name: str, subscription: Subscription, owner: str = None):
+        self._remove(self._names.key(subscription_name, owner))
+        self._add(vars(subscription))
+
+    def subscription_deleted(self, subscription_name: str, owner: str = None):
+        self._remove(self._names.key(subscription_name, owner))
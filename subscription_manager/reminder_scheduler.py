@@ -0,0 +1,261 @@
+import heapq
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import count
+from threading import Event, RLock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from subscription_manager.common.constants import DEFAULT_REMINDER_BATCH_SIZE, DEFAULT_REMINDER_LEAD_DAYS
+from subscription_manager.common.dates import next_payment_date
+from subscription_manager.listener import NameIndex, SubscriptionKey, SubscriptionListener, subscription_key
+from subscription_manager.subscription import Subscription
+
+
+class SystemClock:
+    """Wall clock, sleeping is interrupted when the wakeup event is set"""
+
+    # sleeping waits for reminders armed by other threads
+    waits = True
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def sleep_until(self, moment: Optional[datetime], wakeup: Event):
+        """Sleep until the moment, forever if moment is None, or until wakeup is set"""
+        timeout = None if moment is None else max((moment - self.now()).total_seconds(), 0.0)
+        wakeup.wait(timeout)
+
+
+class SimulatedClock:
+    """Clock for deterministic runs, sleeping moves the time forward at once
+        Attributes:
+            current (datetime): current time of the clock
+    """
+
+    # sleeping returns at once, nothing can be armed meanwhile
+    waits = False
+
+    def __init__(self, current: datetime):
+        self.current = current
+
+    def now(self) -> datetime:
+        return self.current
+
+    def advance(self, delta: timedelta):
+        self.current += delta
+
+    def sleep_until(self, moment: Optional[datetime], wakeup: Event):
+        if moment is not None and moment > self.current:
+            self.current = moment
+
+
+@dataclass
+class Reminder:
+    """Reminder about the upcoming payment
+        Attributes:
+            subscription (Subscription): subscription to pay for
+            payment_date (date): date of the payment
+            due (datetime): moment the reminder was scheduled for
+    """
+
+    subscription: Subscription
+    payment_date: date
+    due: datetime
+
+
+class ReminderScheduler(SubscriptionListener):
+    """Scheduler of reminders sent lead_days before every payment at remind_at time.
+    Next reminder moment of every subscription is kept in a heap, so the scheduler sleeps until the earliest one
+    and only subscriptions, which reminders were sent, are rescheduled. Changes made by Controller re-arm entries,
+    replaced heap entries are skipped when they reach the top. Subscriptions are kept by owner and name.
+        Attributes:
+            send (Callable[[List[Reminder]], None]): receiver of reminders, called with batches of batch_size
+            owner (str): not mandatory, if not None only subscriptions of specified owner are scheduled
+            clock: SystemClock or SimulatedClock
+            lead_days (int): count of days between reminder and payment
+            remind_at (time): time of the day, when reminders are sent
+            batch_size (int): max count of reminders in one call of send
+        Methods:
+            arm: schedule the next reminder of subscription, previous one of the same subscription is replaced
+            disarm: cancel reminders of subscription
+            next_due: return the earliest reminder moment
+            run_pending: send reminders, which moments have come
+            run: send reminders as their moments come until stop is called or until the given moment
+            stop: stop run loop
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[Reminder]], None],
+        subscriptions: Iterable[Subscription] = (),
+        owner: str = None,
+        clock=None,
+        lead_days: int = DEFAULT_REMINDER_LEAD_DAYS,
+        remind_at: time = time(9, 0),
+        batch_size: int = DEFAULT_REMINDER_BATCH_SIZE,
+    ):
+        self.send = send
+        self.owner = owner
+        self.clock = SystemClock() if clock is None else clock
+        self.lead_days = lead_days
+        self.remind_at = remind_at
+        self.batch_size = batch_size
+        # (owner, name) -> (sequence number, payment date, subscription)
+        self._armed: Dict[SubscriptionKey, Tuple[int, date, Subscription]] = {}
+        self._names = NameIndex()
+        self._sequence = count()
+        self._lock = RLock()
+        self._wakeup = Event()
+        self._stopped = False
+        # (owner, name) -> date of the last payment, which reminder was sent
+        self._reminded: Dict[SubscriptionKey, date] = {}
+        now = self.clock.now()
+        # (moment, sequence number, (owner, name)), sequence number identifies the actual entry
+        self._heap: List[Tuple[datetime, int, SubscriptionKey]] = [
+            self._arm(subscription, now)
+            for subscription in subscriptions
+            if owner is None or subscription.owner == owner
+        ]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._armed)
+
+    def __contains__(self, subscription_name: str):
+        return subscription_name in self._names
+
+    def _reminder_moment(self, payment_date: date) -> datetime:
+        return datetime.combine(payment_date - timedelta(days=self.lead_days), self.remind_at)
+
+    def _arm(self, subscription: Subscription, now: datetime) -> Tuple[datetime, int, SubscriptionKey]:
+        """Schedule the first payment, which reminder is not before now and which was not reminded yet"""
+        key = subscription_key(subscription)
+        earliest = now.date() + timedelta(days=self.lead_days + (now.time() > self.remind_at))
+        reminded = self._reminded.get(key)
+        if reminded is not None and reminded >= earliest:
+            earliest = reminded + timedelta(days=1)
+        payment_date = next_payment_date(subscription.start_date, subscription.frequency, earliest)
+        sequence = next(self._sequence)
+        self._armed[key] = (sequence, payment_date, subscription)
+        self._names.add(key)
+        return self._reminder_moment(payment_date), sequence, key
+
+    def arm(self, subscription: Subscription):
+        """
+        Schedule the next reminder of subscription, previous reminder of the same owner's subscription
+        with the same name is replaced
+        Args:
+            subscription (Subscription): subscription to remind about
+        """
+        if self.owner is not None and subscription.owner != self.owner:
+            return
+        with self._lock:
+            heapq.heappush(self._heap, self._arm(subscription, self.clock.now()))
+            if len(self._heap) > 2 * len(self._armed):
+                self._compact()
+        self._wakeup.set()
+
+    def disarm(self, subscription_name: str, owner: str = None) -> bool:
+        """
+        Cancel reminders of subscription, heap entry is dropped when it reaches the top
+        Args:
+            subscription_name (str): name of subscription
+            owner (str): not mandatory, owner of subscription, the first subscription with the name if None
+        Returns:
+            bool: True if subscription was scheduled
+        """
+        with self._lock:
+            key = self._names.key(subscription_name, owner)
+            if key is None:
+                return False
+            self._names.discard(key)
+            self._reminded.pop(key, None)
+            return self._armed.pop(key, None) is not None
+
+    def _compact(self):
+        """Rebuild heap without replaced entries, so frequent edits do not grow it"""
+        self._heap = [entry for entry in self._heap if self._armed.get(entry[2], (None,))[0] == entry[1]]
+        heapq.heapify(self._heap)
+
+    def _drop_replaced(self):
+        """Remove entries of disarmed and re-armed subscriptions from the top of the heap"""
+        heap = self._heap
+        while heap:
+            _, sequence, key = heap[0]
+            armed = self._armed.get(key)
+            if armed is not None and armed[0] == sequence:
+                return
+            heapq.heappop(heap)
+
+    def next_due(self) -> Optional[datetime]:
+        """Return the earliest reminder moment, None if nothing is scheduled"""
+        with self._lock:
+            self._drop_replaced()
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self) -> int:
+        """
+        Send reminders, which moments are not later than now, in batches of batch_size.
+        Subscriptions of sent reminders are rescheduled to their next payments before sending,
+        so a failed send does not block later reminders and reminders are not repeated
+        Returns:
+            int: count of sent reminders
+        """
+        with self._lock:
+            now = self.clock.now()
+            reminders = []
+            while True:
+                self._drop_replaced()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                moment, _, key = heapq.heappop(self._heap)
+                _, payment_date, subscription = self._armed[key]
+                reminders.append(Reminder(subscription, payment_date, moment))
+                self._reminded[key] = payment_date
+            for reminder in reminders:
+                heapq.heappush(self._heap, self._arm(reminder.subscription, now))
+        for start in range(0, len(reminders), self.batch_size):
+            self.send(reminders[start:start + self.batch_size])
+        return len(reminders)
+
+    def run(self, until: datetime = None) -> int:
+        """
+        Sleep until the earliest reminder moment and send due reminders, changes of schedule wake the loop
+        Args:
+            until (datetime): not mandatory, the loop is finished at this moment, otherwise it runs until stop
+                or, with SimulatedClock, until no reminders are left
+        Returns:
+            int: count of sent reminders
+        """
+        sent = 0
+        self._stopped = False
+        while not self._stopped:
+            self._wakeup.clear()
+            moment = self.next_due()
+            if moment is None and until is None and not self.clock.waits:
+                return sent
+            if until is not None and (moment is None or moment > until):
+                self.clock.sleep_until(until, self._wakeup)
+                if self.clock.now() >= until:
+                    return sent + self.run_pending()
+                continue
+            self.clock.sleep_until(moment, self._wakeup)
+            sent += self.run_pending()
+        return sent
+
+    def stop(self):
+        """Stop run loop, it can be called from another thread"""
+        self._stopped = True
+        self._wakeup.set()
+
+    def subscription_added(self, subscription: Subscription):
+        self.arm(subscription)
+
+    def subscription_edited(self, subscription_name: str, subscription: Subscription, owner: str = None):
+        previous_key = self._names.key(subscription_name, owner)
+        if previous_key != subscription_key(subscription):
+            self.disarm(subscription_name, owner)
+        self.arm(subscription)
+
+    def subscription_deleted(self, subscription_name: str, owner: str = None):
+        self.disarm(subscription_name, owner)
@@ -0,0 +1,530 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import date
+from threading import RLock, Thread
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, ChangeWatermark
+from subscription_manager.common.constants import FREQUENCIES, SNAPSHOT_COMPACT_RATIO
+from subscription_manager.listener import NameIndex, SubscriptionKey, SubscriptionListener, subscription_key
+from subscription_manager.subscription import Subscription
+
+SNAPSHOT_MAGIC = b"SMSS"
+SNAPSHOT_FORMAT_VERSION = 2
+# magic, format version, count of records, count of strings, offsets of records, name index and string table,
+# watermark: the largest sequence number of storage changes in the snapshot
+HEADER = struct.Struct("<4sIIIQQQQ")
+# owner, name, currency and comment string ids, start date ordinal, frequency code, price
+RECORD = struct.Struct("<IIIIIB3xd")
+UINT32 = struct.Struct("<I")
+STRING_BOUNDS = struct.Struct("<II")
+FREQUENCY_CODES = {frequency: code for code, frequency in enumerate(FREQUENCIES)}
+
+
+def _uint32_bytes(values: array) -> bytes:
+    """Return unsigned integers as little-endian bytes"""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(path: str, subscriptions: Iterable[Subscription], watermark: int = 0) -> int:
+    """
+    Write subscriptions to binary snapshot file, the file is replaced atomically.
+    Layout: header, fixed-width records in the order of subscriptions, record numbers sorted by name
+    and string table with owners, names, currencies and comments, every distinct string is stored once
+    Args:
+        path (str): path of snapshot file
+        subscriptions (Iterable[Subscription]): subscriptions to store
+        watermark (int): the largest sequence number of storage changes in subscriptions, 0 if it is unknown
+    Returns:
+        int: count of written subscriptions
+    """
+    string_ids: Dict[str, int] = {}
+    strings = bytearray()
+    string_offsets = array("I", [0])
+
+    def string_id(value: str) -> int:
+        identifier = string_ids.get(value)
+        if identifier is None:
+            identifier = string_ids[value] = len(string_ids)
+            strings.extend(value.encode("utf-8"))
+            string_offsets.append(len(strings))
+        return identifier
+
+    records = bytearray()
+    names = []
+    for subscription in subscriptions:
+        names.append(subscription.name)
+        records += RECORD.pack(
+            string_id(subscription.owner),
+            string_id(subscription.name),
+            string_id(subscription.currency),
+            string_id(subscription.comment),
+            subscription.start_date.toordinal(),
+            FREQUENCY_CODES[subscription.frequency],
+            subscription.price,
+        )
+    count = len(names)
+    # stable sort keeps the first of subscriptions with equal names first
+    name_index = array("I", sorted(range(count), key=names.__getitem__))
+    records_offset = HEADER.size
+    index_offset = records_offset + len(records)
+    strings_offset = index_offset + count * UINT32.size
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as output:
+        output.write(HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, count, len(string_ids),
+            records_offset, index_offset, strings_offset, watermark,
+        ))
+        output.write(records)
+        output.write(_uint32_bytes(name_index))
+        output.write(_uint32_bytes(string_offsets))
+        output.write(strings)
+    os.replace(temporary_path, path)
+    return count
+
+
+class Snapshot:
+    """Read-only view of snapshot file mapped to memory.
+    Records are decoded on access, so opening costs O(1) regardless of count of subscriptions.
+    Lookup by name is binary search over the name index, listing scans fixed-width records.
+        Attributes:
+            watermark (int): the largest sequence number of storage changes in the snapshot
+        Methods:
+            find: return subscriptions with the name
+            get: return subscription by name and owner
+            iter_subscriptions: stream subscriptions in the stored order
+            iter_keys: stream owners and names of subscriptions in the stored order
+            close: unmap the file
+    Raises:
+        ValueError: when the file is not a snapshot of supported format
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (
+                magic, format_version, self._count, self._string_count,
+                self._records_offset, self._index_offset, self._strings_offset, self.watermark,
+            ) = HEADER.unpack_from(self._map)
+        except struct.error:
+            self._map.close()
+            raise ValueError(f"{path} is not a subscriptions snapshot")
+        if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a subscriptions snapshot of version {SNAPSHOT_FORMAT_VERSION}")
+        self._string_bytes_offset = self._strings_offset + (self._string_count + 1) * UINT32.size
+        self._strings: Dict[int, str] = {}
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._map.close()
+
+    def _string(self, identifier: int) -> str:
+        value = self._strings.get(identifier)
+        if value is None:
+            start, end = STRING_BOUNDS.unpack_from(self._map, self._strings_offset + identifier * UINT32.size)
+            offset = self._string_bytes_offset
+            value = self._strings[identifier] = self._map[offset + start:offset + end].decode("utf-8")
+        return value
+
+    def _subscription(self, fields: tuple) -> Subscription:
+        owner_id, name_id, currency_id, comment_id, ordinal, frequency_code, price = fields
+        return Subscription(
+            owner=self._string(owner_id),
+            name=self._string(name_id),
+            frequency=FREQUENCIES[frequency_code],
+            start_date=date.fromordinal(ordinal),
+            price=price,
+            currency=self._string(currency_id),
+            comment=self._string(comment_id),
+        )
+
+    def _index_record(self, position: int) -> Tuple[int, ...]:
+        number, = UINT32.unpack_from(self._map, self._index_offset + position * UINT32.size)
+        return RECORD.unpack_from(self._map, self._records_offset + number * RECORD.size)
+
+    def find(self, subscription_name: str) -> List[Subscription]:
+        """Return subscriptions with the name in the stored order, subscriptions of different owners share names"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._string(self._index_record(middle)[1]) < subscription_name:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        for position in range(low, self._count):
+            fields = self._index_record(position)
+            if self._string(fields[1]) != subscription_name:
+                break
+            found.append(self._subscription(fields))
+        return found
+
+    def get(self, subscription_name: str, owner: str = None) -> Optional[Subscription]:
+        """Return subscription by name and owner, the first subscription with the name if owner is None,
+        None if it is not in the snapshot
+        """
+        for subscription in self.find(subscription_name):
+            if owner is None or subscription.owner == owner:
+                return subscription
+        return None
+
+    def iter_subscriptions(self, owner: str = None) -> Iterator[Subscription]:
+        """Stream subscriptions, owner is compared once per string id, so records of other owners are not decoded"""
+        records = memoryview(self._map)[self._records_offset:self._index_offset]
+        owner_matches: Dict[int, bool] = {}
+        try:
+            for fields in RECORD.iter_unpack(records):
+                if owner is not None:
+                    matches = owner_matches.get(fields[0])
+                    if matches is None:
+                        matches = owner_matches[fields[0]] = self._string(fields[0]) == owner
+                    if not matches:
+                        continue
+                yield self._subscription(fields)
+        finally:
+            records.release()
+
+    def iter_keys(self) -> Iterator[SubscriptionKey]:
+        """Stream owners and names of subscriptions in the stored order"""
+        records = memoryview(self._map)[self._records_offset:self._index_offset]
+        try:
+            for fields in RECORD.iter_unpack(records):
+                yield self._string(fields[0]), self._string(fields[1])
+        finally:
+            records.release()
+
+
+@dataclass
+class SyncResult:
+    """Difference between local subscriptions and storage found by sync
+        Attributes:
+            added (int): count of subscriptions missing locally
+            changed (int): count of subscriptions changed in storage
+            removed (int): count of subscriptions deleted from storage
+    """
+
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+class SnapshotStore(SubscriptionListener):
+    """Local copy of subscriptions used by Controller reads, it is a snapshot file and changes made after it.
+    Snapshot is opened without reading records, so reads are served right after restart.
+    Changes made through Controller are kept in memory over the snapshot by owner and name. Snapshot stores
+    the watermark of storage changes, so sync reads only changes after it and keeps them in memory too,
+    the file is rewritten when there is no snapshot or when kept changes grow large.
+    Snapshot file belongs to one storage, watermarks of other storages are meaningless.
+        Attributes:
+            path (str): path of snapshot file
+            synced (bool): True after the first sync with storage
+            watermark (int): sequence number, all storage changes up to which were applied by sync,
+                it trails the applied changes by the overlap of storage, see ChangeWatermark
+        Methods:
+            available: True if snapshot file is mapped, until then reads are served by storage
+            get: return subscription by name and owner
+            list: return subscriptions of snapshot, changed and added subscriptions follow
+            sync: bring local copy up to date with storage
+            async_sync: sync with asyncio storage helper
+            start_sync: run sync in background thread
+            wait_synced: wait for background sync
+            compact: rewrite snapshot file with kept changes
+            close: write kept changes and unmap snapshot file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.synced = False
+        self._watermark = ChangeWatermark()
+        self._lock = RLock()
+        self._snapshot: Optional[Snapshot] = None
+        # (owner, name) -> subscription changed after snapshot was written, None for deleted subscriptions
+        self._overlay: Dict[SubscriptionKey, Optional[Subscription]] = {}
+        self._overlay_names = NameIndex()
+        # changes made during sync, they are applied again over the changes read from storage
+        self._sync_changes: Optional[Dict[SubscriptionKey, Optional[Subscription]]] = None
+        self._thread: Optional[Thread] = None
+        try:
+            self._snapshot = Snapshot(path)
+            self._watermark = ChangeWatermark(self._snapshot.watermark)
+        except (OSError, ValueError):
+            self._snapshot = None
+
+    def __len__(self):
+        return len(self.list())
+
+    @property
+    def watermark(self) -> int:
+        return self._watermark.value
+
+    @property
+    def available(self) -> bool:
+        """True if snapshot file is mapped, without it the local copy has only changes made by Controller"""
+        return self._snapshot is not None
+
+    def _unmap(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+
+    def close(self):
+        """Rewrite snapshot file, if changes are kept over it, and unmap it"""
+        with self._lock:
+            if self._overlay and self._snapshot is not None:
+                self.compact()
+            self._unmap()
+
+    def _find(self, subscription_name: str) -> List[Subscription]:
+        """Return local subscriptions with the name, subscriptions of the snapshot go first"""
+        stored = [] if self._snapshot is None else self._snapshot.find(subscription_name)
+        stored_keys = {subscription_key(subscription) for subscription in stored}
+        found = [self._overlay.get(subscription_key(subscription), subscription) for subscription in stored]
+        found.extend(
+            self._overlay[key] for key in self._overlay_names.keys(subscription_name) if key not in stored_keys
+        )
+        return [subscription for subscription in found if subscription is not None]
+
+    def get(self, subscription_name: str, owner: str = None) -> Optional[Subscription]:
+        """Return subscription by name and owner, the first subscription with the name if owner is None,
+        None if it is not known locally
+        """
+        with self._lock:
+            for subscription in self._find(subscription_name):
+                if owner is None or subscription.owner == owner:
+                    return subscription
+            return None
+
+    def _iter_merged(self, owner: str = None) -> Iterator[Subscription]:
+        overlay = self._overlay
+        if self._snapshot is not None:
+            for subscription in self._snapshot.iter_subscriptions(owner):
+                # overlay keeps subscriptions under their own owner and name
+                subscription = overlay.get(subscription_key(subscription), subscription)
+                if subscription is not None:
+                    yield subscription
+        for (key_owner, name), subscription in overlay.items():
+            if subscription is None or owner is not None and key_owner != owner:
+                continue
+            # subscriptions of the snapshot, which were yielded in place, are skipped
+            if self._snapshot is None or self._snapshot.get(name, key_owner) is None:
+                yield subscription
+
+    def list(self, owner: str = None) -> List[Subscription]:
+        """Return subscriptions of snapshot with changes made after it"""
+        with self._lock:
+            return list(self._iter_merged(owner))
+
+    def _rewrite(self, subscriptions: Iterable[Subscription]):
+        # mapped file can not be replaced on every platform, so it is unmapped first
+        self._unmap()
+        write_snapshot(self.path, subscriptions, self.watermark)
+        self._snapshot = Snapshot(self.path)
+
+    def _clear_overlay(self):
+        self._overlay = {}
+        self._overlay_names = NameIndex()
+
+    def _keep(self, changes: Dict[SubscriptionKey, Optional[Subscription]]):
+        """Keep changes over the snapshot"""
+        self._overlay.update(changes)
+        for key in changes:
+            self._overlay_names.add(key)
+
+    def compact(self):
+        """Rewrite snapshot file with changes kept over it, so they are not kept in memory"""
+        with self._lock:
+            subscriptions = list(self._iter_merged())
+            self._rewrite(subscriptions)
+            self._clear_overlay()
+
+    @staticmethod
+    def _diff(
+        changes: Dict[SubscriptionKey, Optional[Subscription]],
+        get: Callable[[str, str], Optional[Subscription]],
+        result: SyncResult,
+    ):
+        """Count differences of changes read from storage and local subscriptions returned by get"""
+        for (owner, name), subscription in changes.items():
+            local = get(name, owner)
+            if local is None:
+                result.added += subscription is not None
+            elif subscription is None:
+                result.removed += 1
+            elif local != subscription:
+                result.changed += 1
+
+    def _unresolved_names(
+        self, received: Dict[SubscriptionKey, Optional[Subscription]], deleted: Set[str]
+    ) -> Set[str]:
+        """
+        Return names, which local subscriptions can not be matched with changes.
+        Tombstones written before they were keyed by owner keep name only, and a subscription moved
+        to another owner before that looks like a new one, so local subscriptions of such names,
+        which have no changes, may be deleted in storage
+        """
+        received_owners: Dict[str, Set[str]] = {}
+        for owner, name in received:
+            received_owners.setdefault(name, set()).add(owner)
+        unresolved = set()
+        for name in deleted | received_owners.keys():
+            local_owners = {subscription.owner for subscription in self._find(name)}
+            owners = received_owners.get(name, set())
+            if local_owners - owners and (name in deleted or owners - local_owners):
+                unresolved.add(name)
+        return unresolved
+
+    def _start_sync(self, overlap: float) -> bool:
+        """Start keeping changes made through Controller, return True if all subscriptions should be read"""
+        with self._lock:
+            self._sync_changes = {}
+            self._watermark.overlap = overlap
+            return self._snapshot is None or self.watermark == 0
+
+    def _read_changes(
+        self, changes: List[Change], full: bool
+    ) -> Tuple[Dict[SubscriptionKey, Optional[Subscription]], Set[str]]:
+        """
+        Move watermark with changes read from storage
+        Returns:
+            Tuple[Dict[SubscriptionKey, Optional[Subscription]], Set[str]]: received subscriptions by owner
+                and name (None for deleted ones), names, which subscriptions should be requested from storage
+        """
+        applied = self._watermark.apply(changes)
+        # full sync needs all subscriptions, delta sync skips changes of the overlap applied before
+        changes = changes if full else applied
+        received: Dict[SubscriptionKey, Optional[Subscription]] = {}
+        deleted: Set[str] = set()
+        for change in changes:
+            if change.subscription is not None:
+                subscription = Subscription(**change.subscription)
+                received[subscription_key(subscription)] = subscription
+            elif change.owner is not None:
+                received[(change.owner, change.name)] = None
+            else:
+                deleted.add(change.name)
+        if full:
+            return {key: subscription for key, subscription in received.items() if subscription is not None}, set()
+        with self._lock:
+            return received, self._unresolved_names(received, deleted)
+
+    def _finish_sync(
+        self,
+        full: bool,
+        received: Dict[SubscriptionKey, Optional[Subscription]],
+        found: Dict[str, List[Subscription]],
+    ) -> SyncResult:
+        """Apply received subscriptions and subscriptions found by name, then changes made during sync"""
+        with self._lock:
+            result = SyncResult()
+            if full:
+                # all subscriptions are compared with the snapshot file, which is rewritten
+                if self._snapshot is None:
+                    result.added = len(received)
+                else:
+                    self._diff(received, self._snapshot.get, result)
+                    result.removed = sum(key not in received for key in self._snapshot.iter_keys())
+                self._rewrite(received.values())
+                self._clear_overlay()
+            else:
+                updates: Dict[SubscriptionKey, Optional[Subscription]] = {
+                    key: subscription for key, subscription in received.items() if key[1] not in found
+                }
+                for name, subscriptions in found.items():
+                    updates.update((subscription_key(local), None) for local in self._find(name))
+                    updates.update((subscription_key(stored), stored) for stored in subscriptions)
+                self._diff(updates, self.get, result)
+                self._keep(updates)
+            self._keep(self._sync_changes)
+            if len(self._overlay) > SNAPSHOT_COMPACT_RATIO * len(self._snapshot):
+                self.compact()
+            self.synced = True
+            return result
+
+    def _end_sync(self):
+        with self._lock:
+            self._sync_changes = None
+
+    def sync(self, dbhelper: BaseDBHelper) -> SyncResult:
+        """
+        Apply changes of storage after the watermark, all subscriptions are read and snapshot file is written
+        if there is no snapshot or it has no watermark. Subscriptions with names, which local subscriptions
+        can not be matched with changes, are requested by name. Changes made through Controller during sync are kept
+        Returns:
+            SyncResult: count of added, changed and removed subscriptions
+        """
+        full = self._start_sync(dbhelper.changes_overlap)
+        try:
+            received, unresolved = self._read_changes(dbhelper.changes_since(self.watermark), full)
+            found = {
+                name: [Subscription(**document) for document in dbhelper.find_subscriptions({"name": name})]
+                for name in sorted(unresolved)
+            }
+            return self._finish_sync(full, received, found)
+        finally:
+            self._end_sync()
+
+    async def async_sync(self, dbhelper) -> SyncResult:
+        """Coroutine version of sync for asyncio storage helpers, MotorDBHelper or ExecutorDBHelper"""
+        full = self._start_sync(dbhelper.changes_overlap)
+        try:
+            received, unresolved = self._read_changes(await dbhelper.changes_since(self.watermark), full)
+            found = {
+                name: [Subscription(**document) async for document in dbhelper.find_subscriptions({"name": name})]
+                for name in sorted(unresolved)
+            }
+            return self._finish_sync(full, received, found)
+        finally:
+            self._end_sync()
+
+    def start_sync(self, dbhelper: BaseDBHelper) -> Thread:
+        """Run sync in daemon thread, so reads are served from snapshot meanwhile"""
+        self._thread = Thread(target=self.sync, args=(dbhelper,), name="snapshot-sync", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait_synced(self, timeout: float = None) -> bool:
+        """Wait for background sync, return True if snapshot is synced"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.synced
+
+    def _set(self, key: SubscriptionKey, subscription: Optional[Subscription]):
+        with self._lock:
+            self._keep({key: subscription})
+            if self._sync_changes is not None:
+                self._sync_changes[key] = subscription
+
+    def _key(self, subscription_name: str, owner: str = None) -> Optional[SubscriptionKey]:
+        """Return key of local subscription, the first subscription with the name if owner is None"""
+        if owner is not None:
+            return owner, subscription_name
+        subscription = self.get(subscription_name)
+        return None if subscription is None else subscription_key(subscription)
+
+    def subscription_added(self, subscription: Subscription):
+        self._set(subscription_key(subscription), subscription)
+
+    def subscription_edited(self, subscription_name: str, subscription: Subscription, owner: str = None):
+        key = self._key(subscription_name, owner)
+        if key is not None and key != subscription_key(subscription):
+            self._set(key, None)
+        self._set(subscription_key(subscription), subscription)
+
+    def subscription_deleted(self, subscription_name: str, owner: str = None):
+        key = self._key(subscription_name, owner)
+        if key is not None:
+            self._set(key, None)
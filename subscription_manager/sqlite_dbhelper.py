@@ -0,0 +1,314 @@
+import sqlite3
+from datetime import date
+from threading import RLock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, apply_projection, sort_changes
+from subscription_manager.common.constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_COLLECTION_NAME,
+    KEY_FIELDS,
+    SEQUENCES_COLLECTION_NAME,
+    SUBSCRIPTION_INDEXES,
+    SUBSCRIPTION_NOT_FOUND_MSG,
+    TOMBSTONES_COLLECTION_NAME,
+)
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.listener import SubscriptionKey
+from subscription_manager.subscription import Subscription
+
+COLUMNS = ("owner", "name", "frequency", "start_date", "price", "currency", "comment")
+SELECT_COLUMNS = ", ".join(COLUMNS)
+
+"""SQL statements, all values are passed as parameters, so sqlite3 reuses prepared statements"""
+CREATE_TABLE_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {DEFAULT_COLLECTION_NAME} ("
+    "id INTEGER PRIMARY KEY, owner TEXT NOT NULL, name TEXT NOT NULL, frequency TEXT NOT NULL, "
+    "start_date TEXT NOT NULL, price REAL NOT NULL, currency TEXT NOT NULL, comment TEXT NOT NULL, "
+    "version INTEGER NOT NULL DEFAULT 0, sequence INTEGER NOT NULL DEFAULT 0)"
+)
+# Database files created before sequence numbers get the column, their rows have sequence 0
+# columns added after the first release, files created by older versions are migrated on open
+ADDED_COLUMNS_SQL = {
+    "version": f"ALTER TABLE {DEFAULT_COLLECTION_NAME} ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    "sequence": f"ALTER TABLE {DEFAULT_COLLECTION_NAME} ADD COLUMN sequence INTEGER NOT NULL DEFAULT 0",
+}
+TABLE_COLUMNS_SQL = f"PRAGMA table_info({DEFAULT_COLLECTION_NAME})"
+CREATE_SEQUENCES_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {SEQUENCES_COLLECTION_NAME} (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+)
+INIT_SEQUENCE_SQL = f"INSERT OR IGNORE INTO {SEQUENCES_COLLECTION_NAME} VALUES ('{DEFAULT_COLLECTION_NAME}', 0)"
+# Counter is changed in the transaction of the write, so sequence numbers are committed in their order
+RESERVE_SEQUENCE_SQL = (
+    f"UPDATE {SEQUENCES_COLLECTION_NAME} SET value = value + ? WHERE name = '{DEFAULT_COLLECTION_NAME}'"
+)
+SELECT_SEQUENCE_SQL = f"SELECT value FROM {SEQUENCES_COLLECTION_NAME} WHERE name = '{DEFAULT_COLLECTION_NAME}'"
+# Tombstones are keyed by owner and name, tombstones of files created before that have NULL owner
+CREATE_TOMBSTONES_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {TOMBSTONES_COLLECTION_NAME} ("
+    "owner TEXT, name TEXT NOT NULL, sequence INTEGER NOT NULL, PRIMARY KEY (owner, name))"
+)
+TOMBSTONES_COLUMNS_SQL = f"PRAGMA table_info({TOMBSTONES_COLLECTION_NAME})"
+# primary key of a table can not be altered, so tombstones keyed by name are copied to the new table
+MIGRATE_TOMBSTONES_SQL = (
+    f"ALTER TABLE {TOMBSTONES_COLLECTION_NAME} RENAME TO {TOMBSTONES_COLLECTION_NAME}_by_name",
+    CREATE_TOMBSTONES_SQL,
+    f"INSERT INTO {TOMBSTONES_COLLECTION_NAME} (name, sequence) "
+    f"SELECT name, sequence FROM {TOMBSTONES_COLLECTION_NAME}_by_name",
+    f"DROP TABLE {TOMBSTONES_COLLECTION_NAME}_by_name",
+)
+INSERT_TOMBSTONE_SQL = (
+    f"INSERT OR REPLACE INTO {TOMBSTONES_COLLECTION_NAME} (owner, name, sequence) VALUES (?, ?, ?)"
+)
+CREATE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})"
+INSERT_SQL = (
+    f"INSERT INTO {DEFAULT_COLLECTION_NAME} ({SELECT_COLUMNS}, sequence) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_ALL_SQL = f"SELECT {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} ORDER BY id"
+SELECT_BY_OWNER_SQL = (
+    f"SELECT {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} WHERE owner = ? ORDER BY id"
+)
+SELECT_BY_NAME_SQL = (
+    f"SELECT {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} WHERE name = ? ORDER BY id LIMIT 1"
+)
+SELECT_VERSIONED_BY_NAME_SQL = (
+    f"SELECT id, version, {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} WHERE name = ? ORDER BY id LIMIT 1"
+)
+SELECT_BY_ID_SQL = f"SELECT {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} WHERE id = ?"
+SELECT_WHERE_SQL = f"SELECT {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} WHERE {{conditions}} ORDER BY id"
+COUNT_WHERE_SQL = f"SELECT COUNT(*) FROM {DEFAULT_COLLECTION_NAME} WHERE {{conditions}}"
+SELECT_MOVED_SQL = (
+    f"SELECT owner, name FROM {DEFAULT_COLLECTION_NAME} WHERE {{conditions}} AND NOT ({{unmoved}})"
+)
+# Only rows, which columns differ from the changes, are updated, so rowcount is count of changed rows
+UPDATE_WHERE_SQL = (
+    f"UPDATE {DEFAULT_COLLECTION_NAME} SET {{assignments}}version = version + 1, sequence = ? "
+    "WHERE {conditions} AND NOT ({unchanged})"
+)
+# Assignments of the changed columns are put to the statement, values are passed as parameters
+UPDATE_BY_ID_SQL = (
+    f"UPDATE {DEFAULT_COLLECTION_NAME} SET {{assignments}}version = version + 1, sequence = ? WHERE id = ?"
+)
+SELECT_CHANGED_SQL = (
+    f"SELECT sequence, {SELECT_COLUMNS} FROM {DEFAULT_COLLECTION_NAME} WHERE sequence > ? ORDER BY sequence"
+)
+SELECT_TOMBSTONES_SQL = (
+    f"SELECT sequence, owner, name FROM {TOMBSTONES_COLLECTION_NAME} WHERE sequence > ? ORDER BY sequence"
+)
+DELETE_BY_ID_SQL = f"DELETE FROM {DEFAULT_COLLECTION_NAME} WHERE id = ?"
+
+
+def to_row(subscription: Subscription) -> tuple:
+    """Convert Subscription to row values, start_date is stored in ISO format"""
+    return (
+        subscription.owner,
+        subscription.name,
+        subscription.frequency,
+        subscription.start_date.isoformat(),
+        subscription.price,
+        subscription.currency,
+        subscription.comment,
+    )
+
+
+def to_columns(fields: dict) -> Tuple[List[str], tuple]:
+    """Return columns of the given subscription fields and their row values, start_date is stored in ISO format"""
+    columns = [column for column in COLUMNS if column in fields]
+    values = tuple(
+        fields[column].isoformat() if column == "start_date" else fields[column] for column in columns
+    )
+    return columns, values
+
+
+def to_changed_columns(changes: dict) -> Tuple[str, tuple]:
+    """Convert changes of subscription fields to column assignments and their values"""
+    columns, values = to_columns(changes)
+    return "".join(f"{column} = ?, " for column in columns), values
+
+
+def to_conditions(subscription_filter: dict) -> Tuple[str, tuple]:
+    """Convert filter of subscription fields to equality conditions joined with AND and their values"""
+    columns, values = to_columns(subscription_filter)
+    return " AND ".join(f"{column} = ?" for column in columns) or "1", values
+
+
+def from_row(row: tuple) -> dict:
+    """Convert row values to subscription dict"""
+    subscription = dict(zip(COLUMNS, row))
+    subscription["start_date"] = date.fromisoformat(subscription["start_date"])
+    return subscription
+
+
+class SQLiteDBHelper(BaseDBHelper):
+    """Class for storing subscriptions in SQLite database file.
+    Every write stamps rows with a sequence number from the counter table, deletions and moves to another
+    owner or name are kept in tombstones table by owner and name, so changes_since reads only changed rows by index
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """Opens SQLite database, creates tables and indexes if they don't exist
+        Args:
+            path (str): path to database file, ':memory:' for temporary in-memory database
+        """
+        self._lock = RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(CREATE_TABLE_SQL)
+            columns = {row[1] for row in self.connection.execute(TABLE_COLUMNS_SQL)}
+            for column, add_column_sql in ADDED_COLUMNS_SQL.items():
+                if column not in columns:
+                    self.connection.execute(add_column_sql)
+            self.connection.execute(CREATE_SEQUENCES_SQL)
+            self.connection.execute(INIT_SEQUENCE_SQL)
+            self.connection.execute(CREATE_TOMBSTONES_SQL)
+            columns = {row[1] for row in self.connection.execute(TOMBSTONES_COLUMNS_SQL)}
+            if "owner" not in columns:
+                for migrate_sql in MIGRATE_TOMBSTONES_SQL:
+                    self.connection.execute(migrate_sql)
+        self.ensure_indexes()
+
+    def close(self):
+        """Close database connection"""
+        self.connection.close()
+
+    def ensure_indexes(self) -> List[str]:
+        index_names = []
+        with self._lock, self.connection:
+            for keys in SUBSCRIPTION_INDEXES:
+                index_name = f"{DEFAULT_COLLECTION_NAME}_{'_'.join(keys)}"
+                self.connection.execute(
+                    CREATE_INDEX_SQL.format(
+                        index_name=index_name, table=DEFAULT_COLLECTION_NAME, columns=", ".join(keys)
+                    )
+                )
+                index_names.append(index_name)
+            index_name = f"{TOMBSTONES_COLLECTION_NAME}_sequence"
+            self.connection.execute(
+                CREATE_INDEX_SQL.format(index_name=index_name, table=TOMBSTONES_COLLECTION_NAME, columns="sequence")
+            )
+            index_names.append(index_name)
+        return index_names
+
+    def _reserve_sequence(self, count: int = 1) -> int:
+        """Reserve count of sequence numbers in the current transaction, return the first reserved number"""
+        self.connection.execute(RESERVE_SEQUENCE_SQL, (count,))
+        return self.connection.execute(SELECT_SEQUENCE_SQL).fetchone()[0] - count + 1
+
+    def _bury(self, keys: List[SubscriptionKey], sequence: int):
+        """Write tombstones of deleted or moved subscriptions in the current transaction"""
+        self.connection.executemany(INSERT_TOMBSTONE_SQL, [(owner, name, sequence) for owner, name in keys])
+
+    def add_subscription(self, subscription: Subscription) -> int:
+        with self._lock, self.connection:
+            return self.connection.execute(
+                INSERT_SQL, to_row(subscription) + (self._reserve_sequence(),)
+            ).lastrowid
+
+    def add_subscriptions(
+        self, subscriptions: List[Subscription]
+    ) -> Tuple[List[Optional[int]], Dict[int, str]]:
+        # executemany does not return identifiers, so rows are inserted one by one in one transaction
+        with self._lock, self.connection:
+            first = self._reserve_sequence(len(subscriptions))
+            inserted_ids = [
+                self.connection.execute(INSERT_SQL, to_row(subscription) + (sequence,)).lastrowid
+                for sequence, subscription in enumerate(subscriptions, first)
+            ]
+        return inserted_ids, {}
+
+    def iter_subscriptions(
+        self, owner: str = None, batch_size: int = DEFAULT_BATCH_SIZE, projection: dict = None
+    ) -> Iterator[dict]:
+        if owner is None:
+            cursor = self.connection.execute(SELECT_ALL_SQL)
+        else:
+            cursor = self.connection.execute(SELECT_BY_OWNER_SQL, (owner,))
+        cursor.arraysize = batch_size
+        return self._stream(cursor, projection)
+
+    @staticmethod
+    def _stream(cursor: sqlite3.Cursor, projection: Optional[dict]) -> Iterator[dict]:
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            for row in rows:
+                yield apply_projection(from_row(row), projection)
+
+    def get_subscription(self, subscription_name: str) -> dict:
+        with self._lock:
+            row = self.connection.execute(SELECT_BY_NAME_SQL, (subscription_name,)).fetchone()
+        if row is None:
+            raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+        return from_row(row)
+
+    def find_subscriptions(self, subscription_filter: dict, projection: dict = None) -> Iterator[dict]:
+        conditions, values = to_conditions(subscription_filter)
+        cursor = self.connection.execute(SELECT_WHERE_SQL.format(conditions=conditions), values)
+        return self._stream(cursor, projection)
+
+    def update_subscriptions(self, subscription_filter: dict, changes: dict) -> Tuple[int, int]:
+        conditions, filter_values = to_conditions(subscription_filter)
+        assignments, values = to_changed_columns(changes)
+        unchanged, unchanged_values = to_conditions(changes)
+        with self._lock, self.connection:
+            matched = self.connection.execute(
+                COUNT_WHERE_SQL.format(conditions=conditions), filter_values
+            ).fetchone()[0]
+            sequence = self._reserve_sequence()
+            unmoved, unmoved_values = to_conditions({key: changes[key] for key in KEY_FIELDS if key in changes})
+            if unmoved_values:
+                moved = self.connection.execute(
+                    SELECT_MOVED_SQL.format(conditions=conditions, unmoved=unmoved), filter_values + unmoved_values
+                ).fetchall()
+                self._bury(moved, sequence)
+            cursor = self.connection.execute(
+                UPDATE_WHERE_SQL.format(assignments=assignments, conditions=conditions, unchanged=unchanged),
+                values + (sequence,) + filter_values + unchanged_values,
+            )
+        return matched, cursor.rowcount
+
+    def get_versioned_subscription(self, subscription_name: str) -> Tuple[dict, int]:
+        with self._lock:
+            row = self.connection.execute(SELECT_VERSIONED_BY_NAME_SQL, (subscription_name,)).fetchone()
+        if row is None:
+            raise SubsNotFoundException(SUBSCRIPTION_NOT_FOUND_MSG.format(name=subscription_name))
+        return from_row(row[2:]), row[1]
+
+    def apply_changes(
+        self, subscription_name: str, changes: dict, expected_version: int = None
+    ) -> Optional[dict]:
+        assignments, values = to_changed_columns(changes)
+        # the lock makes version check and update atomic for all threads using this connection
+        with self._lock, self.connection:
+            row = self.connection.execute(SELECT_VERSIONED_BY_NAME_SQL, (subscription_name,)).fetchone()
+            if row is None or expected_version is not None and row[1] != expected_version:
+                return None
+            subscription_id = row[0]
+            sequence = self._reserve_sequence()
+            self.connection.execute(
+                UPDATE_BY_ID_SQL.format(assignments=assignments), values + (sequence, subscription_id)
+            )
+            owner = row[2]
+            if changes.get("owner", owner) != owner or changes.get("name", subscription_name) != subscription_name:
+                self._bury([(owner, subscription_name)], sequence)
+            return from_row(self.connection.execute(SELECT_BY_ID_SQL, (subscription_id,)).fetchone())
+
+    def delete_subscription(self, subscription_name: str) -> int:
+        with self._lock, self.connection:
+            row = self.connection.execute(SELECT_VERSIONED_BY_NAME_SQL, (subscription_name,)).fetchone()
+            if row is None:
+                return 0
+            self.connection.execute(DELETE_BY_ID_SQL, (row[0],))
+            self._bury([(row[2], subscription_name)], self._reserve_sequence())
+        return 1
+
+    def changes_since(self, watermark: int = 0) -> List[Change]:
+        # rows written before sequence numbers have sequence 0, they are returned when watermark is 0
+        parameters = (watermark if watermark else -1,)
+        with self._lock:
+            rows = self.connection.execute(SELECT_CHANGED_SQL, parameters).fetchall()
+            tombstones = self.connection.execute(SELECT_TOMBSTONES_SQL, parameters).fetchall()
+        changes = [Change(row[0], row[2], from_row(row[1:]), row[1]) for row in rows]
+        changes.extend(Change(sequence, name, None, owner) for sequence, owner, name in tombstones)
+        return sort_changes(changes)
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
-from datetime import datetime, date
+from datetime import date
+from typing import Iterator
 
-from dateutil.relativedelta import relativedelta
-from dateutil.rrule import DAILY, WEEKLY, MONTHLY, YEARLY, rrule
+from subscription_manager.common.dates import next_payment_date, payment_dates
 
 
 @dataclass
@@ -17,7 +17,8 @@ class Subscription:
             currency (str): currency of payment
             comment (str): not-mandatory comment for subscription
         Methods:
-            get_next_payment_date (datetime): returns next payment date for the subscription
+            get_next_payment_date (date): returns next payment date for the subscription
+            iter_payment_dates (Iterator[date]): streams payment dates inside the window
     """
 
     owner: str
@@ -43,45 +44,21 @@ class Subscription:
     def next_payment_date(self):
         return self.get_next_payment_date()
 
-    def get_next_payment_date(self) -> datetime:
+    def get_next_payment_date(self, today: date = None) -> date:
         """Return next payment day, that is bigger or equal than today
+            Args:
+                today (date): not mandatory, date to count from, date.today() by default
             Returns:
-                datetime: date of the next payment. Example: 'datetime(2020, 06, 18)'
+                date: date of the next payment. Example: 'date(2020, 06, 18)'
         """
-        today = date.today()
-        # dict contains sequence of dates since start_date until today+selected period.
-        # for example, if today = Jun 03,2020 and start_date = Jun 01, 2020 and frequency = 'DAILY',
-        # periods[daily] contains Jun 01, 2020; Jun 02,2020; Jun 03, 2020, Jun 04, 2020 in datetime format
-        periods = dict(
-            daily=list(
-                rrule(
-                    DAILY, dtstart=self.start_date, until=today + relativedelta(days=1)
-                )
-            ),
-            weekly=list(
-                rrule(
-                    WEEKLY,
-                    dtstart=self.start_date,
-                    until=today + relativedelta(weeks=1),
-                )
-            ),
-            monthly=list(
-                rrule(
-                    MONTHLY,
-                    dtstart=self.start_date,
-                    until=today + relativedelta(months=1),
-                )
-            ),
-            yearly=list(
-                rrule(
-                    YEARLY,
-                    dtstart=self.start_date,
-                    until=today + relativedelta(years=1),
-                )
-            ),
-        )
-        # if payment date is today, return today, else - next payment day in the future
-        if periods[self.frequency][-2].date() == today:
-            return today
-        else:
-            return periods[self.frequency][-1].date()
+        return next_payment_date(self.start_date, self.frequency, today)
+
+    def iter_payment_dates(self, window_start: date, window_end: date) -> Iterator[date]:
+        """Stream payment dates from window_start to window_end inclusive
+            Args:
+                window_start (date): first day of the window
+                window_end (date): last day of the window
+            Returns:
+                Iterator[date]: payment dates in ascending order
+        """
+        return payment_dates(self.start_date, self.frequency, window_start, window_end)
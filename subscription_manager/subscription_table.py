@@ -0,0 +1,150 @@
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from subscription_manager.common.batch_dates import EPOCH_ORDINAL, next_payment_dates
+from subscription_manager.subscription import Subscription
+
+
+class DictionaryColumn:
+    """Dictionary encoded string column: every distinct value is stored once, rows keep integer codes
+        Attributes:
+            values (List[str]): distinct values of the column
+            codes (np.ndarray): index in values for every row
+    """
+
+    def __init__(self, values: List[str], codes: np.ndarray):
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def encode(cls, column: Iterable[str]) -> "DictionaryColumn":
+        """Build dictionary encoded column from the sequence of strings"""
+        index: Dict[str, int] = {}
+        codes = array("i", [index.setdefault(value, len(index)) for value in column])
+        return cls(list(index), np.frombuffer(codes, dtype=np.int32))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    def decode(self) -> np.ndarray:
+        """Return column as numpy array of strings"""
+        return np.array(self.values, dtype=object)[self.codes]
+
+
+class SubscriptionTable:
+    """Columnar container for large lists of subscriptions.
+    Prices are kept in float array, start dates in array of ordinals,
+    owner, name, frequency and currency are dictionary encoded, comments are kept in list.
+    Row access returns Subscription objects.
+        Attributes:
+            owners (DictionaryColumn): owners of subscriptions
+            names (DictionaryColumn): names of subscriptions
+            frequencies (DictionaryColumn): payment periods of subscriptions
+            start_ordinals (np.ndarray): start dates of subscriptions as date.toordinal()
+            prices (np.ndarray): prices of subscriptions
+            currencies (DictionaryColumn): currencies of subscriptions
+            comments (List[str]): comments of subscriptions
+        Methods:
+            from_subscriptions: build table from Subscription objects
+            from_documents: build table from subscription dicts received from DBHelper
+            start_dates: return start dates as datetime64[D] array
+            next_payment_dates: return next payment dates for all rows
+    """
+
+    def __init__(
+        self,
+        owners: DictionaryColumn,
+        names: DictionaryColumn,
+        frequencies: DictionaryColumn,
+        start_ordinals: np.ndarray,
+        prices: np.ndarray,
+        currencies: DictionaryColumn,
+        comments: List[str],
+    ):
+        self.owners = owners
+        self.names = names
+        self.frequencies = frequencies
+        self.start_ordinals = start_ordinals
+        self.prices = prices
+        self.currencies = currencies
+        self.comments = comments
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[dict]) -> "SubscriptionTable":
+        """
+        Build table from subscription dicts, documents are read once, so cursor can be passed
+        Args:
+            documents (Iterable[dict]): subscriptions in the format of DBHelper.get_all_subscriptions
+        Returns:
+            SubscriptionTable: table with subscriptions in the order of documents
+        """
+        owners, names, frequencies, currencies, comments = [], [], [], [], []
+        start_ordinals = array("i")
+        prices = array("d")
+        for document in documents:
+            owners.append(document["owner"])
+            names.append(document["name"])
+            frequencies.append(document["frequency"])
+            start_ordinals.append(document["start_date"].toordinal())
+            prices.append(document["price"])
+            currencies.append(document["currency"])
+            comments.append(document["comment"])
+        return cls(
+            owners=DictionaryColumn.encode(owners),
+            names=DictionaryColumn.encode(names),
+            frequencies=DictionaryColumn.encode(frequencies),
+            start_ordinals=np.frombuffer(start_ordinals, dtype=np.int32),
+            prices=np.frombuffer(prices, dtype=np.float64),
+            currencies=DictionaryColumn.encode(currencies),
+            comments=comments,
+        )
+
+    @classmethod
+    def from_subscriptions(cls, subscriptions: Iterable[Subscription]) -> "SubscriptionTable":
+        """Build table from Subscription objects"""
+        return cls.from_documents(vars(subscription) for subscription in subscriptions)
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __getitem__(self, row: int) -> Subscription:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("SubscriptionTable index out of range")
+        return Subscription(
+            owner=self.owners[row],
+            name=self.names[row],
+            frequency=self.frequencies[row],
+            start_date=date.fromordinal(int(self.start_ordinals[row])),
+            price=float(self.prices[row]),
+            currency=self.currencies[row],
+            comment=self.comments[row],
+        )
+
+    def __iter__(self) -> Iterator[Subscription]:
+        return (self[row] for row in range(len(self)))
+
+    def to_list(self) -> List[Subscription]:
+        """Return all rows as list of Subscription objects"""
+        return list(self)
+
+    def start_dates(self) -> np.ndarray:
+        """Return start dates of all rows as datetime64[D] array"""
+        return (self.start_ordinals.astype(np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+    def next_payment_dates(self, today: date = None) -> np.ndarray:
+        """
+        Return next payment dates for all rows, see batch_dates.next_payment_dates
+        Args:
+            today (date): not mandatory, date to count from, date.today() by default
+        Returns:
+            np.ndarray: datetime64[D] array of the next payment dates in the order of rows
+        """
+        return next_payment_dates(self.start_dates(), self.frequencies.decode(), today)
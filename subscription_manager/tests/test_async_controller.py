@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from subscription_manager.async_controller import AsyncController
+from subscription_manager.async_dbhelper import ExecutorDBHelper
+from subscription_manager.common.exceptions import InvalidValueException, SubsNotFoundException, WrongTypeException
+from subscription_manager.controller import Controller
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+
+ROUND_TRIP = 0.1
+
+
+class SlowDBHelper(InMemoryDBHelper):
+    """In-memory storage, which lookups wait like requests to remote database and count lookups in flight"""
+
+    def __init__(self):
+        super().__init__()
+        self._in_flight_lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_subscription(self, subscription_name: str) -> dict:
+        with self._in_flight_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(ROUND_TRIP)
+            return super().get_subscription(subscription_name)
+        finally:
+            with self._in_flight_lock:
+                self.in_flight -= 1
+
+
+def make_subscription_dict(name: str, owner: str = "Mary") -> dict:
+    return dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=12.97,
+        currency="CNY",
+        comment="",
+    )
+
+
+@pytest.fixture
+def executor_dbhelper():
+    dbhelper = ExecutorDBHelper(SlowDBHelper())
+    yield dbhelper
+    dbhelper.close()
+
+
+def test_concurrent_lookups(executor_dbhelper: ExecutorDBHelper):
+    """Check that concurrent lookups wait for database at the same time"""
+    count = 10
+    controller = AsyncController(executor_dbhelper)
+
+    async def scenario():
+        for index in range(count):
+            await controller.add_subscription(make_subscription_dict(f"Service {index}"))
+        return await asyncio.gather(
+            *(controller.get_subscription_by_name(f"Service {index}") for index in range(count))
+        )
+
+    found = asyncio.run(scenario())
+    assert [subscription.name for subscription in found] == [f"Service {index}" for index in range(count)]
+    assert executor_dbhelper.dbhelper.max_in_flight == count
+
+
+def test_crud(executor_dbhelper: ExecutorDBHelper):
+    """Check add, edit, delete and lookups of AsyncController"""
+    controller = AsyncController(executor_dbhelper)
+
+    async def scenario():
+        await controller.add_subscription(make_subscription_dict("Spotify"))
+        result = await controller.add_subscriptions(
+            [make_subscription_dict("Netflix", "Kevin"), {"name": "Broken"}]
+        )
+        assert len(result.inserted_ids) == 1 and result.rejected[0][0] == 1
+        assert await controller.edit_subscription("Spotify", {"price": 9.99}) == 1
+        assert (await controller.get_subscription_by_name("Spotify")).price == 9.99
+        assert [s.name for s in await controller.get_subscriptions_list("Kevin")] == ["Netflix"]
+        names = [s.name async for s in controller.iter_subscriptions(batch_size=1)]
+        assert sorted(names) == ["Netflix", "Spotify"]
+        comments = [s.comment async for s in controller.iter_subscriptions(projection={"comment": False})]
+        assert comments == [None, None]
+        assert len(await controller.get_subscriptions_table()) == 2
+        assert await controller.delete_subscription("Spotify") == 1
+        with pytest.raises(SubsNotFoundException):
+            await controller.get_subscription_by_name("Spotify")
+        with pytest.raises(WrongTypeException):
+            await controller.add_subscription({**make_subscription_dict("Coursera"), "price": "10"})
+
+    asyncio.run(scenario())
+
+
+def test_due_index_follows_changes(executor_dbhelper: ExecutorDBHelper):
+    """Check that due index created by AsyncController is notified about changes"""
+    controller = AsyncController(executor_dbhelper)
+
+    async def scenario():
+        await controller.add_subscription(make_subscription_dict("Spotify"))
+        due_index = await controller.create_due_index()
+        await controller.add_subscription(make_subscription_dict("Netflix"))
+        await controller.delete_subscription("Spotify")
+        return due_index
+
+    due_index = asyncio.run(scenario())
+    assert "Netflix" in due_index and "Spotify" not in due_index
+
+
+def test_reports_match_controller(executor_dbhelper: ExecutorDBHelper):
+    """Check that spend summary, forecast and changes of AsyncController are the same as of Controller"""
+    controller = Controller(executor_dbhelper.dbhelper)
+    async_controller = AsyncController(executor_dbhelper)
+    window = date(2020, 6, 1), date(2020, 8, 31)
+
+    async def scenario():
+        await async_controller.add_subscriptions(
+            [make_subscription_dict("Spotify"), make_subscription_dict("Netflix", "Kevin")]
+        )
+        await async_controller.bulk_edit({"owner": "Kevin"}, {"currency": "USD"})
+        await async_controller.delete_subscription("Spotify")
+        return (
+            await async_controller.spend_summary(group_by=("currency",)),
+            await async_controller.forecast(*window, period="month"),
+            await async_controller.changes_since(1),
+        )
+
+    summary, forecast, changes = asyncio.run(scenario())
+    assert summary == controller.spend_summary(group_by=("currency",))
+    assert forecast == controller.forecast(*window, period="month")
+    assert [row["currency"] for row in forecast] == ["USD"] * 3
+    assert changes == controller.changes_since(1)
+    assert [(change.name, change.subscription is None) for change in changes] == [
+        ("Netflix", False), ("Spotify", True)
+    ]
+    with pytest.raises(InvalidValueException):
+        asyncio.run(async_controller.spend_summary(group_by=("price",)))
+    with pytest.raises(InvalidValueException):
+        asyncio.run(async_controller.forecast(window[1], window[0]))
+
+
+def test_snapshot(executor_dbhelper: ExecutorDBHelper, tmp_path):
+    """Check that AsyncController serves reads from snapshot synced by asyncio task"""
+    path = str(tmp_path / "subscriptions.snapshot")
+    controller = AsyncController(executor_dbhelper)
+
+    async def scenario():
+        await controller.add_subscription(make_subscription_dict("Spotify"))
+        store = controller.open_snapshot(path)
+        assert await controller.wait_snapshot_synced()
+        await controller.add_subscription(make_subscription_dict("Netflix", "Kevin"))
+        assert [s.name for s in await controller.get_subscriptions_list()] == ["Spotify", "Netflix"]
+        assert store.get("Netflix") is not None
+        await controller.close_snapshot()
+        assert controller.snapshot is None
+        # the second sync reads only changes after the watermark of the file
+        await controller.delete_subscription("Spotify")
+        controller.open_snapshot(path)
+        await controller.wait_snapshot_synced()
+        return await controller.get_subscriptions_list()
+
+    found = asyncio.run(scenario())
+    assert [subscription.name for subscription in found] == ["Netflix"]
@@ -0,0 +1,122 @@
+from datetime import date
+
+import mongomock
+import pytest
+
+from subscription_manager.backends import create_dbhelper
+from subscription_manager.base_dbhelper import BaseDBHelper
+from subscription_manager.common.constants import BACKEND_ENV_VAR
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+from subscription_manager.subscription import Subscription
+
+
+def make_subscription_dict(name: str, owner: str = "Mary", price: float = 12.97) -> dict:
+    return dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=price,
+        currency="CNY",
+        comment="",
+    )
+
+
+@pytest.fixture(params=["mongo", "memory", "sqlite"])
+def dbhelper(request) -> BaseDBHelper:
+    """Returns empty storage helper of every backend, mongo backend works on mongomock"""
+    if request.param == "mongo":
+        return DBHelper.from_client(mongomock.MongoClient(), "test")
+    return create_dbhelper(request.param)
+
+
+@pytest.fixture
+def filled_controller(dbhelper: BaseDBHelper) -> Controller:
+    controller = Controller(dbhelper)
+    controller.add_subscriptions(
+        [
+            make_subscription_dict("Sky Store"),
+            make_subscription_dict("Spotify"),
+            make_subscription_dict("Netflix", owner="Kevin"),
+        ]
+    )
+    return controller
+
+
+def test_get_subscription_by_name(filled_controller: Controller):
+    """Check that every backend returns the stored subscription"""
+    expected = Subscription(**make_subscription_dict("Spotify"))
+    assert filled_controller.get_subscription_by_name("Spotify") == expected
+    with pytest.raises(SubsNotFoundException):
+        filled_controller.get_subscription_by_name("Coursera")
+
+
+def test_get_subscriptions_list(filled_controller: Controller):
+    """Check listing of all and owner's subscriptions in insertion order"""
+    all_names = [s.name for s in filled_controller.get_subscriptions_list()]
+    assert all_names == ["Sky Store", "Spotify", "Netflix"]
+    owner_names = [s.name for s in filled_controller.get_subscriptions_list("Mary")]
+    assert owner_names == ["Sky Store", "Spotify"]
+    assert filled_controller.get_subscriptions_list("Lena") == []
+
+
+def test_edit_and_delete(filled_controller: Controller):
+    """Check that renamed subscription is found by new name and owner index is updated"""
+    changes = {"name": "Spotify Family", "owner": "Kevin"}
+    assert filled_controller.edit_subscription("Spotify", changes) == 1
+    assert filled_controller.get_subscription_by_name("Spotify Family").owner == "Kevin"
+    assert sorted(s.name for s in filled_controller.get_subscriptions_list("Kevin")) == [
+        "Netflix",
+        "Spotify Family",
+    ]
+    assert filled_controller.delete_subscription("Spotify Family") == 1
+    assert filled_controller.delete_subscription("Spotify Family") == 0
+    assert [s.name for s in filled_controller.get_subscriptions_list("Kevin")] == ["Netflix"]
+
+
+def test_iter_subscriptions_projection(filled_controller: Controller):
+    """Check that projection is supported by every backend"""
+    subscriptions = list(
+        filled_controller.iter_subscriptions("Mary", batch_size=1, projection={"comment": False})
+    )
+    assert [s.name for s in subscriptions] == ["Sky Store", "Spotify"]
+    assert all(s.comment is None for s in subscriptions)
+
+
+def test_sqlite_queries_use_indexes():
+    """Check with SQLite query planner that lookup by name and listing by owner use indexes"""
+    dbhelper = SQLiteDBHelper()
+    for query, parameter in [
+        ("SELECT * FROM subscriptions WHERE name = ?", "Spotify"),
+        ("SELECT * FROM subscriptions WHERE owner = ?", "Mary"),
+    ]:
+        plan = dbhelper.connection.execute("EXPLAIN QUERY PLAN " + query, (parameter,)).fetchall()
+        assert any("USING INDEX" in row[-1] for row in plan)
+    dbhelper.close()
+
+
+@pytest.mark.parametrize(
+    "backend, expected_type", [("memory", InMemoryDBHelper), ("sqlite", SQLiteDBHelper)]
+)
+def test_backend_from_environment(monkeypatch, backend: str, expected_type):
+    """Check that backend can be selected with environment variable"""
+    monkeypatch.setenv(BACKEND_ENV_VAR, backend)
+    assert type(create_dbhelper()) == expected_type
+
+
+def test_mongo_backend():
+    """Check that mongo backend creates DBHelper"""
+    dbhelper = create_dbhelper(
+        "mongo", db_url=None, db_credentials=None, db_name="test", client=mongomock.MongoClient()
+    )
+    assert type(dbhelper) == DBHelper
+
+
+def test_unknown_backend():
+    """Check that unknown backend is rejected"""
+    with pytest.raises(ValueError):
+        create_dbhelper("redis")
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from subscription_manager.common.batch_dates import (
+    next_payment_dates,
+    subscriptions_next_payment_dates,
+)
+from subscription_manager.common.constants import FREQUENCIES
+from subscription_manager.subscription import Subscription
+
+TODAY_DATES = [date(2020, 2, 29), date(2020, 6, 18), date(2021, 3, 1), date(2023, 12, 31)]
+
+
+def make_subscriptions(today: date, days: int):
+    """Return subscriptions with every frequency for the given count of days before today"""
+    return [
+        Subscription(
+            owner="Mary",
+            name="Sky Store",
+            frequency=frequency,
+            start_date=today - timedelta(days=offset),
+            price=12.97,
+            currency="CNY",
+            comment="",
+        )
+        for offset in range(days)
+        for frequency in FREQUENCIES
+    ]
+
+
+@pytest.mark.parametrize("today", TODAY_DATES)
+def test_next_payment_dates_match_subscription(today: date):
+    """Check that batch computation gives the same dates as Subscription.get_next_payment_date"""
+    subscriptions = make_subscriptions(today, days=4 * 366)
+    result = subscriptions_next_payment_dates(subscriptions, today=today)
+    expected = [subscription.get_next_payment_date(today) for subscription in subscriptions]
+    assert result.tolist() == expected
+
+
+def test_next_payment_dates_columns():
+    """Check that raw columns of dates and frequencies are supported"""
+    start_dates = np.array(["2020-01-31", "2020-02-29", "2020-06-01"], dtype="datetime64[D]")
+    result = next_payment_dates(
+        start_dates, ["monthly", "yearly", "weekly"], today=date(2021, 2, 1)
+    )
+    assert result.tolist() == [date(2021, 2, 28), date(2021, 2, 28), date(2021, 2, 1)]
+
+
+def test_next_payment_dates_unknown_frequency():
+    """Check that subscriptions with unsupported frequency get NaT"""
+    result = next_payment_dates([date(2020, 1, 1)], ["hourly"], today=date(2020, 2, 1))
+    assert np.isnat(result[0])
+
+
+def test_next_payment_dates_empty():
+    """Check that empty input returns empty array"""
+    assert next_payment_dates([], []).size == 0
@@ -0,0 +1,140 @@
+from datetime import date
+from threading import Thread
+from unittest.mock import MagicMock
+
+import pytest
+
+from subscription_manager.backends import create_dbhelper
+from subscription_manager.cache import CachingDBHelper, LRUCache
+from subscription_manager.controller import Controller
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+
+
+class FakeClock:
+    """Clock, that moves only when test asks"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_subscription_dict(name: str, owner: str = "Mary") -> dict:
+    return dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=12.97,
+        currency="CNY",
+        comment="",
+    )
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def storage() -> InMemoryDBHelper:
+    """Returns spy on in-memory storage to count requests, that reached storage"""
+    storage = MagicMock(wraps=InMemoryDBHelper())
+    return storage
+
+
+@pytest.fixture
+def cached_controller(storage, clock) -> Controller:
+    controller = Controller(CachingDBHelper(storage, max_size=3, ttl=10, clock=clock))
+    for name, owner in [("Sky Store", "Mary"), ("Spotify", "Mary"), ("Netflix", "Kevin")]:
+        controller.add_subscription(make_subscription_dict(name, owner))
+    return controller
+
+
+def test_lookup_hits(cached_controller: Controller, storage):
+    """Check that repeated lookups are answered from cache"""
+    for _ in range(5):
+        assert cached_controller.get_subscription_by_name("Spotify").name == "Spotify"
+        assert len(cached_controller.get_subscriptions_list("Mary")) == 2
+    assert storage.get_subscription.call_count == 1
+    assert storage.get_all_subscriptions.call_count == 1
+    stats = cached_controller.dbhelper.stats
+    assert (stats.hits, stats.misses) == (8, 2)
+    assert stats.hit_ratio == 0.8
+
+
+def test_ttl(cached_controller: Controller, storage, clock: FakeClock):
+    """Check that entries expire after TTL"""
+    cached_controller.get_subscription_by_name("Spotify")
+    clock.now = 9.9
+    cached_controller.get_subscription_by_name("Spotify")
+    assert storage.get_subscription.call_count == 1
+    clock.now = 10.0
+    cached_controller.get_subscription_by_name("Spotify")
+    assert storage.get_subscription.call_count == 2
+    assert cached_controller.dbhelper.stats.expirations == 1
+
+
+def test_lru_eviction():
+    """Check that the least recently used entry is evicted"""
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    cache.get("b")
+    assert (cache.stats.evictions, cache.stats.misses) == (1, 1)
+
+
+def test_lru_threads():
+    """Check that concurrent puts keep the size limit and counters consistent"""
+    cache = LRUCache(max_size=50)
+
+    def fill(offset: int):
+        for number in range(1000):
+            cache.put((offset, number), number)
+            cache.get((offset, number - 1))
+
+    threads = [Thread(target=fill, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50
+    assert cache.stats.evictions == 8 * 1000 - 50
+    assert cache.stats.hits + cache.stats.misses == 8 * 1000
+
+
+@pytest.mark.parametrize("cached_before", [True, False])
+def test_edit_invalidates(cached_controller: Controller, cached_before: bool):
+    """Check that edit invalidates subscription and lists of the old and the new owner"""
+    if cached_before:
+        cached_controller.get_subscription_by_name("Spotify")
+    assert len(cached_controller.get_subscriptions_list("Mary")) == 2
+    assert len(cached_controller.get_subscriptions_list("Kevin")) == 1
+    cached_controller.edit_subscription("Spotify", {"owner": "Kevin", "price": 9.99})
+    assert cached_controller.get_subscription_by_name("Spotify").price == 9.99
+    assert len(cached_controller.get_subscriptions_list("Mary")) == 1
+    assert len(cached_controller.get_subscriptions_list("Kevin")) == 2
+
+
+def test_add_and_delete_invalidate(cached_controller: Controller):
+    """Check that add and delete invalidate lists of the owner and of all subscriptions"""
+    assert len(cached_controller.get_subscriptions_list()) == 3
+    cached_controller.add_subscription(make_subscription_dict("Coursera", "Kevin"))
+    assert len(cached_controller.get_subscriptions_list()) == 4
+    assert len(cached_controller.get_subscriptions_list("Kevin")) == 2
+    cached_controller.get_subscription_by_name("Coursera")
+    cached_controller.delete_subscription("Coursera")
+    assert len(cached_controller.get_subscriptions_list("Kevin")) == 1
+    assert len(cached_controller.get_subscriptions_list()) == 3
+
+
+def test_create_dbhelper_with_cache():
+    """Check that cache is configured with create_dbhelper"""
+    dbhelper = create_dbhelper("memory", cache_size=10, cache_ttl=5)
+    assert type(dbhelper) == CachingDBHelper
+    assert dbhelper.cache.max_size == 10 and dbhelper.cache.ttl == 5
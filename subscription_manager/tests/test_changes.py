@@ -0,0 +1,266 @@
+import sqlite3
+from datetime import date
+from threading import Event, Thread
+
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+
+from subscription_manager.base_dbhelper import BaseDBHelper, Change, ChangeWatermark
+from subscription_manager.cache import CachingDBHelper
+from subscription_manager.dbhelper import DBHelper, to_new_document, tombstone_requests
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+from subscription_manager.subscription import Subscription
+
+
+def make_subscription(name: str, owner: str = "Mary", currency: str = "GBP", price: float = 9.99) -> Subscription:
+    return Subscription(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2020, 4, 13),
+        price=price,
+        currency=currency,
+        comment="",
+    )
+
+
+@pytest.fixture(params=["mongo", "memory", "sqlite"])
+def dbhelper(request) -> BaseDBHelper:
+    """Returns storage helper of every backend with three subscriptions"""
+    if request.param == "mongo":
+        helper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    elif request.param == "memory":
+        helper = InMemoryDBHelper()
+    else:
+        helper = SQLiteDBHelper()
+    helper.add_subscriptions([make_subscription("Spotify"), make_subscription("Netflix", owner="Kevin")])
+    helper.add_subscription(make_subscription("Hulu"))
+    return helper
+
+
+def summary(changes) -> list:
+    return [
+        (change.sequence, change.name, None if change.subscription is None else change.subscription["price"])
+        for change in changes
+    ]
+
+
+def test_all_subscriptions_since_zero(dbhelper: BaseDBHelper):
+    """Check that watermark 0 returns all subscriptions in the order of writes"""
+    changes = dbhelper.changes_since()
+    assert summary(changes) == [(1, "Spotify", 9.99), (2, "Netflix", 9.99), (3, "Hulu", 9.99)]
+    assert changes[1].subscription == vars(make_subscription("Netflix", owner="Kevin"))
+    assert dbhelper.changes_since(3) == []
+
+
+def test_only_changes_after_watermark(dbhelper: BaseDBHelper):
+    """Check that only the latest state of subscriptions changed after the watermark is returned"""
+    dbhelper.apply_changes("Spotify", {"price": 10.99})
+    dbhelper.delete_subscription("Netflix")
+    dbhelper.apply_changes("Hulu", {"name": "Hulu Plus"})
+    assert summary(dbhelper.changes_since(3)) == [
+        (4, "Spotify", 10.99), (5, "Netflix", None), (6, "Hulu", None), (6, "Hulu Plus", 9.99)
+    ]
+    # only the latest state of subscription is returned
+    dbhelper.apply_changes("Spotify", {"price": 11.99})
+    expected = [(6, "Hulu", None), (6, "Hulu Plus", 9.99), (7, "Spotify", 11.99)]
+    assert summary(dbhelper.changes_since(5)) == expected
+    # writes, which change nothing, leave no changes
+    assert dbhelper.delete_subscription("Netflix") == 0
+    assert dbhelper.apply_changes("Netflix", {"name": "Netflix UHD"}) is None
+    assert summary(dbhelper.changes_since(5)) == expected
+
+
+def test_name_is_taken_after_deletion(dbhelper: BaseDBHelper):
+    """Check that tombstone goes before subscription, which took the name of deleted one"""
+    dbhelper.delete_subscription("Hulu")
+    dbhelper.add_subscription(make_subscription("Hulu", owner="Kevin"))
+    changes = dbhelper.changes_since(3)
+    assert [(change.name, change.subscription and change.subscription["owner"]) for change in changes] == [
+        ("Hulu", None), ("Hulu", "Kevin")
+    ]
+
+
+def test_bulk_update_stamps_changed_subscriptions(dbhelper: BaseDBHelper):
+    """Check that bulk update stamps only changed subscriptions and buries renamed ones"""
+    dbhelper.apply_changes("Hulu", {"currency": "USD"})
+    assert dbhelper.update_subscriptions({"owner": "Mary"}, {"currency": "USD"}) == (2, 1)
+    assert summary(dbhelper.changes_since(4)) == [(5, "Spotify", 9.99)]
+    assert dbhelper.update_subscriptions({"owner": "Kevin"}, {"name": "Netflix UHD"}) == (1, 1)
+    assert summary(dbhelper.changes_since(5)) == [(6, "Netflix", None), (6, "Netflix UHD", 9.99)]
+
+
+def test_moves_leave_tombstones_of_old_owner(dbhelper: BaseDBHelper):
+    """Check that tombstones of moved and deleted subscriptions are keyed by owner and name before the write"""
+    dbhelper.apply_changes("Hulu", {"owner": "Kevin"})
+    dbhelper.update_subscriptions({"owner": "Kevin", "name": "Netflix"}, {"owner": "Mary"})
+    dbhelper.delete_subscription("Spotify")
+    changes = dbhelper.changes_since(3)
+    assert [(change.sequence, change.owner, change.name, change.subscription is None) for change in changes] == [
+        (4, "Mary", "Hulu", True),
+        (4, "Kevin", "Hulu", False),
+        (5, "Kevin", "Netflix", True),
+        (5, "Mary", "Netflix", False),
+        (6, "Mary", "Spotify", True),
+    ]
+
+
+def test_follow_changes_polls_storage(dbhelper: BaseDBHelper):
+    """Check that followed changes include changes written after the start"""
+    stop = Event()
+    received = []
+
+    def follow():
+        for change in dbhelper.follow_changes(2, poll_interval=0.01, stop=stop):
+            received.append(change.name)
+            if len(received) == 2:
+                stop.set()
+
+    thread = Thread(target=follow)
+    thread.start()
+    dbhelper.delete_subscription("Spotify")
+    thread.join(5)
+    assert not thread.is_alive()
+    assert received == ["Hulu", "Spotify"]
+
+
+def test_sqlite_database_without_sequences(tmp_path):
+    """Check that SQLite file created before sequence numbers gets sequence column on open"""
+    path = str(tmp_path / "subscriptions.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE subscriptions (id INTEGER PRIMARY KEY, owner TEXT NOT NULL, name TEXT NOT NULL, "
+        "frequency TEXT NOT NULL, start_date TEXT NOT NULL, price REAL NOT NULL, currency TEXT NOT NULL, "
+        "comment TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0)"
+    )
+    connection.execute(
+        "INSERT INTO subscriptions (owner, name, frequency, start_date, price, currency, comment) "
+        "VALUES ('Mary', 'Spotify', 'monthly', '2020-04-13', 9.99, 'GBP', '')"
+    )
+    connection.commit()
+    connection.close()
+    dbhelper = SQLiteDBHelper(path)
+    assert summary(dbhelper.changes_since()) == [(0, "Spotify", 9.99)]
+    dbhelper.add_subscription(make_subscription("Hulu"))
+    assert summary(dbhelper.changes_since()) == [(0, "Spotify", 9.99), (1, "Hulu", 9.99)]
+    dbhelper.close()
+
+
+def test_sqlite_tombstones_without_owner(tmp_path):
+    """Check that SQLite tombstones keyed by name are kept without owner, new tombstones are keyed by owner"""
+    path = str(tmp_path / "subscriptions.db")
+    dbhelper = SQLiteDBHelper(path)
+    dbhelper.close()
+    connection = sqlite3.connect(path)
+    connection.execute("DROP TABLE tombstones")
+    connection.execute("CREATE TABLE tombstones (name TEXT PRIMARY KEY, sequence INTEGER NOT NULL)")
+    connection.execute("INSERT INTO tombstones VALUES ('Hulu', 1)")
+    connection.commit()
+    connection.close()
+    dbhelper = SQLiteDBHelper(path)
+    dbhelper.add_subscription(make_subscription("Hulu", owner="Kevin"))
+    dbhelper.delete_subscription("Hulu")
+    assert dbhelper.changes_since() == [Change(1, "Hulu", None), Change(2, "Hulu", None, "Kevin")]
+    dbhelper.close()
+
+
+def test_cache_invalidates_changes_of_other_clients(dbhelper: BaseDBHelper):
+    """Check that cache invalidates subscriptions changed by other clients"""
+    cache = CachingDBHelper(dbhelper)
+    assert cache.invalidate_changes() == 3
+    assert cache.get_subscription("Spotify")["price"] == 9.99
+    assert len(cache.get_all_subscriptions("Kevin")) == 1
+    dbhelper.apply_changes("Spotify", {"price": 10.99})
+    dbhelper.delete_subscription("Netflix")
+    assert cache.get_subscription("Spotify")["price"] == 9.99
+    assert cache.invalidate_changes() == 2
+    assert cache.watermark == 5
+    assert cache.get_subscription("Spotify")["price"] == 10.99
+    assert cache.get_all_subscriptions("Kevin") == []
+    assert cache.invalidate_changes() == 0
+
+
+class FakeClock:
+    """Controllable monotonic clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_late_write_within_overlap_is_read():
+    """Check that a write visible after a write with larger number is read in the overlap, but not after it"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    clock = FakeClock()
+    watermark = ChangeWatermark(overlap=dbhelper.changes_overlap, clock=clock)
+
+    def read() -> list:
+        return [change.name for change in watermark.apply(dbhelper.changes_since(watermark.value))]
+
+    # writer reserves the number and stalls, another writer with the next number is read first
+    late = dbhelper._reserve_sequence()
+    dbhelper.add_subscription(make_subscription("Hulu"))
+    assert read() == ["Hulu"]
+    clock.now = dbhelper.changes_overlap - 1
+    dbhelper.subscriptions.insert_one(to_new_document(make_subscription("Spotify"), late))
+    assert read() == ["Spotify"]
+    assert (watermark.value, watermark.latest) == (0, 2)
+    clock.now = 2 * dbhelper.changes_overlap
+    assert read() == []
+    assert watermark.value == 2
+    # lower bound of the gap: write visible later than overlap after the larger number was read is lost
+    later = dbhelper._reserve_sequence()
+    dbhelper.add_subscription(make_subscription("Netflix"))
+    assert read() == ["Netflix"]
+    clock.now += dbhelper.changes_overlap
+    assert read() == []
+    dbhelper.subscriptions.insert_one(to_new_document(make_subscription("Prime"), later))
+    assert read() == []
+
+
+def test_round_trips_of_writes():
+    """Check that MongoDB writes send the round trips stated in BaseDBHelper and tombstones keep the owner"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    dbhelper.add_subscriptions([make_subscription("Spotify"), make_subscription("Hulu")])
+    requests = MagicMock()
+    for collection in ("sequences", "subscriptions", "tombstones"):
+        wrapped = MagicMock(wraps=getattr(dbhelper, collection))
+        setattr(dbhelper, collection, wrapped)
+        setattr(requests, collection, wrapped)
+
+    def sent() -> list:
+        names = [name for name, _, _ in requests.mock_calls]
+        requests.reset_mock()
+        return names
+
+    dbhelper.apply_changes("Hulu", {"price": 10.99})
+    assert sent() == ["sequences.find_one_and_update", "subscriptions.find_one_and_update"]
+    dbhelper.apply_changes("Hulu", {"owner": "Kevin"})
+    assert sent() == ["sequences.find_one_and_update", "subscriptions.find_one_and_update", "tombstones.update_one"]
+    assert dbhelper.delete_subscription("Spotify") == 1
+    assert sent() == ["subscriptions.find_one_and_delete", "sequences.find_one_and_update", "tombstones.update_one"]
+    # nothing else is sent, when nothing was deleted
+    assert dbhelper.delete_subscription("Spotify") == 0
+    assert sent() == ["subscriptions.find_one_and_delete"]
+    assert dbhelper.changes_since(2) == [
+        Change(4, "Hulu", None, "Mary"),
+        Change(4, "Hulu", vars(make_subscription("Hulu", owner="Kevin", price=10.99)), "Kevin"),
+        Change(5, "Spotify", None, "Mary"),
+    ]
+
+
+def test_bulk_rename_writes_tombstones_with_one_request():
+    """Check that tombstones of subscriptions renamed by bulk update are written with one bulk_write"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    dbhelper.add_subscriptions([make_subscription("Spotify"), make_subscription("Hulu")])
+    dbhelper.tombstones = MagicMock()
+    dbhelper.update_subscriptions({"owner": "Mary"}, {"name": "Music"})
+    [(method, (requests,), options)] = dbhelper.tombstones.method_calls
+    assert (method, options) == ("bulk_write", {"ordered": False})
+    # find returns subscriptions in any order
+    assert sorted(requests, key=repr) == sorted(tombstone_requests([("Mary", "Hulu"), ("Mary", "Spotify")], 3), key=repr)
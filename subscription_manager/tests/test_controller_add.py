@@ -15,7 +15,7 @@ from subscription_manager.dbhelper import DBHelper
 @pytest.fixture
 def mock_dbhelper() -> DBHelper:
     """Returns mock for DBHelper to avoid writing to production database"""
-    mock = DBHelper
+    mock = MagicMock(spec=DBHelper)
     mock.add_subscription = MagicMock(return_value=ObjectId("5ef2081b329cba6d5b03b6ff"))
     return mock
 
@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+
+import subscription_manager.common.utils as utils
+from subscription_manager.common.exceptions import (
+    MissingFieldsException,
+    WriteFailedException,
+    WrongTypeException,
+)
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper
+
+
+def insert_batch(subscriptions):
+    """Imitates DBHelper.add_subscriptions: every subscription gets new identifier"""
+    return [ObjectId() for _ in subscriptions], {}
+
+
+@pytest.fixture
+def mock_dbhelper() -> DBHelper:
+    """Returns mock for DBHelper with bulk insert"""
+    mock = MagicMock(spec=DBHelper)
+    mock.add_subscriptions.side_effect = insert_batch
+    return mock
+
+
+@pytest.mark.parametrize("count, batch_size, calls", [(10, 3, 4), (10, 10, 1), (0, 5, 0)])
+def test_add_subscriptions(
+    controller: Controller, mock_dbhelper: DBHelper, count: int, batch_size: int, calls: int
+):
+    """Check that valid subscriptions are written in batches"""
+    subscriptions = [utils.subscription_generator() for _ in range(count)]
+    result = controller.add_subscriptions(subscriptions, batch_size=batch_size)
+    assert len(result.inserted_ids) == count
+    assert all(type(inserted_id) == ObjectId for inserted_id in result.inserted_ids)
+    assert result.rejected == []
+    assert mock_dbhelper.add_subscriptions.call_count == calls
+
+
+def test_add_subscriptions_rejected(controller: Controller, mock_dbhelper: DBHelper):
+    """Check that invalid subscriptions are reported with index and exception, valid ones are written"""
+    subscriptions = [utils.subscription_generator() for _ in range(6)]
+    subscriptions[1]["price"] = 1
+    del subscriptions[4]["comment"]
+    result = controller.add_subscriptions(subscriptions, batch_size=2)
+    assert len(result.inserted_ids) == 4
+    assert [(index, item) for index, item, _ in result.rejected] == [
+        (1, subscriptions[1]),
+        (4, subscriptions[4]),
+    ]
+    assert type(result.rejected[0][2]) == WrongTypeException
+    assert type(result.rejected[1][2]) == MissingFieldsException
+    written = [
+        subscription
+        for call in mock_dbhelper.add_subscriptions.call_args_list
+        for subscription in call[0][0]
+    ]
+    assert [subscription.name for subscription in written] == [
+        subscriptions[index]["name"] for index in (0, 2, 3, 5)
+    ]
+
+
+def test_add_subscriptions_write_errors(controller: Controller, mock_dbhelper: DBHelper):
+    """Check that subscriptions failed on database side are reported as rejected"""
+    mock_dbhelper.add_subscriptions.side_effect = lambda batch: (
+        [ObjectId(), None, ObjectId()],
+        {1: "E11000 duplicate key error"},
+    )
+    subscriptions = [utils.subscription_generator() for _ in range(3)]
+    result = controller.add_subscriptions(subscriptions)
+    assert len(result.inserted_ids) == 2
+    index, item, exc = result.rejected[0]
+    assert (index, item) == (1, subscriptions[1])
+    assert type(exc) == WriteFailedException
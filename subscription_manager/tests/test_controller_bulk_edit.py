@@ -0,0 +1,133 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+
+from subscription_manager.backends import create_dbhelper
+from subscription_manager.common.exceptions import InvalidValueException, WrongTypeException
+from subscription_manager.controller import BulkEditResult, Controller
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+
+
+def make_subscription_dict(name: str, owner: str, currency: str = "GBP", price: float = 9.99) -> dict:
+    return dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=price,
+        currency=currency,
+        comment="",
+    )
+
+
+@pytest.fixture(params=["mongo", "memory", "sqlite", "cached"])
+def controller(request) -> Controller:
+    if request.param == "mongo":
+        dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    elif request.param == "cached":
+        dbhelper = create_dbhelper("memory", cache_size=10)
+    else:
+        dbhelper = create_dbhelper(request.param)
+    controller = Controller(dbhelper)
+    controller.add_subscriptions(
+        [
+            make_subscription_dict("Spotify", "Mary"),
+            make_subscription_dict("Spotify", "Kevin", price=10.99),
+            make_subscription_dict("Spotify", "Lena", currency="USD"),
+            make_subscription_dict("Netflix", "Mary"),
+        ]
+    )
+    return controller
+
+
+def test_bulk_edit(controller: Controller):
+    """Check that matched subscriptions are changed and counts of matched and modified are returned"""
+    controller.get_subscriptions_list("Kevin")
+    result = controller.bulk_edit({"name": "Spotify", "currency": "GBP"}, {"price": 10.99})
+    assert result == BulkEditResult(matched=2, modified=1)
+    prices = {(s.owner, s.name): s.price for s in controller.get_subscriptions_list()}
+    assert prices == {
+        ("Mary", "Spotify"): 10.99,
+        ("Kevin", "Spotify"): 10.99,
+        ("Lena", "Spotify"): 9.99,
+        ("Mary", "Netflix"): 9.99,
+    }
+    assert [s.price for s in controller.get_subscriptions_list("Kevin")] == [10.99]
+
+
+def test_versions_of_changed_subscriptions(controller: Controller):
+    """Check that version is increased only for changed subscriptions"""
+    controller.bulk_edit({"owner": "Mary"}, {"price": 10.99, "comment": "$1 more"})
+    versions = {
+        name: controller.dbhelper.get_versioned_subscription(name)[1] for name in ("Spotify", "Netflix")
+    }
+    # the first Spotify belongs to Mary
+    assert versions == {"Spotify": 1, "Netflix": 1}
+    assert controller.get_subscription_by_name("Netflix").comment == "$1 more"
+    assert controller.bulk_edit({"owner": "Mary"}, {"price": 10.99}) == BulkEditResult(2, 0)
+    assert controller.dbhelper.get_versioned_subscription("Netflix")[1] == 1
+
+
+def test_nothing_matched(controller: Controller):
+    """Check that nothing is changed when filter matches no subscriptions"""
+    assert controller.bulk_edit({"currency": "CNY"}, {"price": 1.0}) == BulkEditResult(0, 0)
+
+
+@pytest.mark.parametrize(
+    "subscription_filter, changes, exception",
+    [
+        ({}, {"price": 1.0}, InvalidValueException),
+        ({"price": 9.99}, {"price": 1.0}, InvalidValueException),
+        ({"currency": "coin"}, {"price": 1.0}, InvalidValueException),
+        ({"owner": 1}, {"price": 1.0}, WrongTypeException),
+        ({"owner": "Mary"}, {"price": 1}, WrongTypeException),
+        ({"owner": "Mary"}, {"name": "Music"}, InvalidValueException),
+    ],
+)
+def test_bulk_edit_validation(controller: Controller, subscription_filter, changes, exception):
+    """Check that invalid filters and changes are rejected"""
+    with pytest.raises(exception):
+        controller.bulk_edit(subscription_filter, changes)
+
+
+def test_rename_is_rejected(controller: Controller):
+    """Check that bulk edit does not give the same name to several subscriptions"""
+    with pytest.raises(InvalidValueException):
+        controller.bulk_edit({"name": "Spotify"}, {"name": "Music", "price": 1.0})
+    assert sorted(s.name for s in controller.get_subscriptions_list()) == ["Netflix", "Spotify", "Spotify", "Spotify"]
+    assert {s.price for s in controller.get_subscriptions_list("Mary")} == {9.99}
+
+
+def test_listeners_are_notified():
+    """Check that listeners receive every changed subscription"""
+    controller = Controller(create_dbhelper("memory"))
+    controller.add_subscription(make_subscription_dict("Spotify", "Mary"))
+    controller.add_subscription(make_subscription_dict("Netflix", "Kevin"))
+    owner_totals = controller.create_owner_totals()
+    controller.bulk_edit({"currency": "GBP"}, {"currency": "USD"})
+    assert owner_totals.totals("Mary") == {"USD": 9.99}
+    assert owner_totals.check(controller.dbhelper) == []
+
+
+def test_one_request_without_listeners():
+    """Check that bulk edit without listeners sends one request to database"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    controller = Controller(dbhelper)
+    controller.add_subscription(make_subscription_dict("Spotify", "Mary"))
+    dbhelper.subscriptions = MagicMock(wraps=dbhelper.subscriptions)
+    controller.bulk_edit({"name": "Spotify"}, {"price": 10.99})
+    assert [call[0] for call in dbhelper.subscriptions.method_calls] == ["update_many"]
+
+
+@pytest.mark.parametrize("column", ["currency", "frequency"])
+def test_sqlite_filters_use_indexes(column: str):
+    """Check that SQLite uses indexes for filter columns"""
+    dbhelper = SQLiteDBHelper()
+    plan = dbhelper.connection.execute(
+        f"EXPLAIN QUERY PLAN UPDATE subscriptions SET price = 1 WHERE {column} = ?", ("x",)
+    ).fetchall()
+    assert any("USING INDEX" in row[-1] for row in plan)
+    dbhelper.close()
@@ -0,0 +1,181 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from subscription_manager.backends import create_dbhelper
+from subscription_manager.common.exceptions import EditConflictException, SubsNotFoundException
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+
+EDITS = 200
+THREADS = 8
+# Local mongod for parallel edits, mongomock is not thread-safe
+MONGODB_TEST_URL = os.environ.get("MONGODB_TEST_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = "subscription_manager_concurrent_test"
+
+
+def make_subscription_dict(name: str = "Spotify") -> dict:
+    return dict(
+        owner="Mary",
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=0.0,
+        currency="USD",
+        comment="",
+    )
+
+
+@pytest.fixture(params=["mongo", "memory", "sqlite"])
+def controller(request) -> Controller:
+    if request.param == "mongo":
+        dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    else:
+        dbhelper = create_dbhelper(request.param)
+    controller = Controller(dbhelper)
+    controller.add_subscription(make_subscription_dict())
+    return controller
+
+
+@pytest.fixture
+def local_controller(controller: Controller) -> Controller:
+    """Returns controller of thread-safe database, mongomock is replaced by local mongod,
+    test is skipped if mongod is not available
+    """
+    if not isinstance(controller.dbhelper, DBHelper):
+        yield controller
+        return
+    client = MongoClient(MONGODB_TEST_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"mongod is not available at {MONGODB_TEST_URL}")
+    client.drop_database(TEST_DB_NAME)
+    mongod_controller = Controller(DBHelper.from_client(client, TEST_DB_NAME))
+    mongod_controller.add_subscription(make_subscription_dict())
+    yield mongod_controller
+    client.drop_database(TEST_DB_NAME)
+    client.close()
+
+
+def test_edit_in_one_request():
+    """Check that edit reserves sequence number and sends one find_one_and_update without reading subscription"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    controller = Controller(dbhelper)
+    controller.add_subscription(make_subscription_dict())
+    requests = MagicMock()
+    dbhelper.subscriptions = requests.subscriptions = MagicMock(wraps=dbhelper.subscriptions)
+    dbhelper.sequences = requests.sequences = MagicMock(wraps=dbhelper.sequences)
+    dbhelper.tombstones = requests.tombstones = MagicMock(wraps=dbhelper.tombstones)
+    assert controller.edit_subscription("Spotify", {"price": 9.99, "start_date": date(2020, 1, 1)}) == 1
+    # tombstone is written only for renames
+    assert [name for name, _, _ in requests.mock_calls] == [
+        "sequences.find_one_and_update", "subscriptions.find_one_and_update"
+    ]
+    subscription = controller.get_subscription_by_name("Spotify")
+    assert (subscription.price, subscription.start_date) == (9.99, date(2020, 1, 1))
+
+
+def test_edit_not_found(controller: Controller):
+    """Check that edit and modify of missing subscription raise SubsNotFoundException"""
+    with pytest.raises(SubsNotFoundException):
+        controller.edit_subscription("Netflix", {"price": 1.0})
+    with pytest.raises(SubsNotFoundException):
+        controller.modify_subscription("Netflix", lambda subscription: {"price": 1.0})
+
+
+def test_version_is_increased(controller: Controller):
+    """Check that every edit increases version and stale expected version is rejected"""
+    dbhelper = controller.dbhelper
+    assert dbhelper.get_versioned_subscription("Spotify")[1] == 0
+    controller.edit_subscription("Spotify", {"price": 1.0})
+    controller.edit_subscription("Spotify", {"name": "Spotify Family"})
+    document, version = dbhelper.get_versioned_subscription("Spotify Family")
+    assert version == 2 and document["price"] == 1.0
+    assert dbhelper.apply_changes("Spotify Family", {"price": 2.0}, expected_version=1) is None
+    assert dbhelper.apply_changes("Spotify Family", {"price": 2.0}, expected_version=2)["price"] == 2.0
+
+
+def test_modify_retries_on_conflict(controller: Controller):
+    """Check that modify reads subscription again after a conflicting edit"""
+    attempts = []
+
+    def raise_price(subscription):
+        attempts.append(subscription.price)
+        if len(attempts) == 1:
+            # another client changes subscription between read and write
+            controller.edit_subscription("Spotify", {"price": 10.0})
+        return {"price": subscription.price + 1}
+
+    assert controller.modify_subscription("Spotify", raise_price).price == 11.0
+    assert attempts == [0.0, 10.0]
+
+
+def test_modify_gives_up(controller: Controller):
+    """Check that modify raises EditConflictException when retries are exhausted"""
+    def always_conflicting(subscription):
+        controller.edit_subscription("Spotify", {"comment": "changed"})
+        return {"price": 1.0}
+
+    with pytest.raises(EditConflictException):
+        controller.modify_subscription("Spotify", always_conflicting, retries=3)
+    assert controller.get_subscription_by_name("Spotify").price == 0.0
+
+
+def test_parallel_modifications_are_not_lost(local_controller: Controller):
+    """Check that parallel read-modify-write edits are all applied"""
+    def increment(_):
+        local_controller.modify_subscription(
+            "Spotify", lambda subscription: {"price": subscription.price + 1}, retries=EDITS
+        )
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(increment, range(EDITS)))
+    assert local_controller.get_subscription_by_name("Spotify").price == EDITS
+    assert local_controller.dbhelper.get_versioned_subscription("Spotify")[1] == EDITS
+
+
+def test_parallel_edits_of_different_fields(local_controller: Controller):
+    """Check that parallel edits of different fields don't overwrite each other"""
+    def edit(index):
+        if index % 2:
+            local_controller.edit_subscription("Spotify", {"price": float(index)})
+        else:
+            local_controller.edit_subscription("Spotify", {"comment": f"edit {index}"})
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(edit, range(EDITS)))
+    subscription = local_controller.get_subscription_by_name("Spotify")
+    assert subscription.price > 0 and subscription.comment.startswith("edit")
+    assert local_controller.dbhelper.get_versioned_subscription("Spotify")[1] == EDITS
+
+
+def test_sqlite_database_without_versions(tmp_path):
+    """Check that SQLite file created before versions gets version column on open"""
+    path = str(tmp_path / "subscriptions.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE subscriptions (id INTEGER PRIMARY KEY, owner TEXT NOT NULL, name TEXT NOT NULL, "
+        "frequency TEXT NOT NULL, start_date TEXT NOT NULL, price REAL NOT NULL, currency TEXT NOT NULL, "
+        "comment TEXT NOT NULL)"
+    )
+    connection.execute(
+        "INSERT INTO subscriptions (owner, name, frequency, start_date, price, currency, comment) "
+        "VALUES ('Mary', 'Spotify', 'monthly', '2019-04-13', 0.0, 'USD', '')"
+    )
+    connection.commit()
+    connection.close()
+    dbhelper = SQLiteDBHelper(path)
+    controller = Controller(dbhelper)
+    assert controller.edit_subscription("Spotify", {"price": 9.99}) == 1
+    assert controller.modify_subscription("Spotify", lambda subscription: {"comment": "edited"}).price == 9.99
+    assert dbhelper.get_versioned_subscription("Spotify")[1] == 2
+    dbhelper.close()
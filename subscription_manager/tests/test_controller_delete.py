@@ -11,7 +11,7 @@ from subscription_manager.dbhelper import DBHelper
 @pytest.fixture
 def mock_dbhelper() -> DBHelper:
     """Returns mock for DBHelper"""
-    mock = DBHelper
+    mock = MagicMock(spec=DBHelper)
     mock.delete_subscription = MagicMock(return_value=1)
     return mock
 
@@ -5,32 +5,34 @@ from unittest.mock import MagicMock
 import pytest
 
 from subscription_manager.common import utils
-from subscription_manager.common.exceptions import SubscriptionException
+from subscription_manager.common.exceptions import SubscriptionException, SubsNotFoundException
 from subscription_manager.controller import Controller
 from subscription_manager.dbhelper import DBHelper
 from subscription_manager.subscription import Subscription
 
+SKY_STORE = Subscription(
+    owner="Mary",
+    name="Sky Store",
+    frequency="monthly",
+    start_date=date(2019, 4, 13),
+    price=12.97,
+    currency="CNY",
+    comment="Generation date: 23/06/2020, 10:46:41",
+)
+
 
 @pytest.fixture
 def mock_dbhelper() -> DBHelper:
     """Returns mock for DBHelper"""
-    mock = DBHelper
-    mock.update_subscription = MagicMock(return_value=1)
+    mock = MagicMock(spec=DBHelper)
+    mock.apply_changes = MagicMock(side_effect=lambda name, changes, version: {**asdict(SKY_STORE), **changes})
     return mock
 
 
 @pytest.fixture
 def get_subscription() -> Subscription:
     """Returns Subscription object"""
-    return Subscription(
-        owner="Mary",
-        name="Sky Store",
-        frequency="monthly",
-        start_date=date(2019, 4, 13),
-        price=12.97,
-        currency="CNY",
-        comment="Generation date: 23/06/2020, 10:46:41",
-    )
+    return SKY_STORE
 
 
 @pytest.mark.parametrize(
@@ -87,3 +89,22 @@ def test_edit_subscription_wrong_field_types(
     changes = {field: value}
     with pytest.raises(SubscriptionException):
         assert utils.validate_subscription_changes(subscription, changes)
+
+
+def test_edit_subscription_applies_changes(controller: Controller, mock_dbhelper: DBHelper):
+    """Check that only validated changes are sent with apply_changes and listeners get changed subscription"""
+    listener = MagicMock()
+    controller.add_listener(listener)
+    # owner before changes is read for listeners, when owner is changed
+    mock_dbhelper.find_subscriptions.return_value = iter([{"owner": "Mary"}])
+    assert controller.edit_subscription("Sky Store", {"owner": "Kevin", "price": 9.99}) == 1
+    mock_dbhelper.apply_changes.assert_called_once_with("Sky Store", {"owner": "Kevin", "price": 9.99}, None)
+    changed = Subscription(**{**asdict(SKY_STORE), "owner": "Kevin", "price": 9.99})
+    listener.subscription_edited.assert_called_once_with("Sky Store", changed, "Mary")
+
+
+def test_edit_not_existing_subscription(controller: Controller, mock_dbhelper: DBHelper):
+    """Check that SubsNotFoundException is raised when apply_changes finds no subscription"""
+    mock_dbhelper.apply_changes = MagicMock(return_value=None)
+    with pytest.raises(SubsNotFoundException):
+        controller.edit_subscription("Sky Store", {"price": 9.99})
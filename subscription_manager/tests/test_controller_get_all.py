@@ -77,7 +77,7 @@ subscriptions_obj_list = [
 @pytest.fixture
 def mock_dbhelper(subscriptions_db_list) -> DBHelper:
     """Returns mock for DBHelper for get_subscription by name from database"""
-    mock = DBHelper
+    mock = MagicMock(spec=DBHelper)
     mock.get_all_subscriptions = MagicMock(return_value=subscriptions_db_list)
     return mock
 
@@ -13,7 +13,7 @@ from subscription_manager.subscription import Subscription
 @pytest.fixture
 def mock_dbhelper() -> DBHelper:
     """Returns mock for DBHelper for get_subscription by name from database"""
-    mock = DBHelper
+    mock = MagicMock(spec=DBHelper)
     return_dict = {
         "owner": "Mary",
         "name": "Sky Store",
@@ -30,11 +30,10 @@ def mock_dbhelper() -> DBHelper:
 @pytest.fixture
 def mock_dbhelper_not_found(mock_dbhelper: DBHelper) -> DBHelper:
     """Returns mock for DBHelper for get_subscription by name from database with SubsNotFoundException """
-    mock = DBHelper
     mock_dbhelper.get_subscription.side_effect = SubsNotFoundException(
         "Subscription with name 'Definitely not exist' was not found"
     )
-    return mock
+    return mock_dbhelper
 
 
 @pytest.fixture
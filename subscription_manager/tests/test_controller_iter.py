@@ -0,0 +1,74 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+from subscription_manager.common.exceptions import SubscriptionException
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.subscription import Subscription
+
+DOCUMENT = {
+    "owner": "Mary",
+    "name": "Sky Store",
+    "frequency": "monthly",
+    "start_date": date(2019, 4, 13),
+    "price": 12.97,
+    "currency": "CNY",
+    "comment": "Generation date: 23/06/2020, 10:46:41",
+}
+
+
+@pytest.fixture
+def received():
+    """List of documents, that were taken from the cursor"""
+    return []
+
+
+@pytest.fixture
+def mock_dbhelper(received) -> DBHelper:
+    """Returns mock for DBHelper, that streams documents and records every received document"""
+
+    def iter_subscriptions(owner, batch_size, projection):
+        for number in range(1000):
+            document = dict(DOCUMENT, name=f"Sky Store {number}")
+            if projection:
+                for key, include in projection.items():
+                    if not include:
+                        del document[key]
+            received.append(document)
+            yield document
+
+    mock = MagicMock(spec=DBHelper)
+    mock.iter_subscriptions.side_effect = iter_subscriptions
+    return mock
+
+
+def test_iter_subscriptions_lazy(controller: Controller, received: list):
+    """Check that subscriptions are taken from the cursor one by one"""
+    subscriptions = controller.iter_subscriptions()
+    assert received == []
+    first = next(subscriptions)
+    assert first == Subscription(**dict(DOCUMENT, name="Sky Store 0"))
+    assert len(received) == 1
+    assert sum(1 for _ in subscriptions) == 999
+
+
+def test_iter_subscriptions_projection(controller: Controller, mock_dbhelper: DBHelper):
+    """Check that fields excluded by projection are set to None"""
+    subscriptions = controller.iter_subscriptions(
+        owner="Mary", batch_size=100, projection={"comment": False}
+    )
+    subscription = next(subscriptions)
+    assert subscription.comment is None
+    assert subscription.price == DOCUMENT["price"]
+    mock_dbhelper.iter_subscriptions.assert_called_once_with(
+        "Mary", batch_size=100, projection={"comment": False}
+    )
+
+
+@pytest.mark.parametrize("owner", [123, ("Lena", "Artur"), ""])
+def test_iter_subscriptions_wrong_owner(controller: Controller, owner):
+    """Check that owner is validated before the cursor is opened"""
+    with pytest.raises(SubscriptionException):
+        controller.iter_subscriptions(owner)
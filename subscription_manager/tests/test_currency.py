@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from subscription_manager.common.exceptions import RatesNotAvailableException
+from subscription_manager.currency import CurrencyConverter
+from subscription_manager.subscription import Subscription
+from subscription_manager.subscription_table import SubscriptionTable
+
+RATES = {
+    "USD": {"GBP": 0.8, "EUR": 0.9, "RUB": 70.0, "CNY": 7.0},
+    "EUR": {"USD": 1.0 / 0.9, "GBP": 0.8 / 0.9, "RUB": 70.0 / 0.9, "CNY": 7.0 / 0.9},
+}
+
+
+class LocalRateSource:
+    """Stand-in for rates API, counts requests and can be switched offline"""
+
+    def __init__(self):
+        self.calls = []
+        self.online = True
+
+    def __call__(self, base_currency: str) -> dict:
+        self.calls.append(base_currency)
+        if not self.online:
+            raise ConnectionError("network is unreachable")
+        return RATES[base_currency]
+
+
+class FakeToday:
+    """Controllable current date"""
+
+    def __init__(self):
+        self.day = date(2020, 7, 1)
+
+    def __call__(self) -> date:
+        return self.day
+
+
+class FakeClock:
+    """Controllable monotonic clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def source() -> LocalRateSource:
+    return LocalRateSource()
+
+
+@pytest.fixture
+def today() -> FakeToday:
+    return FakeToday()
+
+
+@pytest.fixture
+def converter(source, today, tmp_path) -> CurrencyConverter:
+    return CurrencyConverter(source, snapshot_path=str(tmp_path / "rates.json"), today=today)
+
+
+def test_convert(converter: CurrencyConverter):
+    """Check that amounts are converted with rates of the target currency"""
+    assert converter.convert(7.0, "CNY", "USD") == pytest.approx(1.0)
+    assert converter.convert(10.0, "USD", "USD") == 10.0
+    assert converter.rate("GBP", "USD") == pytest.approx(1.25)
+
+
+def test_rates_fetched_once_per_day(converter: CurrencyConverter, source: LocalRateSource, today: FakeToday):
+    """Check that every base currency is fetched once per day"""
+    for currency in ("GBP", "EUR", "RUB", "CNY", "GBP"):
+        converter.convert(1.0, currency, "USD")
+    assert source.calls == ["USD"]
+    converter.convert(1.0, "USD", "EUR")
+    assert source.calls == ["USD", "EUR"]
+    today.day += timedelta(days=1)
+    converter.convert(1.0, "GBP", "USD")
+    assert source.calls == ["USD", "EUR", "USD"]
+
+
+def test_offline_fallback_to_snapshot(converter: CurrencyConverter, source: LocalRateSource, today, tmp_path):
+    """Check that snapshot rates are used when source fails and source is asked again after retry interval"""
+    converter.convert(1.0, "GBP", "USD")
+    source.online = False
+    clock = FakeClock()
+    offline = CurrencyConverter(
+        source, snapshot_path=converter.snapshot_path, today=today, retry_interval=60.0, clock=clock
+    )
+    today.day += timedelta(days=3)
+    assert offline.convert(7.0, "CNY", "USD") == pytest.approx(1.0)
+    assert offline.get_rates("USD").fetched_on == date(2020, 7, 1)
+    # fallback is memoized until retry interval passes
+    clock.now = 59.0
+    offline.convert(7.0, "CNY", "USD")
+    assert source.calls == ["USD", "USD"]
+    with pytest.raises(RatesNotAvailableException):
+        offline.get_rates("EUR")
+    source.online = True
+    clock.now = 60.0
+    assert offline.get_rates("USD").fetched_on == today.day
+    clock.now = 1000.0
+    offline.convert(7.0, "CNY", "USD")
+    assert source.calls == ["USD", "USD", "EUR", "USD"]
+
+
+def test_no_snapshot(source: LocalRateSource):
+    """Check that RatesNotAvailableException is raised when source fails without snapshot"""
+    source.online = False
+    with pytest.raises(RatesNotAvailableException):
+        CurrencyConverter(source).convert(1.0, "GBP", "USD")
+
+
+def test_unknown_currency(converter: CurrencyConverter):
+    """Check that missing rate raises RatesNotAvailableException"""
+    with pytest.raises(RatesNotAvailableException):
+        converter.convert(1.0, "JPY", "USD")
+
+
+def test_convert_many(converter: CurrencyConverter, source: LocalRateSource):
+    """Check that vectorized conversion matches conversion of single amounts"""
+    prices = [1.0, 0.8, 0.9, 70.0, 7.0, 2.0]
+    currencies = ["USD", "GBP", "EUR", "RUB", "CNY", "USD"]
+    converted = converter.convert_many(prices, currencies, "USD")
+    np.testing.assert_allclose(converted, [1.0, 1.0, 1.0, 1.0, 1.0, 2.0])
+    expected = [converter.convert(price, currency, "EUR") for price, currency in zip(prices, currencies)]
+    np.testing.assert_allclose(converter.convert_many(prices, currencies, "EUR"), expected)
+    assert source.calls == ["USD", "EUR"]
+
+
+def test_convert_table(converter: CurrencyConverter):
+    """Check that prices of subscription table are converted to one currency"""
+    table = SubscriptionTable.from_subscriptions(
+        Subscription("Mary", f"Service {index}", "monthly", date(2020, 1, 1), price, currency, "")
+        for index, (price, currency) in enumerate([(14.0, "CNY"), (1.6, "GBP"), (3.0, "USD")])
+    )
+    np.testing.assert_allclose(converter.convert_table(table, "USD"), [2.0, 2.0, 3.0])
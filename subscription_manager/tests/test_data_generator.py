@@ -0,0 +1,84 @@
+from collections import Counter
+from datetime import date, timedelta
+
+import mongomock
+import pytest
+
+from subscription_manager.common import utils
+from subscription_manager.data_generator import (
+    GENERATION_CHUNK_SIZE,
+    GeneratorConfig,
+    generate_subscriptions,
+    insert_subscriptions,
+    read_jsonl,
+    write_jsonl,
+)
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+
+TODAY = date(2020, 7, 1)
+
+
+def test_same_seed_same_subscriptions():
+    """Check that the same seed gives the same subscriptions and another seed gives other ones"""
+    first = list(generate_subscriptions(100, seed=5, today=TODAY))
+    assert first == list(generate_subscriptions(100, seed=5, today=TODAY))
+    assert first != list(generate_subscriptions(100, seed=6, today=TODAY))
+
+
+def test_subscriptions_are_valid():
+    """Check that generated subscriptions pass validation and have unique names"""
+    subscriptions = list(generate_subscriptions(2000, seed=1))
+    valid, errors = utils.validate_many(subscriptions)
+    assert len(valid) == 2000 and errors == []
+    assert len({subscription["name"] for subscription in subscriptions}) == 2000
+
+
+def test_names_are_unique_across_chunks():
+    """Check that names stay unique when generation takes more than one chunk"""
+    count = GENERATION_CHUNK_SIZE + 10
+    names = {subscription["name"] for subscription in generate_subscriptions(count, today=TODAY)}
+    assert len(names) == count
+
+
+def test_distributions():
+    """Check that owners, dates, prices, frequencies and currencies follow the config"""
+    config = GeneratorConfig(
+        owners=3,
+        owner_skew=0,
+        mean_age_days=30,
+        max_age_days=60,
+        frequencies={"daily": 1, "yearly": 3},
+        currencies={"GBP": 1},
+        price_median=10,
+        max_price=20,
+        unique_names=False,
+    )
+    subscriptions = list(generate_subscriptions(20_000, config, seed=2, today=TODAY))
+    frequencies = Counter(subscription["frequency"] for subscription in subscriptions)
+    assert frequencies["yearly"] / len(subscriptions) == pytest.approx(0.75, abs=0.02)
+    assert {subscription["currency"] for subscription in subscriptions} == {"GBP"}
+    assert len({subscription["owner"] for subscription in subscriptions}) == 3
+    assert all(TODAY - timedelta(days=60) <= s["start_date"] <= TODAY for s in subscriptions)
+    assert all(0.99 <= s["price"] <= 20 for s in subscriptions)
+    assert all(s["name"] in utils.SUBSCRIPTION_NAMES for s in subscriptions)
+
+
+def test_jsonl_round_trip(tmp_path):
+    """Check that subscriptions written to JSON lines are read back unchanged"""
+    subscriptions = list(generate_subscriptions(300, seed=3, today=TODAY))
+    subscriptions[0] = {**subscriptions[0], "comment": 'Quote " and \\ and юникод'}
+    path = str(tmp_path / "subscriptions.jsonl")
+    assert write_jsonl(subscriptions, path) == 300
+    assert list(read_jsonl(path)) == subscriptions
+
+
+@pytest.mark.parametrize(
+    "dbhelper",
+    [InMemoryDBHelper(), DBHelper.from_client(mongomock.MongoClient(), "test")],
+    ids=["memory", "mongo"],
+)
+def test_bulk_insert(dbhelper):
+    """Check that generated subscriptions are inserted in batches into memory and mongo backends"""
+    assert insert_subscriptions(dbhelper, generate_subscriptions(1234, seed=4), batch_size=500) == 1234
+    assert len(dbhelper.get_all_subscriptions()) == 1234
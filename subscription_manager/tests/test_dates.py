@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import DAILY, WEEKLY, MONTHLY, YEARLY, rrule
+
+from subscription_manager.common.constants import FREQUENCIES
+from subscription_manager.common.dates import add_months, next_payment_date, payment_dates
+
+RRULE_FREQUENCIES = dict(daily=DAILY, weekly=WEEKLY, monthly=MONTHLY, yearly=YEARLY)
+PERIODS = dict(
+    daily=relativedelta(days=1),
+    weekly=relativedelta(weeks=1),
+    monthly=relativedelta(months=1),
+    yearly=relativedelta(years=1),
+)
+TODAY_DATES = [date(2020, 2, 29), date(2020, 6, 18), date(2021, 3, 1), date(2023, 12, 31)]
+
+
+def rrule_next_payment_date(start_date: date, frequency: str, today: date) -> date:
+    """Previous rrule based implementation of Subscription.get_next_payment_date"""
+    periods = list(
+        rrule(
+            RRULE_FREQUENCIES[frequency],
+            dtstart=start_date,
+            until=today + PERIODS[frequency],
+        )
+    )
+    if periods[-2].date() == today:
+        return today
+    return periods[-1].date()
+
+
+def rrule_clamped_next_payment_date(start_date: date, frequency: str, today: date) -> date:
+    """rrule reference, that moves 29-31 days to the last day of shorter months"""
+    options = dict(bymonthday=(start_date.day, -1), bysetpos=1)
+    if frequency == "yearly":
+        options["bymonth"] = start_date.month
+    dates = rrule(RRULE_FREQUENCIES[frequency], dtstart=start_date, **options)
+    return next(day.date() for day in dates if day.date() >= today)
+
+
+def start_dates(today: date, days: int, step: int = 1):
+    """Return start dates for the last given count of days before today"""
+    return [today - timedelta(days=offset) for offset in range(0, days, step)]
+
+
+@pytest.mark.parametrize("today", TODAY_DATES)
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_next_payment_date_matches_rrule(frequency: str, today: date):
+    """Check that calendar arithmetic gives the same dates as rrule for days, that exist in every month"""
+    for start_date in start_dates(today, days=3 * 366, step=5):
+        if start_date.day > 28:
+            continue
+        expected = rrule_next_payment_date(start_date, frequency, today)
+        assert next_payment_date(start_date, frequency, today) == expected, start_date
+
+
+@pytest.mark.parametrize("today", TODAY_DATES)
+@pytest.mark.parametrize("frequency", ["monthly", "yearly"])
+def test_next_payment_date_month_end(frequency: str, today: date):
+    """Check that days 29-31 are clamped to the end of shorter months"""
+    for start_date in start_dates(today, days=5 * 366):
+        if start_date.day <= 28:
+            continue
+        expected = rrule_clamped_next_payment_date(start_date, frequency, today)
+        assert next_payment_date(start_date, frequency, today) == expected, start_date
+
+
+@pytest.mark.parametrize(
+    "start_date, frequency, today, expected",
+    [
+        (date(2020, 1, 31), "monthly", date(2020, 2, 1), date(2020, 2, 29)),
+        (date(2020, 1, 31), "monthly", date(2020, 3, 1), date(2020, 3, 31)),
+        (date(2019, 1, 31), "monthly", date(2019, 2, 28), date(2019, 2, 28)),
+        (date(2020, 2, 29), "yearly", date(2020, 3, 1), date(2021, 2, 28)),
+        (date(2020, 2, 29), "yearly", date(2023, 3, 1), date(2024, 2, 29)),
+        (date(2020, 6, 18), "weekly", date(2020, 6, 18), date(2020, 6, 18)),
+        (date(2020, 6, 18), "daily", date(2020, 6, 18), date(2020, 6, 18)),
+        (date(2000, 6, 18), "daily", date(2020, 6, 18), date(2020, 6, 18)),
+    ],
+)
+def test_next_payment_date_examples(start_date, frequency, today, expected):
+    """Check next payment date for known month end and leap year cases"""
+    assert next_payment_date(start_date, frequency, today) == expected
+
+
+@pytest.mark.parametrize(
+    "start_date, months, expected",
+    [
+        (date(2020, 1, 31), 1, date(2020, 2, 29)),
+        (date(2020, 1, 31), -2, date(2019, 11, 30)),
+        (date(2020, 12, 15), 1, date(2021, 1, 15)),
+        (date(2020, 2, 29), 12, date(2021, 2, 28)),
+    ],
+)
+def test_add_months(start_date: date, months: int, expected: date):
+    """Check that add_months keeps the day of start date or clamps it to the month end"""
+    assert add_months(start_date, months) == expected
+
+
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_payment_dates_match_rrule(frequency: str):
+    """Check that payment dates in the window agree with rrule and next_payment_date"""
+    start_date = date(2019, 1, 31)
+    window_start, window_end = date(2020, 2, 10), date(2021, 3, 31)
+    expected = [
+        day.date()
+        for day in rrule(RRULE_FREQUENCIES[frequency], dtstart=start_date, until=window_end)
+        if day.date() >= window_start
+    ]
+    dates = list(payment_dates(start_date, frequency, window_start, window_end))
+    if frequency in ("daily", "weekly"):
+        assert dates == expected
+    # rrule skips months without the day, payment dates are clamped to the end of month
+    assert dates == [next_payment_date(start_date, frequency, day) for day in dates]
+    assert dates == sorted(set(dates))
+    assert dates[0] == next_payment_date(start_date, frequency, window_start)
+    assert next_payment_date(start_date, frequency, dates[-1] + timedelta(days=1)) > window_end
+
+
+def test_payment_dates_window_before_start():
+    """Check that window starting before subscription yields payments from its start only"""
+    dates = payment_dates(date(2020, 5, 31), "monthly", date(2020, 1, 1), date(2020, 8, 31))
+    assert list(dates) == [date(2020, 5, 31), date(2020, 6, 30), date(2020, 7, 31), date(2020, 8, 31)]
+    assert list(payment_dates(date(2020, 5, 31), "yearly", date(2020, 6, 1), date(2021, 5, 30))) == []
@@ -0,0 +1,154 @@
+import os
+from datetime import date
+
+import mongomock
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from subscription_manager.common import utils
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.subscription import Subscription
+
+# Local mongod for query plan checks, e.g. mongodb://localhost:27017
+MONGODB_TEST_URL = os.environ.get("MONGODB_TEST_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = "subscription_manager_test"
+
+
+def make_subscription(name: str, owner: str = "Mary") -> Subscription:
+    return Subscription(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=12.97,
+        currency="CNY",
+        comment="Generation date: 23/06/2020, 10:46:41",
+    )
+
+
+@pytest.fixture
+def dbhelper() -> DBHelper:
+    """Returns DBHelper connected to mongomock in-memory database"""
+    helper = DBHelper.from_client(mongomock.MongoClient(), TEST_DB_NAME)
+    helper.ensure_indexes()
+    for owner, name in [("Mary", "Sky Store"), ("Mary", "Spotify"), ("Kevin", "Netflix")]:
+        helper.add_subscription(make_subscription(name, owner))
+    return helper
+
+
+@pytest.fixture
+def mongod_dbhelper() -> DBHelper:
+    """Returns DBHelper connected to local mongod, test is skipped if mongod is not available"""
+    client = MongoClient(MONGODB_TEST_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"mongod is not available at {MONGODB_TEST_URL}")
+    client.drop_database(TEST_DB_NAME)
+    helper = DBHelper.from_client(client, TEST_DB_NAME)
+    helper.ensure_indexes()
+    helper.add_subscriptions(
+        [utils.create_subscription(**utils.subscription_generator()) for _ in range(200)]
+    )
+    yield helper
+    client.drop_database(TEST_DB_NAME)
+    client.close()
+
+
+def test_get_subscription(dbhelper: DBHelper):
+    """Check that found subscription has no _id and start_date is date"""
+    assert dbhelper.get_subscription("Spotify") == vars(make_subscription("Spotify"))
+
+
+def test_get_not_exist_subscription(dbhelper: DBHelper):
+    """Check that SubsNotFoundException is raised for nonexistent subscription"""
+    with pytest.raises(SubsNotFoundException) as exc:
+        dbhelper.get_subscription("Definitely not exist")
+    assert str(exc.value) == "Subscription with name 'Definitely not exist' was not found"
+
+
+@pytest.mark.parametrize(
+    "owner, names",
+    [("Mary", ["Sky Store", "Spotify"]), (None, ["Sky Store", "Spotify", "Netflix"])],
+)
+def test_get_all_subscriptions(dbhelper: DBHelper, owner, names):
+    """Check listing of all subscriptions and subscriptions of owner"""
+    subscriptions = dbhelper.get_all_subscriptions(owner)
+    assert [subscription["name"] for subscription in subscriptions] == names
+    assert all(type(subscription["start_date"]) == date for subscription in subscriptions)
+
+
+def test_iter_subscriptions_projection(dbhelper: DBHelper):
+    """Check that excluded fields are not received"""
+    subscriptions = list(
+        dbhelper.iter_subscriptions("Kevin", batch_size=1, projection={"comment": False})
+    )
+    assert len(subscriptions) == 1
+    assert "comment" not in subscriptions[0]
+
+
+def test_apply_changes(dbhelper: DBHelper):
+    """Check that subscription is changed by its previous name"""
+    changed = make_subscription("Spotify Family")
+    assert dbhelper.apply_changes("Spotify", {"name": "Spotify Family"}) == vars(changed)
+    assert dbhelper.get_subscription("Spotify Family") == vars(changed)
+    assert dbhelper.apply_changes("Spotify", {"name": "Spotify Family"}) is None
+
+
+def test_delete_subscription(dbhelper: DBHelper):
+    """Check that subscription is deleted by name"""
+    assert dbhelper.delete_subscription("Spotify") == 1
+    assert dbhelper.delete_subscription("Spotify") == 0
+    with pytest.raises(SubsNotFoundException):
+        dbhelper.get_subscription("Spotify")
+
+
+def test_add_subscriptions(dbhelper: DBHelper):
+    """Check bulk insertion"""
+    inserted_ids, errors = dbhelper.add_subscriptions(
+        [make_subscription("Coursera"), make_subscription("Netflix UHD")]
+    )
+    assert len(inserted_ids) == 2 and errors == {}
+    assert len(dbhelper.get_all_subscriptions("Mary")) == 4
+
+
+def test_ensure_indexes(dbhelper: DBHelper):
+    """Check that indexes for owner, name, (owner, name), currency and frequency exist and ensure_indexes can be repeated"""
+    dbhelper.ensure_indexes()
+    indexes = [index["key"] for index in dbhelper.subscriptions.index_information().values()]
+    assert [("owner", 1)] in indexes
+    assert [("name", 1)] in indexes
+    assert [("owner", 1), ("name", 1)] in indexes
+    assert [("currency", 1)] in indexes
+    assert [("frequency", 1)] in indexes
+
+
+def winning_stages(plan: dict) -> list:
+    """Return stages of the winning query plan from the top to the leaf"""
+    stages = []
+    while plan:
+        stages.append(plan["stage"])
+        plan = plan.get("inputStage")
+    return stages
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"name": "Spotify"},
+        {"owner": "Mary"},
+        {"owner": "Mary", "name": "Spotify"},
+        {"name": "Spotify", "currency": "USD"},
+        {"frequency": "daily"},
+    ],
+)
+def test_queries_use_indexes(mongod_dbhelper: DBHelper, query: dict):
+    """Check with real query planner that point lookup, owner listing and bulk edit filters are index scans"""
+    explanation = mongod_dbhelper.subscriptions.find(query).explain()
+    winning_plan = explanation["queryPlanner"]["winningPlan"]
+    # slot based execution engine puts the plan one level deeper
+    stages = winning_stages(winning_plan.get("queryPlan", winning_plan))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
@@ -0,0 +1,144 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+from subscription_manager.controller import Controller
+from subscription_manager.due_index import DueIndex
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.subscription import Subscription
+
+TODAY = date(2020, 6, 18)
+
+
+def make_subscription(name: str, frequency: str, start_date: date, owner: str = "Mary"):
+    return Subscription(
+        owner=owner,
+        name=name,
+        frequency=frequency,
+        start_date=start_date,
+        price=9.99,
+        currency="USD",
+        comment="",
+    )
+
+
+@pytest.fixture
+def subscriptions():
+    return [
+        make_subscription("Spotify", "monthly", date(2020, 1, 20)),
+        make_subscription("Netflix", "weekly", date(2020, 6, 4)),
+        make_subscription("Coursera", "yearly", date(2019, 7, 1), owner="Kevin"),
+        make_subscription("Sky Store", "monthly", date(2020, 5, 31)),
+    ]
+
+
+@pytest.fixture
+def due_index(subscriptions) -> DueIndex:
+    return DueIndex(subscriptions, today=TODAY)
+
+
+def names(due):
+    return [subscription.name for _, subscription in due]
+
+
+def test_due_within(due_index: DueIndex):
+    """Check that index returns subscriptions sorted by next payment date"""
+    due = due_index.due_within(3, today=TODAY)
+    assert [due_date for due_date, _ in due] == [date(2020, 6, 18), date(2020, 6, 20)]
+    assert names(due) == ["Netflix", "Spotify"]
+    assert names(due_index.due_within(30, today=TODAY)) == [
+        "Netflix",
+        "Spotify",
+        "Sky Store",
+        "Coursera",
+    ]
+
+
+def test_due_index_owner(subscriptions):
+    """Check that index for owner skips subscriptions of other owners"""
+    due_index = DueIndex(subscriptions, owner="Kevin", today=TODAY)
+    assert len(due_index) == 1
+    assert names(due_index.due_within(365, today=TODAY)) == ["Coursera"]
+
+
+def test_roll_forward(due_index: DueIndex):
+    """Check that passed payment dates are moved to the next occurrence"""
+    due = due_index.due_within(0, today=date(2020, 6, 21))
+    assert due == []
+    due = due_index.due_within(5, today=date(2020, 6, 21))
+    assert due[0][0] == date(2020, 6, 25)
+    assert names(due) == ["Netflix"]
+    due_dates = {s.name: d for d, s in due_index.due_within(31, today=date(2020, 6, 21))}
+    assert due_dates["Spotify"] == date(2020, 7, 20)
+
+
+def test_add_remove(due_index: DueIndex):
+    """Check that add replaces subscription with the same name and remove deletes it"""
+    due_index.add(make_subscription("Spotify", "daily", date(2020, 1, 1)))
+    assert len(due_index) == 4
+    assert names(due_index.due_within(0, today=TODAY)) == ["Netflix", "Spotify"]
+    assert due_index.remove("Spotify")
+    assert not due_index.remove("Spotify")
+    assert "Spotify" not in due_index
+    assert names(due_index.due_within(0, today=TODAY)) == ["Netflix"]
+
+
+def test_same_name_of_different_owners():
+    """Check that subscriptions of different owners with the same name are indexed separately"""
+    controller = Controller(InMemoryDBHelper())
+    for owner, start_date in (("Mary", date(2020, 1, 20)), ("Kevin", date(2020, 1, 25))):
+        controller.add_subscription(dict(
+            owner=owner, name="Spotify", frequency="monthly", start_date=start_date,
+            price=9.99, currency="USD", comment="",
+        ))
+    due_index = DueIndex(controller.get_subscriptions_list(), today=TODAY)
+    controller.add_listener(due_index)
+    assert len(due_index) == 2
+    controller.edit_subscription("Spotify", {"start_date": date(2020, 1, 19)})
+    due = due_index.due_within(10, today=TODAY)
+    assert [(due_date, subscription.owner) for due_date, subscription in due] == [
+        (date(2020, 6, 19), "Mary"), (date(2020, 6, 25), "Kevin")
+    ]
+    # storage deletes the first subscription with the name
+    controller.delete_subscription("Spotify")
+    assert [subscription.owner for _, subscription in due_index.due_within(10, today=TODAY)] == ["Kevin"]
+    assert due_index.remove("Spotify", owner="Kevin")
+    assert "Spotify" not in due_index
+
+
+def test_controller_keeps_due_index(subscriptions):
+    """Check that Controller updates due index on add, edit and delete"""
+    dbhelper = MagicMock()
+    dbhelper.get_all_subscriptions.return_value = []
+    dbhelper.delete_subscription.return_value = 1
+    controller = Controller(dbhelper)
+    due_index = controller.create_due_index()
+
+    controller.add_subscription(
+        dict(
+            owner="Mary",
+            name="Netflix",
+            frequency="daily",
+            start_date=date(2020, 6, 1),
+            price=9.99,
+            currency="USD",
+            comment="",
+        )
+    )
+    assert names(due_index.due_within(0)) == ["Netflix"]
+
+    dbhelper.apply_changes.return_value = dict(
+        owner="Mary",
+        name="Netflix UHD",
+        frequency="daily",
+        start_date=date(2020, 6, 1),
+        price=9.99,
+        currency="USD",
+        comment="",
+    )
+    controller.edit_subscription("Netflix", {"name": "Netflix UHD"})
+    assert names(due_index.due_within(0)) == ["Netflix UHD"]
+
+    controller.delete_subscription("Netflix UHD")
+    assert len(due_index) == 0
@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+
+import pytest
+
+from subscription_manager.common.constants import FREQUENCIES
+from subscription_manager.common.exceptions import InvalidValueException, WrongTypeException
+from subscription_manager.controller import Controller
+from subscription_manager.forecast import forecast_totals, iter_payments, merge_payments
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+
+
+def make_subscription_dict(name: str, owner: str = "Mary", **changes) -> dict:
+    subscription = dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=9.99,
+        currency="GBP",
+        comment="",
+    )
+    return {**subscription, **changes}
+
+
+@pytest.fixture
+def controller() -> Controller:
+    controller = Controller(InMemoryDBHelper())
+    controller.add_subscription(make_subscription_dict("Spotify"))
+    controller.add_subscription(
+        make_subscription_dict("Gym", frequency="weekly", start_date=date(2020, 1, 6), price=5.0)
+    )
+    controller.add_subscription(
+        make_subscription_dict("Prime", frequency="yearly", start_date=date(2019, 8, 1), price=96.0)
+    )
+    controller.add_subscription(make_subscription_dict("Netflix", owner="Kevin", currency="USD"))
+    return controller
+
+
+def test_merge_payments():
+    """Check that payments of subscriptions are merged in the order of dates and the window is respected"""
+    subscriptions = [
+        make_subscription_dict("Spotify"),
+        make_subscription_dict("Gym", frequency="weekly", start_date=date(2020, 6, 1)),
+    ]
+    payments = list(merge_payments(subscriptions, date(2020, 6, 1), date(2020, 6, 30)))
+    assert [payment.day for payment in payments] == [
+        date(2020, 6, 1), date(2020, 6, 8), date(2020, 6, 13),
+        date(2020, 6, 15), date(2020, 6, 22), date(2020, 6, 29),
+    ]
+    assert payments[2].name == "Spotify"
+    assert list(iter_payments(subscriptions[0], date(2020, 6, 14), date(2020, 7, 12))) == []
+
+
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_month_totals_match_day_totals(frequency: str):
+    """Check that monthly totals counted with calendar arithmetic equal sums of daily totals"""
+    subscriptions = [make_subscription_dict("Spotify", frequency=frequency, start_date=date(2020, 1, 31))]
+    window_start, window_end = date(2020, 2, 10), date(2021, 2, 20)
+    by_month = {}
+    for row in forecast_totals(subscriptions, window_start, window_end, "day"):
+        total = by_month.setdefault(row["date"].replace(day=1), [0.0, 0])
+        total[0] += row["total"]
+        total[1] += row["count"]
+    rows = forecast_totals(subscriptions, window_start, window_end, "month")
+    assert {row["date"]: row["count"] for row in rows} == {month: total[1] for month, total in by_month.items()}
+    for row in rows:
+        assert row["total"] == pytest.approx(by_month[row["date"]][0])
+
+
+def test_forecast(controller: Controller):
+    """Check monthly and daily forecast totals by currency"""
+    rows = controller.forecast(date(2020, 7, 1), date(2020, 8, 31), "Mary", period="month")
+    assert rows == [
+        {"date": date(2020, 7, 1), "currency": "GBP", "total": pytest.approx(9.99 + 4 * 5.0), "count": 5},
+        {"date": date(2020, 8, 1), "currency": "GBP", "total": pytest.approx(9.99 + 5 * 5.0 + 96.0), "count": 7},
+    ]
+    rows = controller.forecast(date(2020, 7, 13), date(2020, 7, 13))
+    assert rows == [
+        {"date": date(2020, 7, 13), "currency": "GBP", "total": pytest.approx(9.99 + 5.0), "count": 2},
+        {"date": date(2020, 7, 13), "currency": "USD", "total": pytest.approx(9.99), "count": 1},
+    ]
+    year = controller.forecast(date(2020, 7, 1), date(2020, 7, 1) + timedelta(days=364), period="month")
+    assert len({row["date"] for row in year}) == 12
+
+
+def test_forecast_validation(controller: Controller):
+    """Check that reversed window, unknown period and not date bounds are rejected"""
+    with pytest.raises(InvalidValueException):
+        controller.forecast(date(2020, 8, 1), date(2020, 7, 1))
+    with pytest.raises(InvalidValueException):
+        controller.forecast(date(2020, 7, 1), date(2020, 8, 1), period="week")
+    with pytest.raises(WrongTypeException):
+        controller.forecast("2020-07-01", date(2020, 8, 1))
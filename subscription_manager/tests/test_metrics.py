@@ -0,0 +1,121 @@
+from datetime import date
+
+import pytest
+
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.controller import BulkAddResult, BulkEditResult, Controller
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.metrics import MetricsRegistry, instrument_controller, result_size, uninstrument
+from subscription_manager.subscription import Subscription
+
+
+def make_subscription_dict(name: str, owner: str = "Mary") -> dict:
+    return dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=9.99,
+        currency="GBP",
+        comment="",
+    )
+
+
+@pytest.fixture
+def controller() -> Controller:
+    controller = Controller(InMemoryDBHelper())
+    controller.add_subscription(make_subscription_dict("Spotify"))
+    controller.add_subscription(make_subscription_dict("Netflix"))
+    controller.add_subscription(make_subscription_dict("Coursera", owner="Kevin"))
+    return controller
+
+
+def test_not_instrumented(controller: Controller):
+    """Check that controller and storage helper are not wrapped until instrumentation is requested"""
+    assert "get_subscriptions_list" not in vars(controller)
+    assert "iter_subscriptions" not in vars(controller.dbhelper)
+
+
+def test_counts_and_sizes(controller: Controller):
+    """Check that calls, result sizes and operations of controller and storage helper are recorded"""
+    registry = instrument_controller(controller, MetricsRegistry())
+    assert len(controller.get_subscriptions_list("Mary")) == 2
+    controller.get_subscriptions_list()
+    controller.edit_subscription("Spotify", {"price": 10.99})
+    snapshot = registry.snapshot()
+
+    listing = snapshot["controller.get_subscriptions_list"]
+    assert listing["count"] == 2
+    assert listing["errors"] == 0
+    assert listing["result_size"] == 5
+    assert listing["buckets"]["+Inf"] == 2
+    assert listing["seconds"] > 0
+    assert snapshot["controller.edit_subscription"]["result_size"] == 1
+    assert snapshot["dbhelper.apply_changes"]["operation"] == "update"
+    assert snapshot["dbhelper.apply_changes"]["result_size"] == 1
+    # size of streamed results is recorded when stream is consumed
+    assert snapshot["dbhelper.iter_subscriptions"]["operation"] == "find"
+    assert snapshot["dbhelper.iter_subscriptions"]["result_size"] == 5
+
+
+def test_errors(controller: Controller):
+    """Check that raised exceptions are counted as errors"""
+    registry = instrument_controller(controller, MetricsRegistry())
+    with pytest.raises(SubsNotFoundException):
+        controller.get_subscription_by_name("Hulu")
+    metrics = registry.snapshot()["controller.get_subscription_by_name"]
+    assert metrics["count"] == 1
+    assert metrics["errors"] == 1
+
+
+def test_prometheus(controller: Controller):
+    """Check that metrics are exported in Prometheus text format"""
+    registry = instrument_controller(controller, MetricsRegistry())
+    controller.delete_subscription("Netflix")
+    text = registry.to_prometheus()
+    labels = 'component="dbhelper",method="delete_subscription",operation="delete"'
+    assert "# TYPE subscription_manager_call_duration_seconds histogram" in text
+    assert f'subscription_manager_call_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"subscription_manager_call_duration_seconds_count{{{labels}}} 1" in text
+    assert f"subscription_manager_call_errors_total{{{labels}}} 0" in text
+    assert f"subscription_manager_result_size_sum{{{labels}}} 1" in text
+
+
+def test_uninstrument(controller: Controller):
+    """Check that instrumentation wraps methods once and uninstrument restores them"""
+    registry = instrument_controller(controller, MetricsRegistry())
+    # repeated instrumentation does not wrap methods twice
+    instrument_controller(controller, registry)
+    controller.get_subscriptions_list()
+    assert registry.snapshot()["controller.get_subscriptions_list"]["count"] == 1
+    uninstrument(controller)
+    uninstrument(controller.dbhelper)
+    assert "get_subscriptions_list" not in vars(controller)
+    controller.get_subscriptions_list()
+    assert registry.snapshot()["controller.get_subscriptions_list"]["count"] == 1
+    registry.reset()
+    assert registry.snapshot() == {}
+
+
+@pytest.mark.parametrize(
+    "result, size",
+    [
+        (None, None),
+        (True, None),
+        (3, 3),
+        ([{}, {}], 2),
+        (([1, 2, 3], {}), 3),
+        (({"name": "Spotify"}, 2), 1),
+        ((4, 2), 4),
+        ((), 0),
+        (BulkAddResult(inserted_ids=[1, 2]), 2),
+        (BulkEditResult(matched=5, modified=1), 5),
+        ({"name": "Spotify"}, 1),
+        (Subscription(**make_subscription_dict("Spotify")), 1),
+        ("Spotify", 7),
+        (object(), None),
+    ],
+)
+def test_result_size(result, size):
+    """Check that sizes of results of every shape are counted"""
+    assert result_size(result) == size
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+
+from subscription_manager import mongo_pool
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.mongo_pool import PoolConfig, close_clients, get_client
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    """Every test starts with empty registry of clients"""
+    close_clients()
+    yield
+    close_clients()
+
+
+@pytest.fixture
+def client_factory():
+    """Returns factory of mongomock clients, that records creation arguments"""
+    return MagicMock(side_effect=lambda *args, **kwargs: mongomock.MongoClient())
+
+
+def test_client_is_shared(client_factory):
+    """Check that one client is created for the connection string"""
+    first = get_client("mongodb://localhost:27017", client_factory=client_factory)
+    second = get_client("mongodb://localhost:27017", client_factory=client_factory)
+    other = get_client("mongodb://localhost:27018", client_factory=client_factory)
+    assert first is second
+    assert first is not other
+    assert client_factory.call_count == 2
+
+
+def test_pool_options(client_factory):
+    """Check that pool settings are passed to MongoClient"""
+    config = PoolConfig(
+        max_pool_size=10,
+        min_pool_size=2,
+        max_idle_time_ms=60000,
+        connect_timeout_ms=500,
+        server_selection_timeout_ms=700,
+    )
+    get_client("mongodb://localhost:27017", config, client_factory=client_factory)
+    client_factory.assert_called_once_with(
+        "mongodb://localhost:27017",
+        maxPoolSize=10,
+        minPoolSize=2,
+        maxIdleTimeMS=60000,
+        connectTimeoutMS=500,
+        serverSelectionTimeoutMS=700,
+    )
+
+
+def test_close_clients(client_factory):
+    """Check that close_clients closes shared clients and next call creates new client"""
+    client = MagicMock()
+    client_factory.side_effect = lambda *args, **kwargs: client
+    get_client("mongodb://localhost:27017", client_factory=client_factory)
+    close_clients()
+    client.close.assert_called_once_with()
+    get_client("mongodb://localhost:27017", client_factory=client_factory)
+    assert client_factory.call_count == 2
+
+
+def test_dbhelpers_share_client(monkeypatch, client_factory):
+    """Check that DBHelper instances with the same credentials use one client"""
+    monkeypatch.setattr(mongo_pool, "MongoClient", client_factory)
+    credentials = {"user": "user", "password": "password"}
+    first = DBHelper("cluster.example.net", credentials, "subscriptions_db")
+    second = DBHelper("cluster.example.net", credentials, "subscriptions_db")
+    assert first.client is second.client
+    assert client_factory.call_count == 1
@@ -0,0 +1,232 @@
+import asyncio
+from datetime import date
+
+import mongomock
+import pytest
+
+from subscription_manager.async_controller import AsyncController
+from subscription_manager.base_dbhelper import ChangeWatermark
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper, to_new_document
+from subscription_manager.motor_dbhelper import MotorDBHelper
+from subscription_manager.subscription import Subscription
+
+TEST_DB_NAME = "subscription_manager_test"
+
+
+class AsyncCursor:
+    """Motor cursor stub, documents of mongomock cursor are yielded with async for"""
+
+    def __init__(self, cursor):
+        self._documents = iter(cursor)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Motor collection stub, requests of mongomock collection are coroutines, find and aggregate return cursors"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline) -> AsyncCursor:
+        return AsyncCursor(self.collection.aggregate(pipeline))
+
+    def __getattr__(self, item):
+        method = getattr(self.collection, item)
+
+        async def request(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return request
+
+
+class AsyncDatabase:
+    """Motor database stub"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, collection_name: str) -> AsyncCollection:
+        return AsyncCollection(self.db[collection_name])
+
+
+class AsyncClient:
+    """AsyncIOMotorClient stub on top of mongomock client"""
+
+    def __init__(self, client: mongomock.MongoClient):
+        self.client = client
+
+    def __getitem__(self, db_name: str) -> AsyncDatabase:
+        return AsyncDatabase(self.client[db_name])
+
+
+def make_subscription_dict(name: str, owner: str = "Mary", **changes) -> dict:
+    subscription = dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=12.97,
+        currency="CNY",
+        comment="",
+    )
+    return {**subscription, **changes}
+
+
+@pytest.fixture
+def client() -> mongomock.MongoClient:
+    return mongomock.MongoClient()
+
+
+@pytest.fixture
+def motor_dbhelper(client: mongomock.MongoClient) -> MotorDBHelper:
+    """Returns MotorDBHelper connected to mongomock through motor stub"""
+    return MotorDBHelper(None, None, TEST_DB_NAME, client=AsyncClient(client))
+
+
+def test_crud(motor_dbhelper: MotorDBHelper):
+    """Check add, edit, rename, delete and lookups of AsyncController on top of MotorDBHelper"""
+    controller = AsyncController(motor_dbhelper)
+
+    async def scenario():
+        assert len(await motor_dbhelper.ensure_indexes()) == 7
+        await controller.add_subscription(make_subscription_dict("Spotify"))
+        result = await controller.add_subscriptions(
+            [make_subscription_dict("Netflix", "Kevin"), make_subscription_dict("Gym", price="10")]
+        )
+        assert len(result.inserted_ids) == 1 and result.rejected[0][0] == 1
+        assert await controller.edit_subscription("Spotify", {"price": 9.99}) == 1
+        subscription = await controller.modify_subscription("Netflix", lambda s: {"name": "Netflix HD"})
+        assert subscription.name == "Netflix HD"
+        assert (await controller.bulk_edit({"owner": "Mary"}, {"currency": "GBP"})).modified == 1
+        names = sorted([s.name async for s in controller.iter_subscriptions(batch_size=1)])
+        assert names == ["Netflix HD", "Spotify"]
+        assert await controller.delete_subscription("Spotify") == 1
+        assert await controller.delete_subscription("Spotify") == 0
+        with pytest.raises(SubsNotFoundException):
+            await controller.get_subscription_by_name("Spotify")
+        return await controller.get_subscriptions_list()
+
+    subscriptions = asyncio.run(scenario())
+    assert [(s.name, s.owner) for s in subscriptions] == [("Netflix HD", "Kevin")]
+
+
+def test_matches_dbhelper(client: mongomock.MongoClient, motor_dbhelper: MotorDBHelper):
+    """Check that the same writes give the same documents, changes and reports in MotorDBHelper and DBHelper"""
+    controller = Controller(DBHelper.from_client(client, "sync_test"))
+    async_controller = AsyncController(motor_dbhelper)
+    window = date(2020, 6, 1), date(2020, 7, 31)
+
+    def writes(controller):
+        yield controller.add_subscriptions(
+            [make_subscription_dict("Spotify"), make_subscription_dict("Gym", "Kevin", frequency="weekly")]
+        )
+        yield controller.edit_subscription("Spotify", {"name": "Spotify Family", "price": 14.99})
+        yield controller.bulk_edit({"owner": "Kevin"}, {"currency": "USD"})
+        yield controller.delete_subscription("Gym")
+        yield controller.add_subscription(make_subscription_dict("Gym"))
+
+    def reports(controller):
+        yield controller.get_subscriptions_list()
+        yield controller.changes_since()
+        yield controller.changes_since(2)
+        yield controller.spend_summary()
+        yield controller.forecast(*window, period="month")
+
+    async def scenario():
+        for write in writes(async_controller):
+            await write
+        return [await report for report in reports(async_controller)]
+
+    for _ in writes(controller):
+        pass
+    assert asyncio.run(scenario()) == list(reports(controller))
+
+
+def test_snapshot(motor_dbhelper: MotorDBHelper, tmp_path):
+    """Check that snapshot is synced with changes of MotorDBHelper after its watermark"""
+    path = str(tmp_path / "subscriptions.snapshot")
+    controller = AsyncController(motor_dbhelper)
+    other_client = AsyncController(motor_dbhelper)
+
+    async def scenario():
+        await controller.add_subscriptions([make_subscription_dict("Spotify"), make_subscription_dict("Netflix")])
+        controller.open_snapshot(path)
+        assert await controller.wait_snapshot_synced()
+        await controller.close_snapshot()
+        await other_client.edit_subscription("Spotify", {"name": "Spotify Family"})
+        await other_client.delete_subscription("Netflix")
+        store = controller.open_snapshot(path)
+        assert await controller.wait_snapshot_synced()
+        # changes applied by the first sync are not applied again
+        result = await store.async_sync(motor_dbhelper)
+        return await controller.get_subscriptions_list(), result
+
+    subscriptions, result = asyncio.run(scenario())
+    assert [subscription.name for subscription in subscriptions] == ["Spotify Family"]
+    assert not result
+
+
+def test_late_write_within_overlap_is_read(motor_dbhelper: MotorDBHelper):
+    """Check that a write visible after a write with larger number is read in the overlap, but not after it"""
+    now = [0.0]
+    watermark = ChangeWatermark(overlap=motor_dbhelper.changes_overlap, clock=lambda: now[0])
+
+    async def read() -> list:
+        return [change.name for change in watermark.apply(await motor_dbhelper.changes_since(watermark.value))]
+
+    async def write_late(name: str, sequence: int):
+        document = to_new_document(Subscription(**make_subscription_dict(name)), sequence)
+        await motor_dbhelper.subscriptions.insert_one(document)
+
+    async def scenario():
+        # writer reserves the number and stalls, another writer with the next number is read first
+        late = await motor_dbhelper._reserve_sequence()
+        await motor_dbhelper.add_subscription(Subscription(**make_subscription_dict("Hulu")))
+        assert await read() == ["Hulu"]
+        now[0] = motor_dbhelper.changes_overlap - 1
+        await write_late("Spotify", late)
+        assert await read() == ["Spotify"]
+        # write visible later than overlap after the larger number was read is lost
+        later = await motor_dbhelper._reserve_sequence()
+        await motor_dbhelper.add_subscription(Subscription(**make_subscription_dict("Netflix")))
+        assert await read() == ["Netflix"]
+        now[0] += 2 * motor_dbhelper.changes_overlap
+        assert await read() == []
+        await write_late("Prime", later)
+        return await read()
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_follow_changes(motor_dbhelper: MotorDBHelper):
+    """Check that changes written after the stream is started are yielded until the stream is stopped"""
+    stop = asyncio.Event()
+
+    async def follow() -> list:
+        return [(change.name, change.subscription is None) async for change in motor_dbhelper.follow_changes(
+            poll_interval=0.01, stop=stop
+        )]
+
+    async def scenario():
+        await motor_dbhelper.add_subscription(Subscription(**make_subscription_dict("Spotify")))
+        task = asyncio.ensure_future(follow())
+        await asyncio.sleep(0.05)
+        await motor_dbhelper.delete_subscription("Spotify")
+        await asyncio.sleep(0.05)
+        stop.set()
+        return await task
+
+    assert asyncio.run(scenario()) == [("Spotify", False), ("Spotify", True)]
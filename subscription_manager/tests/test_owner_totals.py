@@ -0,0 +1,145 @@
+import random
+from datetime import date
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+
+from subscription_manager.common.constants import CURRENCIES, FREQUENCIES
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.owner_totals import OwnerTotals, TotalsDrift, load_totals
+
+
+def make_subscription_dict(name: str, owner: str = "Mary", price: float = 12.0, **changes) -> dict:
+    subscription = dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=price,
+        currency="GBP",
+        comment="",
+    )
+    return {**subscription, **changes}
+
+
+@pytest.fixture
+def controller() -> Controller:
+    controller = Controller(InMemoryDBHelper())
+    controller.add_subscription(make_subscription_dict("Spotify", price=9.99))
+    controller.add_subscription(make_subscription_dict("Amazon Prime", price=96.0, frequency="yearly"))
+    controller.add_subscription(make_subscription_dict("Netflix", owner="Kevin", currency="USD"))
+    return controller
+
+
+def test_build(controller: Controller):
+    """Check that built totals sum monthly spend of every owner in every currency"""
+    owner_totals = controller.create_owner_totals()
+    assert len(owner_totals) == 3
+    assert owner_totals.monthly_total("Mary", "GBP") == pytest.approx(9.99 + 8.0)
+    assert owner_totals.yearly_total("Mary", "GBP") == pytest.approx((9.99 + 8.0) * 12)
+    assert owner_totals.totals("Kevin") == {"USD": 12.0}
+    assert owner_totals.monthly_total("Lena", "GBP") == 0.0
+
+
+def test_deltas(controller: Controller):
+    """Check that add, edit and delete update totals with deltas"""
+    owner_totals = controller.create_owner_totals()
+    controller.add_subscription(make_subscription_dict("Coursera", owner="Kevin", price=40.0))
+    controller.edit_subscription("Spotify", {"owner": "Kevin", "currency": "USD"})
+    controller.edit_subscription("Amazon Prime", {"price": 120.0})
+    controller.delete_subscription("Netflix")
+    assert owner_totals.totals("Mary") == {"GBP": pytest.approx(10.0)}
+    assert owner_totals.totals("Kevin") == {"GBP": 40.0, "USD": pytest.approx(9.99)}
+    assert owner_totals.check(controller.dbhelper) == []
+
+
+def test_random_changes_do_not_drift():
+    """Check that totals do not drift after many random changes"""
+    generator = random.Random(3)
+    controller = Controller(InMemoryDBHelper())
+    owner_totals = controller.create_owner_totals()
+    names = []
+    for index in range(500):
+        action = generator.random()
+        if action < 0.5 or not names:
+            names.append(f"Service {index}")
+            controller.add_subscription(make_subscription_dict(
+                names[-1],
+                owner=generator.choice(["Mary", "Kevin"]),
+                price=round(generator.uniform(1, 100), 2),
+                frequency=generator.choice(FREQUENCIES),
+                currency=generator.choice(CURRENCIES),
+            ))
+        elif action < 0.8:
+            controller.edit_subscription(generator.choice(names), {"price": round(generator.uniform(1, 100), 2)})
+        else:
+            controller.delete_subscription(names.pop(generator.randrange(len(names))))
+    assert owner_totals.check(controller.dbhelper) == []
+
+
+def test_check_reports_and_repairs_drift(controller: Controller):
+    """Check that changes made without Controller are reported and repaired"""
+    owner_totals = controller.create_owner_totals()
+    # change made without Controller is not seen by the listener
+    controller.dbhelper.delete_subscription("Netflix")
+    assert owner_totals.check(controller.dbhelper, repair=True) == [
+        TotalsDrift("Kevin", "USD", 12.0, 0.0, 1, 0)
+    ]
+    assert owner_totals.totals("Kevin") == {}
+    assert owner_totals.check(controller.dbhelper) == []
+
+
+def test_persisted_totals():
+    """Check that persisted totals follow changes"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    controller = Controller(dbhelper)
+    controller.add_subscription(make_subscription_dict("Spotify"))
+    owner_totals = controller.create_owner_totals(dbhelper.owner_totals)
+
+    def persisted() -> dict:
+        return {
+            (document["owner"], document["currency"]): (document["monthly_spend"], document["count"])
+            for document in dbhelper.owner_totals.find()
+        }
+
+    assert persisted() == {("Mary", "GBP"): (12.0, 1)}
+    controller.add_subscription(make_subscription_dict("Netflix", owner="Kevin"))
+    controller.edit_subscription("Spotify", {"price": 10.0})
+    assert persisted() == {("Mary", "GBP"): (10.0, 1), ("Kevin", "GBP"): (12.0, 1)}
+    controller.delete_subscription("Netflix")
+    assert persisted() == {("Mary", "GBP"): (10.0, 1)}
+    assert isinstance(owner_totals, OwnerTotals)
+
+
+def test_build_loads_persisted_totals():
+    """Check that build takes totals from not empty collection and check reports their drift"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    controller = Controller(dbhelper)
+    controller.add_subscription(make_subscription_dict("Spotify"))
+    controller.create_owner_totals(dbhelper.owner_totals)
+    dbhelper.owner_totals.update_one({"owner": "Mary"}, {"$set": {"monthly_spend": 15.0}})
+    dbhelper.owner_totals = MagicMock(wraps=dbhelper.owner_totals)
+    owner_totals = Controller(dbhelper).create_owner_totals(dbhelper.owner_totals)
+    assert "delete_many" not in [call[0] for call in dbhelper.owner_totals.method_calls]
+    assert owner_totals.totals("Mary") == {"GBP": 15.0}
+    assert owner_totals.check(dbhelper, repair=True) == [TotalsDrift("Mary", "GBP", 15.0, 12.0, 1, 1)]
+    assert load_totals(dbhelper.owner_totals) == {"Mary": {"GBP": [12.0, 1]}}
+
+
+def test_same_name_of_different_owners(controller: Controller):
+    """Check that subscriptions of different owners with the same name contribute separately"""
+    owner_totals = controller.create_owner_totals()
+    controller.add_subscription(make_subscription_dict("Spotify", owner="Kevin", price=11.0))
+    assert len(owner_totals) == 4
+    assert owner_totals.totals("Kevin") == {"USD": 12.0, "GBP": 11.0}
+    controller.edit_subscription("Spotify", {"price": 10.0})
+    controller.delete_subscription("Netflix")
+    assert owner_totals.totals("Kevin") == {"GBP": 11.0}
+    assert owner_totals.monthly_total("Mary", "GBP") == pytest.approx(18.0)
+    assert owner_totals.check(controller.dbhelper) == []
+    controller.delete_subscription("Spotify")
+    assert owner_totals.totals("Kevin") == {"GBP": 11.0}
+    assert owner_totals.check(controller.dbhelper) == []
@@ -0,0 +1,135 @@
+import threading
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from subscription_manager.controller import Controller
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.reminder_scheduler import ReminderScheduler, SimulatedClock
+from subscription_manager.subscription import Subscription
+
+
+def make_subscription_dict(name: str, owner: str = "Mary", **changes) -> dict:
+    subscription = dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2020, 4, 13),
+        price=9.99,
+        currency="GBP",
+        comment="",
+    )
+    return {**subscription, **changes}
+
+
+class Sender:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, reminders):
+        self.batches.append([(reminder.subscription.name, reminder.payment_date) for reminder in reminders])
+
+    @property
+    def sent(self):
+        return [reminder for batch in self.batches for reminder in batch]
+
+
+@pytest.fixture
+def controller() -> Controller:
+    controller = Controller(InMemoryDBHelper())
+    controller.add_subscription(make_subscription_dict("Spotify"))
+    controller.add_subscription(make_subscription_dict("Gym", frequency="weekly", start_date=date(2020, 6, 1)))
+    controller.add_subscription(make_subscription_dict("Netflix", owner="Kevin", start_date=date(2020, 5, 20)))
+    return controller
+
+
+def test_run_until(controller: Controller):
+    """Check that reminders are sent in the order of payments until the given moment"""
+    sender = Sender()
+    clock = SimulatedClock(datetime(2020, 6, 10, 12, 0))
+    scheduler = controller.create_reminder_scheduler(sender, clock=clock)
+    assert len(scheduler) == 3
+    # reminder of the payment on June 12 would have been sent at 9:00 on June 11
+    assert scheduler.next_due() == datetime(2020, 6, 12, 9, 0)
+    assert scheduler.run(until=datetime(2020, 6, 30)) == 5
+    assert sender.sent == [
+        ("Spotify", date(2020, 6, 13)),
+        ("Gym", date(2020, 6, 15)),
+        ("Netflix", date(2020, 6, 20)),
+        ("Gym", date(2020, 6, 22)),
+        ("Gym", date(2020, 6, 29)),
+    ]
+    assert clock.now() == datetime(2020, 6, 30)
+
+
+def test_batches(controller: Controller):
+    """Check that due reminders are sent in batches and fired subscriptions are rescheduled"""
+    sender = Sender()
+    clock = SimulatedClock(datetime(2020, 6, 10, 12, 0))
+    for number in range(5):
+        controller.add_subscription(make_subscription_dict(f"Service {number}", start_date=date(2020, 5, 13)))
+    scheduler = controller.create_reminder_scheduler(sender, clock=clock, batch_size=2)
+    clock.advance(timedelta(days=2))
+    assert scheduler.run_pending() == 6
+    assert [len(batch) for batch in sender.batches] == [2, 2, 2]
+    # fired subscriptions are rescheduled to the next payment
+    assert scheduler.next_due() == datetime(2020, 6, 14, 9, 0)
+    assert scheduler.run_pending() == 0
+
+
+def test_writes_rearm(controller: Controller):
+    """Check that writes through Controller re-arm, add and remove reminders without repeating sent ones"""
+    sender = Sender()
+    clock = SimulatedClock(datetime(2020, 6, 10, 12, 0))
+    scheduler = controller.create_reminder_scheduler(sender, owner="Mary", clock=clock, remind_at=time(8, 0))
+    assert "Netflix" not in scheduler
+    controller.edit_subscription("Spotify", {"start_date": date(2020, 4, 12)})
+    controller.edit_subscription("Gym", {"owner": "Kevin"})
+    controller.add_subscription(make_subscription_dict("Coursera", start_date=date(2020, 5, 12)))
+    controller.delete_subscription("Coursera")
+    controller.add_subscription(make_subscription_dict("Prime", frequency="yearly", start_date=date(2019, 6, 14)))
+    assert scheduler.run(until=datetime(2020, 6, 14)) == 2
+    assert sender.sent == [("Spotify", date(2020, 6, 12)), ("Prime", date(2020, 6, 14))]
+    # edit after the reminder does not repeat it
+    controller.edit_subscription("Prime", {"price": 119.0})
+    assert scheduler.run(until=datetime(2020, 7, 1)) == 0
+    assert scheduler.next_due() == datetime(2020, 7, 11, 8, 0)
+
+
+def test_same_name_of_different_owners(controller: Controller):
+    """Check that subscriptions of different owners with the same name are reminded separately"""
+    sender = Sender()
+    clock = SimulatedClock(datetime(2020, 6, 10, 12, 0))
+    controller.add_subscription(make_subscription_dict("Spotify", owner="Kevin", start_date=date(2020, 5, 14)))
+    scheduler = controller.create_reminder_scheduler(sender, clock=clock)
+    assert len(scheduler) == 4
+    controller.edit_subscription("Spotify", {"price": 10.99})
+    assert len(scheduler) == 4
+    assert scheduler.run(until=datetime(2020, 6, 14)) == 2
+    assert sender.sent == [("Spotify", date(2020, 6, 13)), ("Spotify", date(2020, 6, 14))]
+    controller.delete_subscription("Spotify")
+    assert "Spotify" in scheduler and len(scheduler) == 3
+
+
+def test_stop():
+    """Check that stop ends run in another thread without sending reminders"""
+    sender = Sender()
+    scheduler = ReminderScheduler(sender)
+    worker = threading.Thread(target=scheduler.run)
+    worker.start()
+    scheduler.stop()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert sender.batches == []
+
+
+def test_simulated_run_without_reminders():
+    """Check that run with simulated clock and without until returns when no reminders are left"""
+    sender = Sender()
+    clock = SimulatedClock(datetime(2020, 6, 10, 12, 0))
+    scheduler = ReminderScheduler(sender, clock=clock)
+    assert scheduler.run() == 0
+    scheduler.arm(Subscription(**make_subscription_dict("Spotify")))
+    scheduler.send = lambda reminders: (sender(reminders), scheduler.disarm("Spotify"))
+    assert scheduler.run() == 1
+    assert sender.sent == [("Spotify", date(2020, 6, 13))]
@@ -0,0 +1,211 @@
+from dataclasses import replace
+from datetime import date
+
+import pytest
+
+from subscription_manager.common.exceptions import SubsNotFoundException
+from subscription_manager.controller import Controller
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.snapshot import Snapshot, SnapshotStore, write_snapshot
+from subscription_manager.subscription import Subscription
+
+
+def make_subscription_dict(name: str, owner: str = "Mary", **changes) -> dict:
+    subscription = dict(
+        owner=owner,
+        name=name,
+        frequency="monthly",
+        start_date=date(2019, 4, 13),
+        price=9.99,
+        currency="GBP",
+        comment="",
+    )
+    return {**subscription, **changes}
+
+
+@pytest.fixture
+def controller() -> Controller:
+    controller = Controller(InMemoryDBHelper())
+    controller.add_subscription(make_subscription_dict("Spotify", comment="Премиум"))
+    controller.add_subscription(make_subscription_dict("Netflix", owner="Kevin", frequency="yearly"))
+    controller.add_subscription(make_subscription_dict("Amazon Prime", currency="USD", price=12.5))
+    return controller
+
+
+def test_write_and_read(controller: Controller, tmp_path):
+    """Check that written snapshot is read back by name and owner"""
+    path = str(tmp_path / "subscriptions.snapshot")
+    subscriptions = controller.get_subscriptions_list()
+    assert write_snapshot(path, subscriptions) == 3
+    snapshot = Snapshot(path)
+    assert len(snapshot) == 3
+    assert list(snapshot.iter_subscriptions()) == subscriptions
+    assert list(snapshot.iter_subscriptions("Mary")) == [subscriptions[0], subscriptions[2]]
+    assert snapshot.get("Spotify") == subscriptions[0]
+    assert snapshot.get("Netflix") == subscriptions[1]
+    assert snapshot.get("Hulu") is None
+    assert snapshot.get("Zune") is None
+    snapshot.close()
+
+
+def test_not_snapshot(tmp_path):
+    """Check that file of other format is not opened as snapshot"""
+    path = tmp_path / "broken.snapshot"
+    path.write_bytes(b"not a snapshot file at all, but long enough to have a header")
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+    store = SnapshotStore(str(path))
+    assert store.list() == []
+
+
+def test_controller_reads_from_snapshot(controller: Controller, tmp_path):
+    """Check that restarted Controller reads snapshot before sync and applies changes of other clients"""
+    path = str(tmp_path / "subscriptions.snapshot")
+    controller.open_snapshot(path).wait_synced()
+    controller.close_snapshot()
+    assert Snapshot(path).watermark == 3
+
+    # restarted client reads snapshot before storage is synced
+    restarted = Controller(controller.dbhelper)
+    store = restarted.open_snapshot(path, sync=False)
+    assert store.watermark == 3
+    assert restarted.get_subscription_by_name("Spotify").comment == "Премиум"
+    assert [subscription.name for subscription in restarted.get_subscriptions_list("Mary")] == [
+        "Spotify", "Amazon Prime"
+    ]
+    restarted.add_subscription(make_subscription_dict("Coursera", owner="Kevin"))
+    restarted.edit_subscription("Coursera", {"owner": "Mary"})
+    assert [subscription.name for subscription in restarted.get_subscriptions_list("Mary")] == [
+        "Spotify", "Amazon Prime", "Coursera"
+    ]
+    assert restarted.get_subscriptions_list("Kevin") == [Subscription(**make_subscription_dict(
+        "Netflix", owner="Kevin", frequency="yearly"
+    ))]
+    # changes of other clients are found by sync, own changes are already applied
+    controller.delete_subscription("Netflix")
+    controller.edit_subscription("Spotify", {"price": 10.99})
+    result = store.sync(restarted.dbhelper)
+    assert (result.added, result.changed, result.removed) == (0, 1, 1)
+    assert store.watermark == 7
+    assert [subscription.name for subscription in restarted.get_subscriptions_list()] == [
+        "Spotify", "Amazon Prime", "Coursera"
+    ]
+    assert restarted.get_subscription_by_name("Spotify").price == 10.99
+    with pytest.raises(SubsNotFoundException):
+        restarted.get_subscription_by_name("Netflix")
+    assert not store.sync(restarted.dbhelper)
+    restarted.close_snapshot()
+    snapshot = Snapshot(path)
+    assert (len(snapshot), snapshot.watermark) == (3, 7)
+    assert snapshot.get("Spotify").price == 10.99
+
+
+def test_sync_reads_only_changes(controller: Controller, tmp_path):
+    """Check that sync of snapshot with watermark reads only later changes"""
+    path = str(tmp_path / "subscriptions.snapshot")
+    store = SnapshotStore(path)
+    assert store.sync(controller.dbhelper).added == 3
+    requested = []
+
+    class RecordingDBHelper:
+        changes_overlap = 0.0
+
+        def changes_since(self, watermark: int = 0):
+            changes = controller.dbhelper.changes_since(watermark)
+            requested.append((watermark, len(changes)))
+            return changes
+
+        def find_subscriptions(self, subscription_filter: dict):
+            requested.append(subscription_filter["name"])
+            return controller.dbhelper.find_subscriptions(subscription_filter)
+
+    controller.delete_subscription("Amazon Prime")
+    controller.edit_subscription("Spotify", {"name": "Spotify Family"})
+    result = store.sync(RecordingDBHelper())
+    assert (result.added, result.changed, result.removed) == (1, 0, 2)
+    # tombstones are kept by owner and name, so no subscriptions are requested
+    assert requested == [(3, 3)]
+    assert [subscription.name for subscription in store.list()] == ["Netflix", "Spotify Family"]
+    # kept changes exceed the share of snapshot, so the file is rewritten
+    assert len(Snapshot(path)) == 2
+
+
+def test_sync_requests_names_of_tombstones_without_owner(controller: Controller, tmp_path):
+    """Check that names of tombstones written before they were keyed by owner are requested from storage"""
+    store = SnapshotStore(str(tmp_path / "subscriptions.snapshot"))
+    store.sync(controller.dbhelper)
+    requested = []
+
+    class OldTombstonesDBHelper:
+        changes_overlap = 0.0
+
+        def changes_since(self, watermark: int = 0):
+            changes = controller.dbhelper.changes_since(watermark)
+            return [replace(change, owner=None) if change.subscription is None else change for change in changes]
+
+        def find_subscriptions(self, subscription_filter: dict):
+            requested.append(subscription_filter["name"])
+            return controller.dbhelper.find_subscriptions(subscription_filter)
+
+    controller.delete_subscription("Amazon Prime")
+    controller.edit_subscription("Spotify", {"owner": "Kevin"})
+    result = store.sync(OldTombstonesDBHelper())
+    assert (result.added, result.changed, result.removed) == (1, 0, 2)
+    assert requested == ["Amazon Prime", "Spotify"]
+    assert [(subscription.owner, subscription.name) for subscription in store.list()] == [
+        ("Kevin", "Netflix"), ("Kevin", "Spotify")
+    ]
+
+
+def test_changes_during_sync_are_kept(controller: Controller, tmp_path):
+    """Check that changes made by Controller during sync are not overwritten"""
+    store = SnapshotStore(str(tmp_path / "subscriptions.snapshot"))
+    controller.add_listener(store)
+    dbhelper = controller.dbhelper
+
+    class ChangingDBHelper:
+        changes_overlap = 0.0
+
+        def changes_since(self, watermark: int = 0):
+            changes = dbhelper.changes_since(watermark)
+            controller.delete_subscription("Netflix")
+            controller.edit_subscription("Spotify", {"price": 10.99})
+            return changes
+
+    result = store.sync(ChangingDBHelper())
+    assert result.added == 3
+    assert store.watermark == 3
+    assert store.get("Netflix") is None
+    assert store.get("Spotify").price == 10.99
+    assert [subscription.name for subscription in store.list()] == ["Spotify", "Amazon Prime"]
+
+
+def test_no_snapshot_reads_storage(controller: Controller, tmp_path):
+    """Check that Controller reads storage until the first sync writes snapshot file"""
+    store = controller.open_snapshot(str(tmp_path / "subscriptions.snapshot"), sync=False)
+    assert not store.available
+    assert len(controller.get_subscriptions_list()) == 3
+    assert len(controller.create_due_index()) == 3
+    store.sync(controller.dbhelper)
+    assert store.available and len(controller.get_subscriptions_list()) == 3
+
+
+def test_same_name_of_different_owners(controller: Controller, tmp_path):
+    """Check that subscriptions of different owners with the same name are kept separately"""
+    controller.add_subscription(make_subscription_dict("Spotify", owner="Kevin", price=10.99))
+    path = str(tmp_path / "subscriptions.snapshot")
+    store = SnapshotStore(path)
+    assert store.sync(controller.dbhelper).added == 4
+    assert [subscription.owner for subscription in Snapshot(path).find("Spotify")] == ["Mary", "Kevin"]
+    assert store.get("Spotify", "Kevin").price == 10.99
+    controller.add_listener(store)
+    controller.edit_subscription("Spotify", {"price": 11.99})
+    assert [(s.owner, s.price) for s in store.list() if s.name == "Spotify"] == [("Mary", 11.99), ("Kevin", 10.99)]
+    # storage deletes Mary's subscription, the other client's change is found by name
+    controller.remove_listener(store)
+    controller.delete_subscription("Spotify")
+    controller.edit_subscription("Spotify", {"owner": "Lena"})
+    result = store.sync(controller.dbhelper)
+    assert (result.added, result.changed, result.removed) == (1, 0, 2)
+    assert [(s.owner, s.price) for s in store.list() if s.name == "Spotify"] == [("Lena", 10.99)]
+    assert store.get("Spotify", "Kevin") is None
@@ -0,0 +1,99 @@
+import random
+from datetime import date
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+
+from subscription_manager.common.constants import CURRENCIES, FREQUENCIES
+from subscription_manager.common.exceptions import InvalidValueException
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper, spend_pipeline
+from subscription_manager.memory_dbhelper import InMemoryDBHelper
+from subscription_manager.sqlite_dbhelper import SQLiteDBHelper
+
+OWNERS = ("Mary", "Kevin", "Lena")
+
+
+def make_subscriptions(count: int, seed: int = 7) -> list:
+    generator = random.Random(seed)
+    return [
+        dict(
+            owner=generator.choice(OWNERS),
+            name=f"Service {index}",
+            frequency=generator.choice(FREQUENCIES),
+            start_date=date(2019, 4, 13),
+            price=round(generator.uniform(0.5, 200), 2),
+            currency=generator.choice(CURRENCIES),
+            comment="",
+        )
+        for index in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def controllers() -> dict:
+    """Returns controllers of mongo (server-side pipeline) and in-memory, sqlite (Python fallback) backends"""
+    subscriptions = make_subscriptions(300)
+    controllers = {
+        "mongo": Controller(DBHelper.from_client(mongomock.MongoClient(), "test")),
+        "memory": Controller(InMemoryDBHelper()),
+        "sqlite": Controller(SQLiteDBHelper()),
+    }
+    for controller in controllers.values():
+        assert not controller.add_subscriptions(subscriptions).rejected
+    return controllers
+
+
+def assert_same_rows(rows: list, expected: list):
+    assert len(rows) == len(expected)
+    for row, expected_row in zip(rows, expected):
+        assert row["monthly_spend"] == pytest.approx(expected_row["monthly_spend"])
+        assert {**row, "monthly_spend": None} == {**expected_row, "monthly_spend": None}
+
+
+@pytest.mark.parametrize(
+    "owner, group_by",
+    [
+        (None, ("owner", "currency", "frequency")),
+        (None, ("currency",)),
+        ("Mary", ("currency", "frequency")),
+        ("Kevin", ("frequency", "owner")),
+        (None, ()),
+        ("Nobody", ("currency",)),
+    ],
+)
+def test_backends_give_same_totals(controllers: dict, owner, group_by):
+    """Check that mongo and sqlite backends sum the same monthly spend as memory backend"""
+    expected = controllers["memory"].spend_summary(owner, group_by)
+    for backend in ("mongo", "sqlite"):
+        assert_same_rows(controllers[backend].spend_summary(owner, group_by), expected)
+
+
+def test_monthly_normalization():
+    """Check that yearly and weekly prices are normalized to per-month amounts"""
+    controller = Controller(InMemoryDBHelper())
+    for name, frequency, price in [("A", "yearly", 120.0), ("B", "monthly", 10.0), ("C", "weekly", 7.0)]:
+        subscription = make_subscriptions(1)[0]
+        controller.add_subscription(
+            {**subscription, "name": name, "frequency": frequency, "price": price, "currency": "USD"}
+        )
+    (row,) = controller.spend_summary(group_by=("currency",))
+    assert row["count"] == 3
+    assert row["monthly_spend"] == pytest.approx(10.0 + 10.0 + 365.2425 / 12)
+
+
+def test_unexpected_group_field(controllers: dict):
+    """Check that unsupported group field raises InvalidValueException"""
+    with pytest.raises(InvalidValueException):
+        controllers["memory"].spend_summary(group_by=("price",))
+
+
+def test_only_aggregated_rows_are_received():
+    """Check that mongo backend does not read subscriptions to sum them"""
+    dbhelper = DBHelper.from_client(mongomock.MongoClient(), "test")
+    dbhelper.subscriptions = MagicMock(wraps=dbhelper.subscriptions)
+    Controller(dbhelper).spend_summary("Mary")
+    dbhelper.subscriptions.find.assert_not_called()
+    dbhelper.subscriptions.aggregate.assert_called_once_with(spend_pipeline("Mary"))
+    assert [next(iter(stage)) for stage in spend_pipeline("Mary")] == ["$match", "$group", "$sort"]
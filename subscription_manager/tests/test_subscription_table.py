@@ -0,0 +1,67 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from subscription_manager.common import utils
+from subscription_manager.common.batch_dates import subscriptions_next_payment_dates
+from subscription_manager.controller import Controller
+from subscription_manager.dbhelper import DBHelper
+from subscription_manager.subscription_table import SubscriptionTable
+
+
+@pytest.fixture
+def subscriptions():
+    return [utils.create_subscription(**utils.subscription_generator()) for _ in range(50)]
+
+
+@pytest.fixture
+def mock_dbhelper(subscriptions) -> DBHelper:
+    """Returns mock for DBHelper, that returns subscriptions as dicts"""
+    mock = MagicMock(spec=DBHelper)
+    mock.get_all_subscriptions.return_value = [vars(subscription) for subscription in subscriptions]
+    return mock
+
+
+def test_table_rows(subscriptions):
+    """Check that row access returns the same Subscription objects"""
+    table = SubscriptionTable.from_subscriptions(subscriptions)
+    assert len(table) == len(subscriptions)
+    assert table.to_list() == subscriptions
+    assert table[-1] == subscriptions[-1]
+    with pytest.raises(IndexError):
+        assert table[len(subscriptions)]
+
+
+def test_table_columns(subscriptions):
+    """Check that columns keep values and string columns are dictionary encoded"""
+    table = SubscriptionTable.from_subscriptions(subscriptions)
+    assert table.prices.dtype == np.float64
+    assert table.prices.tolist() == [subscription.price for subscription in subscriptions]
+    assert table.start_dates().tolist() == [subscription.start_date for subscription in subscriptions]
+    assert len(table.currencies.values) <= 5
+    assert table.owners.decode().tolist() == [subscription.owner for subscription in subscriptions]
+
+
+def test_table_next_payment_dates(subscriptions):
+    """Check that table computes the same next payment dates as list of subscriptions"""
+    table = SubscriptionTable.from_subscriptions(subscriptions)
+    today = date.today()
+    assert (
+        table.next_payment_dates(today).tolist()
+        == subscriptions_next_payment_dates(subscriptions, today).tolist()
+    )
+
+
+def test_table_empty():
+    """Check that empty table can be built"""
+    table = SubscriptionTable.from_documents([])
+    assert len(table) == 0
+    assert table.to_list() == []
+
+
+def test_get_subscriptions_table(controller: Controller, subscriptions):
+    """Check that Controller returns table with all subscriptions"""
+    table = controller.get_subscriptions_table()
+    assert table.to_list() == subscriptions
@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+
+from subscription_manager.common import utils
+from subscription_manager.common.constants import *
+from subscription_manager.common.exceptions import *
+
+
+def test_validate_many(generated_subscription: dict):
+    """Check that every invalid subscription of the batch is reported"""
+    subscriptions = [dict(generated_subscription) for _ in range(5)]
+    subscriptions[0]["currency"] = "CAD"
+    subscriptions[3]["owner"] = None
+    del subscriptions[4]["price"]
+    valid, errors = utils.validate_many(subscriptions)
+    assert len(valid) == 2
+    assert [(index, params) for index, params, _ in errors] == [
+        (0, subscriptions[0]),
+        (3, subscriptions[3]),
+        (4, subscriptions[4]),
+    ]
+    assert [type(exc) for _, _, exc in errors] == [
+        InvalidValueException,
+        WrongTypeException,
+        MissingFieldsException,
+    ]
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [dict(price=1.5), dict(currency="EUR", frequency="weekly"), dict(start_date=date(2020, 1, 1))],
+)
+def test_validate_changes(changes: dict):
+    """Check that valid changes are returned as is"""
+    assert utils.validate_changes(changes) == changes
+
+
+@pytest.mark.parametrize(
+    "changes, exception, message",
+    [
+        (dict(price=1), WrongTypeException, None),
+        (dict(currency="CAD"), InvalidValueException, UNEXPECTED_CURRENCY_MSG.format(currency="CAD")),
+        (dict(frequency="hourly"), InvalidValueException, UNEXPECTED_FREQUENCY_MSG.format(frequency="hourly")),
+        (dict(start_date=date(3000, 1, 1)), InvalidValueException, FUTURE_START_DATE_MSG),
+        (dict(color="red"), MissingFieldsException, MISSING_FIELDS_MSG),
+    ],
+)
+def test_validate_changes_invalid(changes: dict, exception, message):
+    """Check that only changed fields are validated and invalid changes are rejected"""
+    with pytest.raises(exception) as exc:
+        utils.validate_changes(changes)
+    if message is not None:
+        assert str(exc.value) == message